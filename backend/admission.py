@@ -0,0 +1,362 @@
+"""Admission control for the voice pipeline: an in-flight cap with a bounded wait
+queue, per-upstream concurrency limits and request deadlines.
+
+Requests over the cap wait in a bounded queue. When the queue is full, or a
+request could not be started before its deadline, it is turned away at once
+with 503 and Retry-After instead of piling up. The deadline of an admitted
+request lives in a context variable (run_blocking carries it into worker
+threads), so no upstream call is started once it has passed.
+"""
+import os
+import math
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+from fastapi.responses import JSONResponse
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Voice turns processed at once; more wait in a queue of at most ADMISSION_MAX_QUEUE
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv('ADMISSION_MAX_IN_FLIGHT', '32'))
+ADMISSION_MAX_QUEUE = int(os.getenv('ADMISSION_MAX_QUEUE', '64'))
+# Longest a request waits for a slot before it is turned away
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', '5'))
+# Deadline for a request; clients may ask for less with an X-Request-Timeout header (seconds)
+REQUEST_DEADLINE_SECONDS = float(os.getenv('REQUEST_DEADLINE_SECONDS', '30'))
+# Concurrent calls per upstream (override per upstream with UPSTREAM_CONCURRENCY_<NAME>,
+# e.g. UPSTREAM_CONCURRENCY_GOOGLE_STT=4)
+UPSTREAM_CONCURRENCY = int(os.getenv('UPSTREAM_CONCURRENCY', '8'))
+
+# /ws/voice turns are admitted in main.relay_voice_turn once the final transcript
+# is in. /batch is exempt on purpose: it is an offline job that can outlast any
+# request deadline, and it is already held to BATCH_CONCURRENCY items at a time
+# with every upstream call going through upstream_limiter, so it cannot crowd
+# out interactive turns by more than that.
+ADMISSION_PATHS = ('/audio', '/chat/voice', '/chat/text', '/chat/stream')
+DEADLINE_HEADER = b'x-request-timeout'
+
+IN_FLIGHT = registry.gauge('fluentflow_admission_in_flight', 'Admitted requests being processed')
+QUEUE_DEPTH = registry.gauge('fluentflow_admission_queue_depth', 'Requests waiting for admission')
+REJECTIONS = registry.counter(
+    'fluentflow_admission_rejections_total',
+    'Requests turned away with 503 (queue_full, queue_timeout, deadline)',
+    ('reason',),
+)
+UPSTREAM_IN_FLIGHT = registry.gauge('fluentflow_upstream_in_flight', 'Calls in flight per upstream', ('upstream',))
+DEADLINE_EXCEEDED = registry.counter(
+    'fluentflow_deadline_exceeded_total',
+    'Upstream calls not started because the request deadline had passed',
+    ('upstream',),
+)
+
+_deadline = contextvars.ContextVar('request_deadline', default=None)
+_cancel = contextvars.ContextVar('call_cancel', default=None)
+
+
+class Overloaded(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Server busy ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class CallAbandoned(Exception):
+    """Nobody is waiting for this call any more (e.g. a hedged provider call that lost)"""
+
+
+class CancelToken:
+    """Set once the caller stops waiting; blocking code polls it or registers a callback"""
+
+    def __init__(self):
+        self._cancelled = False
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    def cancel(self):
+        with self._lock:
+            if self._cancelled:
+                return
+            self._cancelled = True
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.debug(f"Cancel callback failed: {e}")
+
+    def on_cancel(self, callback):
+        """Run callback when the call is cancelled (at once if it already is)"""
+        with self._lock:
+            if not self._cancelled:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+
+def time_remaining():
+    """Seconds until the current request's deadline, or None outside a request with one"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def check_deadline(upstream):
+    """Raise DeadlineExceeded instead of starting an upstream call the client will not wait for"""
+    remaining = time_remaining()
+    if remaining is not None and remaining <= 0:
+        DEADLINE_EXCEEDED.inc(upstream=upstream)
+        raise DeadlineExceeded(f"Request deadline passed before calling {upstream}")
+
+
+def cancel_token():
+    """The current call's CancelToken, or None when nothing can cancel it"""
+    return _cancel.get()
+
+
+def check_cancelled(upstream):
+    """Raise CallAbandoned instead of starting an upstream call nobody waits for"""
+    token = _cancel.get()
+    if token is not None and token.cancelled:
+        raise CallAbandoned(f"Call to {upstream} abandoned")
+
+
+def on_cancel(callback):
+    """Run callback if the current call is cancelled (no-op outside a cancel_scope)"""
+    token = _cancel.get()
+    if token is not None:
+        token.on_cancel(callback)
+
+
+@contextmanager
+def cancel_scope(token):
+    """Make token the current call's CancelToken (run_blocking carries it into the worker thread)"""
+    reset = _cancel.set(token)
+    try:
+        yield token
+    finally:
+        _cancel.reset(reset)
+
+
+@contextmanager
+def deadline_scope(deadline):
+    """Make deadline (a time.monotonic() value) the current request's deadline"""
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+class AdmissionController:
+    """Counting gate with a bounded FIFO queue; all methods run on the event loop"""
+
+    def __init__(self, max_in_flight=ADMISSION_MAX_IN_FLIGHT, max_queue=ADMISSION_MAX_QUEUE, queue_timeout=ADMISSION_QUEUE_TIMEOUT, clock=time.monotonic, alpha=0.2):
+        self.max_in_flight = max(max_in_flight, 1)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.clock = clock
+        self.alpha = alpha
+        self.in_flight = 0
+        self.ewma_service_seconds = None
+        self.admitted = 0
+        self.rejected = {'queue_full': 0, 'queue_timeout': 0, 'deadline': 0}
+        self._waiters = deque()
+
+    def retry_after(self):
+        """Whole seconds until a slot is likely free for a request joining the queue now"""
+        service = self.ewma_service_seconds or 1.0
+        rounds = (len(self._waiters) + 1) / self.max_in_flight
+        return max(1, math.ceil(service * rounds))
+
+    def _reject(self, reason):
+        self.rejected[reason] += 1
+        REJECTIONS.inc(reason=reason)
+        logger.warning(f"Admission rejected ({reason}): {self.in_flight} in flight, {len(self._waiters)} queued")
+        raise Overloaded(reason, self.retry_after())
+
+    def _admit(self):
+        self.admitted += 1
+        IN_FLIGHT.set(self.in_flight)
+
+    async def acquire(self, deadline=None):
+        """Wait for a slot; raises Overloaded when the queue is full or no slot frees up in time"""
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            self._admit()
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._reject('queue_full')
+        timeout = self.queue_timeout
+        if deadline is not None:
+            timeout = min(timeout, deadline - self.clock())
+        if timeout <= 0:
+            self._reject('deadline')
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        QUEUE_DEPTH.set(len(self._waiters))
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            self._reject('queue_timeout')
+        except asyncio.CancelledError:
+            # The client went away; hand on a slot that was already passed to us
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            QUEUE_DEPTH.set(len(self._waiters))
+        # release() handed its slot straight to us, so in_flight is unchanged
+        self._admit()
+
+    def release(self, service_seconds=None):
+        """Free a slot, passing it to the longest waiting request if there is one"""
+        if service_seconds is not None:
+            if self.ewma_service_seconds is None:
+                self.ewma_service_seconds = service_seconds
+            else:
+                self.ewma_service_seconds = self.alpha * service_seconds + (1 - self.alpha) * self.ewma_service_seconds
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                QUEUE_DEPTH.set(len(self._waiters))
+                return
+        self.in_flight -= 1
+        IN_FLIGHT.set(self.in_flight)
+
+    def stats(self):
+        return {
+            'max_in_flight': self.max_in_flight,
+            'max_queue': self.max_queue,
+            'in_flight': self.in_flight,
+            'queue_depth': len(self._waiters),
+            'admitted': self.admitted,
+            'rejected': dict(self.rejected),
+            'ewma_service_ms': round(self.ewma_service_seconds * 1000, 1) if self.ewma_service_seconds is not None else None,
+            'retry_after_seconds': self.retry_after(),
+        }
+
+
+class AdmissionMiddleware:
+    """Gate requests to the voice endpoints before their bodies are read and set their deadline"""
+
+    def __init__(self, app, controller, paths=ADMISSION_PATHS, max_deadline=REQUEST_DEADLINE_SECONDS):
+        self.app = app
+        self.controller = controller
+        self.paths = tuple(paths)
+        self.max_deadline = max_deadline
+
+    def _timeout(self, scope):
+        for name, value in scope.get('headers', []):
+            if name == DEADLINE_HEADER:
+                try:
+                    requested = float(value)
+                except ValueError:
+                    break
+                if requested > 0:
+                    return min(requested, self.max_deadline)
+                break
+        return self.max_deadline
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        clock = self.controller.clock
+        deadline = clock() + self._timeout(scope)
+        try:
+            await self.controller.acquire(deadline)
+        except Overloaded as e:
+            response = JSONResponse(
+                status_code=503,
+                content={'detail': "Server is busy, please retry shortly", 'reason': e.reason},
+                headers={'Retry-After': str(e.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        started = clock()
+        try:
+            with deadline_scope(deadline):
+                await self.app(scope, receive, send)
+        finally:
+            self.controller.release(clock() - started)
+
+
+class UpstreamLimiter:
+    """Per-upstream concurrency limits for the blocking calls made on worker threads"""
+
+    def __init__(self, default_limit=UPSTREAM_CONCURRENCY):
+        self.default_limit = default_limit
+        self._semaphores = {}
+        self._limits = {}
+        self._lock = threading.Lock()
+
+    def limit_for(self, upstream):
+        return int(os.getenv(f'UPSTREAM_CONCURRENCY_{upstream.upper()}', self.default_limit))
+
+    def _semaphore(self, upstream):
+        with self._lock:
+            semaphore = self._semaphores.get(upstream)
+            if semaphore is None:
+                self._limits[upstream] = self.limit_for(upstream)
+                semaphore = self._semaphores[upstream] = threading.BoundedSemaphore(self._limits[upstream])
+            return semaphore
+
+    @contextmanager
+    def slot(self, upstream):
+        """Hold one of the upstream's slots; waits no longer than the request deadline"""
+        check_deadline(upstream)
+        remaining = time_remaining()
+        semaphore = self._semaphore(upstream)
+        if not semaphore.acquire(timeout=remaining):
+            DEADLINE_EXCEEDED.inc(upstream=upstream)
+            raise DeadlineExceeded(f"Request deadline passed waiting for a {upstream} slot")
+        UPSTREAM_IN_FLIGHT.inc(upstream=upstream)
+        try:
+            yield
+        finally:
+            UPSTREAM_IN_FLIGHT.dec(upstream=upstream)
+            semaphore.release()
+
+    def stats(self):
+        with self._lock:
+            limits = dict(self._limits)
+        return {
+            upstream: {'limit': limit, 'in_flight': UPSTREAM_IN_FLIGHT.value(upstream=upstream)}
+            for upstream, limit in limits.items()
+        }
+
+
+def capped_timeout(timeout):
+    """A requests timeout shortened to the time left before the request deadline"""
+    remaining = time_remaining()
+    if remaining is None:
+        return timeout
+    remaining = max(remaining, 0.001)
+    if timeout is None:
+        return remaining
+    if isinstance(timeout, tuple):
+        return tuple(remaining if part is None else min(part, remaining) for part in timeout)
+    return min(timeout, remaining)
+
+
+upstream_limiter = UpstreamLimiter()
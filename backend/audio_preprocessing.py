@@ -0,0 +1,243 @@
+"""Audio preprocessing before speech recognition.
+
+The container and codec are sniffed from the header bytes so RecognitionConfig
+matches what was actually uploaded. PCM WAV is also trimmed of leading and
+trailing silence (frame-energy VAD) and downmixed/downsampled to 16 kHz mono,
+which shrinks what is sent to recognition. The PCM work needs numpy; without
+it the audio is passed through unchanged with the sniffed config.
+"""
+import io
+import os
+import wave
+import struct
+import logging
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+TARGET_SAMPLE_RATE = int(os.getenv('AUDIO_TARGET_SAMPLE_RATE', '16000'))
+TRIM_SILENCE = os.getenv('AUDIO_TRIM_SILENCE', 'true').lower() == 'true'
+
+VAD_FRAME_SECONDS = 0.02
+# Frames quieter than this RMS (int16 scale, about -40 dBFS) never count as speech
+VAD_MIN_RMS = 300.0
+# Speech is anything this many times louder than the recording's noise floor
+VAD_NOISE_RATIO = 3.0
+# Silence kept around the detected speech so word onsets are not clipped
+VAD_PADDING_SECONDS = 0.2
+
+# WAV format tags
+_WAVE_PCM = 0x0001
+_WAVE_FLOAT = 0x0003
+_WAVE_MULAW = 0x0007
+_WAVE_EXTENSIBLE = 0xFFFE
+
+
+class AudioFormat:
+    """What an upload contains, as far as recognition needs to know"""
+
+    def __init__(self, container, encoding=None, sample_rate_hertz=None, channels=None, sample_width=None, wave_format=None):
+        self.container = container
+        self.encoding = encoding  # RecognitionConfig.AudioEncoding name, or None to let the API detect it
+        self.sample_rate_hertz = sample_rate_hertz
+        self.channels = channels
+        self.sample_width = sample_width
+        self.wave_format = wave_format
+
+    def __repr__(self):
+        return f"AudioFormat({self.container}, {self.encoding}, {self.sample_rate_hertz} Hz, {self.channels} ch)"
+
+
+class PreparedAudio:
+    """Audio ready for recognition plus what preprocessing did to it"""
+
+    def __init__(self, content, audio_format, original_bytes, trimmed_seconds=0.0, duration_seconds=None):
+        self.content = content
+        self.format = audio_format
+        self.original_bytes = original_bytes
+        self.trimmed_seconds = trimmed_seconds
+        self.duration_seconds = duration_seconds
+
+
+def _parse_wav(data):
+    """Return (fmt fields, data offset, data length) for a RIFF/WAVE file, or None"""
+    position = 12
+    fmt = None
+    while position + 8 <= len(data):
+        chunk_id = data[position:position + 4]
+        chunk_size = struct.unpack('<I', data[position + 4:position + 8])[0]
+        body = position + 8
+        if chunk_id == b'fmt ' and chunk_size >= 16:
+            if body + 16 > len(data):
+                return None  # truncated header
+            wave_format, channels, sample_rate, _, _, bits = struct.unpack('<HHIIHH', data[body:body + 16])
+            if wave_format == _WAVE_EXTENSIBLE and chunk_size >= 26 and body + 26 <= len(data):
+                wave_format = struct.unpack('<H', data[body + 24:body + 26])[0]
+            fmt = (wave_format, channels, sample_rate, bits)
+        elif chunk_id == b'data' and fmt is not None:
+            # Streaming recorders often leave the size as 0 or 0xFFFFFFFF
+            available = len(data) - body
+            length = chunk_size if 0 < chunk_size <= available else available
+            return fmt, body, length
+        position = body + chunk_size + (chunk_size & 1)
+    return None
+
+
+def sniff_format(data):
+    """Identify container and codec from the header bytes"""
+    header = bytes(data[:64])
+    if header[:4] == b'RIFF' and header[8:12] == b'WAVE':
+        parsed = _parse_wav(bytes(data))
+        if parsed is None:
+            return AudioFormat('wav')
+        (wave_format, channels, sample_rate, bits), _, _ = parsed
+        if not (channels and sample_rate and bits // 8):
+            return AudioFormat('wav')  # nonsense header: pass the audio through untouched
+        encoding = None
+        if wave_format == _WAVE_MULAW:
+            encoding = 'MULAW'
+        elif wave_format == _WAVE_PCM and bits == 16:
+            encoding = 'LINEAR16'
+        return AudioFormat('wav', encoding, sample_rate, channels, bits // 8, wave_format)
+    if header[:4] == b'OggS':
+        if b'OpusHead' in header:
+            return AudioFormat('ogg', 'OGG_OPUS', 48000)
+        return AudioFormat('ogg')
+    if header[:4] == b'\x1a\x45\xdf\xa3':
+        # Matroska/WebM; browsers record Opus at 48 kHz
+        return AudioFormat('webm', 'WEBM_OPUS', 48000)
+    if header[:4] == b'fLaC':
+        # STREAMINFO: 20-bit sample rate starts at byte 18
+        sample_rate = (header[18] << 12) | (header[19] << 4) | (header[20] >> 4) if len(header) >= 21 else None
+        return AudioFormat('flac', 'FLAC', sample_rate or None)
+    if header[:3] == b'ID3' or (len(header) >= 2 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0):
+        return AudioFormat('mp3', 'MP3')
+    return AudioFormat('unknown')
+
+
+def _decode_pcm(data, audio_format, offset, length):
+    """WAV sample data as a float array of shape (frames, channels) on the int16 scale, or None"""
+    raw = data[offset:offset + length]
+    width = audio_format.sample_width
+    if audio_format.wave_format == _WAVE_FLOAT and width == 4:
+        samples = np.frombuffer(raw[:len(raw) - len(raw) % 4], dtype='<f4').astype(np.float64) * 32767.0
+    elif width == 2:
+        samples = np.frombuffer(raw[:len(raw) - len(raw) % 2], dtype='<i2').astype(np.float64)
+    elif width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float64) - 128.0) * 256.0
+    else:
+        return None
+    channels = max(audio_format.channels or 1, 1)
+    frames = len(samples) // channels
+    return samples[:frames * channels].reshape(frames, channels)
+
+
+def _resample(mono, source_rate, target_rate):
+    """Downsample (never upsample) with a box low-pass followed by interpolation"""
+    if source_rate <= target_rate:
+        return mono, source_rate
+    if source_rate % target_rate == 0:
+        factor = source_rate // target_rate
+        usable = len(mono) - len(mono) % factor
+        return mono[:usable].reshape(-1, factor).mean(axis=1), target_rate
+    ratio = source_rate / target_rate
+    width = max(int(round(ratio)), 1)
+    smoothed = np.convolve(mono, np.ones(width) / width, mode='same')
+    positions = np.arange(0, len(mono) - 1, ratio)
+    return np.interp(positions, np.arange(len(mono)), smoothed), target_rate
+
+
+def voiced_bounds(mono, sample_rate):
+    """(start, end) sample indexes of the speech in a mono signal, or None if it is all silence"""
+    frame = max(int(sample_rate * VAD_FRAME_SECONDS), 1)
+    count = len(mono) // frame
+    if count == 0:
+        return None
+    frames = mono[:count * frame].reshape(count, frame)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    noise_floor = np.percentile(rms, 10)
+    voiced = np.flatnonzero(rms > max(VAD_MIN_RMS, noise_floor * VAD_NOISE_RATIO))
+    if len(voiced) == 0:
+        return None
+    padding = int(sample_rate * VAD_PADDING_SECONDS)
+    start = max(voiced[0] * frame - padding, 0)
+    end = min((voiced[-1] + 1) * frame + padding, len(mono))
+    return start, end
+
+
+def encode_wav(mono, sample_rate):
+    """16-bit mono WAV bytes"""
+    pcm = np.clip(np.round(mono), -32768, 32767).astype('<i2').tobytes()
+    out = io.BytesIO()
+    with wave.open(out, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return out.getvalue()
+
+
+def decode_wav(data, audio_format=None):
+    """(mono samples, sample rate) of a PCM WAV, or None for anything numpy cannot decode here"""
+    audio_format = audio_format or sniff_format(data)
+    if audio_format.wave_format not in (_WAVE_PCM, _WAVE_FLOAT) or not NUMPY_AVAILABLE:
+        return None
+    parsed = _parse_wav(data)
+    samples = _decode_pcm(data, audio_format, parsed[1], parsed[2]) if parsed else None
+    if samples is None or not len(samples):
+        return None
+    return samples.mean(axis=1), audio_format.sample_rate_hertz
+
+
+def preprocess_audio(data, trim_silence=None, target_sample_rate=None):
+    """Sniff the upload and, for PCM WAV, trim silence and convert to 16 kHz mono"""
+    data = bytes(data)
+    audio_format = sniff_format(data)
+    prepared = PreparedAudio(data, audio_format, len(data))
+    decoded = decode_wav(data, audio_format)
+    if decoded is None:
+        return prepared
+
+    trim_silence = TRIM_SILENCE if trim_silence is None else trim_silence
+    target_sample_rate = target_sample_rate or TARGET_SAMPLE_RATE
+    mono = decoded[0]
+    duration = len(mono) / audio_format.sample_rate_hertz
+    mono, sample_rate = _resample(mono, audio_format.sample_rate_hertz, target_sample_rate)
+    trimmed = 0.0
+    if trim_silence:
+        bounds = voiced_bounds(mono, sample_rate)
+        if bounds is not None:
+            start, end = bounds
+            trimmed = (len(mono) - (end - start)) / sample_rate
+            mono = mono[start:end]
+
+    content = encode_wav(mono, sample_rate)
+    logger.info(
+        f"Preprocessed {audio_format}: {len(data)} -> {len(content)} bytes, "
+        f"{trimmed:.2f}s of silence trimmed"
+    )
+    return PreparedAudio(
+        content,
+        AudioFormat('wav', 'LINEAR16', sample_rate, 1, 2, _WAVE_PCM),
+        len(data),
+        trimmed_seconds=trimmed,
+        duration_seconds=duration,
+    )
+
+
+def recognition_config_kwargs(audio_format, speech_module):
+    """RecognitionConfig arguments for a sniffed format (encodings the API lacks are left to auto-detection)"""
+    kwargs = {}
+    encodings = speech_module.RecognitionConfig.AudioEncoding
+    if audio_format.encoding and hasattr(encodings, audio_format.encoding):
+        kwargs['encoding'] = getattr(encodings, audio_format.encoding)
+        if audio_format.sample_rate_hertz:
+            kwargs['sample_rate_hertz'] = audio_format.sample_rate_hertz
+    if audio_format.channels and audio_format.channels > 1:
+        kwargs['audio_channel_count'] = audio_format.channels
+    return kwargs
@@ -0,0 +1,378 @@
+"""Content-addressed store for generated reply audio, served with strong ETags and Range support.
+
+AudioArtifactStore keeps the index in process (single worker);
+SqliteAudioArtifactStore keeps it in a sqlite file under SHARED_STATE_DIR so any
+worker can serve audio another worker generated. Both have the same interface:
+put, get, cleanup, clear, close and stats.
+"""
+import os
+import time
+import shutil
+import hashlib
+import logging
+import sqlite3
+import tempfile
+import threading
+
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+from shared_state import connect, shared_state_path
+
+logger = logging.getLogger(__name__)
+
+# Artifacts are immutable (the ID is a hash of the bytes), so clients may cache them forever
+AUDIO_CACHE_CONTROL = "public, max-age=31536000, immutable"
+STREAM_CHUNK_SIZE = 64 * 1024
+
+EXTENSIONS = {
+    'audio/mpeg': 'mp3',
+    'audio/ogg': 'ogg',
+}
+
+
+class AudioArtifact:
+    """A stored clip: held in memory when small, otherwise on disk"""
+
+    def __init__(self, artifact_id, media_type, size, content=None, path=None, created_at=None):
+        self.id = artifact_id
+        self.media_type = media_type
+        self.size = size
+        self.content = content
+        self.path = path
+        self.created_at = time.time() if created_at is None else created_at
+
+    @property
+    def etag(self):
+        return f'"{self.id}"'
+
+    @property
+    def extension(self):
+        return EXTENSIONS.get(self.media_type, 'bin')
+
+    @property
+    def url(self):
+        return f"/audio/{self.id}.{self.extension}"
+
+
+class AudioArtifactStore:
+    """Keeps each reply's audio under its own content ID instead of one shared file"""
+
+    def __init__(self, directory=None, memory_max_bytes=256 * 1024, max_age_seconds=3600):
+        self.directory = directory
+        self.memory_max_bytes = memory_max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._owns_directory = directory is None
+        self._artifacts = {}
+        self._lock = threading.Lock()
+
+    def _ensure_directory(self):
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix="fluentflow-audio-")
+        os.makedirs(self.directory, exist_ok=True)
+        return self.directory
+
+    def put(self, content, media_type='audio/mpeg'):
+        """Store audio bytes and return the artifact (identical bytes share one artifact)"""
+        artifact_id = hashlib.sha256(content).hexdigest()[:32]
+        with self._lock:
+            existing = self._artifacts.get(artifact_id)
+            if existing is not None:
+                existing.created_at = time.time()
+                return existing
+
+        artifact = AudioArtifact(artifact_id, media_type, len(content))
+        if len(content) <= self.memory_max_bytes:
+            artifact.content = bytes(content)
+        else:
+            path = os.path.join(self._ensure_directory(), f"{artifact_id}.{artifact.extension}")
+            with open(path, "wb") as out:
+                out.write(content)
+            artifact.path = path
+
+        with self._lock:
+            self._artifacts[artifact_id] = artifact
+        return artifact
+
+    def get(self, artifact_id):
+        """Return the artifact for an ID, or None"""
+        with self._lock:
+            return self._artifacts.get(artifact_id)
+
+    def _remove_files(self, artifacts):
+        for artifact in artifacts:
+            if artifact.path:
+                try:
+                    os.remove(artifact.path)
+                except FileNotFoundError:
+                    pass
+                except Exception as e:
+                    logger.error(f"Failed to clean up audio file {artifact.path}: {e}")
+
+    def cleanup(self, max_age_seconds=None):
+        """Remove artifacts older than max_age_seconds; returns how many were removed"""
+        max_age = self.max_age_seconds if max_age_seconds is None else max_age_seconds
+        cutoff = time.time() - max_age
+        with self._lock:
+            expired = [a for a in self._artifacts.values() if a.created_at <= cutoff]
+            for artifact in expired:
+                del self._artifacts[artifact.id]
+        self._remove_files(expired)
+        return len(expired)
+
+    def clear(self):
+        """Remove every artifact"""
+        with self._lock:
+            artifacts = list(self._artifacts.values())
+            self._artifacts.clear()
+        self._remove_files(artifacts)
+        if self._owns_directory and self.directory and os.path.isdir(self.directory):
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+
+    def close(self):
+        """Release the store at shutdown (the in-process index dies with the worker)"""
+        self.clear()
+
+    def stats(self):
+        """Artifact counts and bytes held in memory vs. on disk"""
+        with self._lock:
+            artifacts = list(self._artifacts.values())
+        return {
+            'backend': 'memory',
+            'artifacts': len(artifacts),
+            'memory_bytes': sum(a.size for a in artifacts if a.content is not None),
+            'disk_bytes': sum(a.size for a in artifacts if a.path),
+        }
+
+
+def _write_atomically(path, content):
+    # Another worker may be reading or writing the same content ID; readers only
+    # ever see a complete file
+    partial = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(partial, "wb") as out:
+        out.write(content)
+    os.replace(partial, path)
+
+
+class SqliteAudioArtifactStore:
+    """Artifact index in sqlite with small clips inline and larger ones as files in a shared directory"""
+
+    def __init__(self, db_path, directory, memory_max_bytes=256 * 1024, max_age_seconds=3600):
+        self.db_path = db_path
+        self.directory = directory
+        self.memory_max_bytes = memory_max_bytes
+        self.max_age_seconds = max_age_seconds
+        os.makedirs(directory, exist_ok=True)
+        self._db = connect(db_path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS audio_artifacts ("
+            "id TEXT PRIMARY KEY, media_type TEXT NOT NULL, size INTEGER NOT NULL, "
+            "content BLOB, path TEXT, created_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS audio_artifacts_created ON audio_artifacts (created_at)")
+        self._db.commit()
+        self._lock = threading.Lock()
+        logger.info(f"Shared audio artifact store at {db_path}")
+
+    def _artifact(self, row):
+        artifact_id, media_type, size, content, path, created_at = row
+        return AudioArtifact(artifact_id, media_type, size, content=content, path=path, created_at=created_at)
+
+    def put(self, content, media_type='audio/mpeg'):
+        """Store audio bytes and return the artifact (identical bytes share one artifact)"""
+        artifact_id = hashlib.sha256(content).hexdigest()[:32]
+        now = time.time()
+        with self._lock:
+            updated = self._db.execute(
+                "UPDATE audio_artifacts SET created_at = ? WHERE id = ?", (now, artifact_id)
+            ).rowcount
+            self._db.commit()
+        if updated:
+            return self.get(artifact_id)
+
+        artifact = AudioArtifact(artifact_id, media_type, len(content), created_at=now)
+        if len(content) <= self.memory_max_bytes:
+            artifact.content = bytes(content)
+        else:
+            artifact.path = os.path.join(self.directory, f"{artifact_id}.{artifact.extension}")
+            _write_atomically(artifact.path, content)
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO audio_artifacts (id, media_type, size, content, path, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (artifact.id, artifact.media_type, artifact.size, artifact.content, artifact.path, artifact.created_at),
+            )
+            self._db.commit()
+        return artifact
+
+    def get(self, artifact_id):
+        """Return the artifact for an ID, or None"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, media_type, size, content, path, created_at FROM audio_artifacts WHERE id = ?",
+                (artifact_id,),
+            ).fetchone()
+        return self._artifact(row) if row else None
+
+    def _remove_files(self, paths):
+        for path in paths:
+            if path:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except Exception as e:
+                    logger.error(f"Failed to clean up audio file {path}: {e}")
+
+    def _delete(self, where, params=()):
+        with self._lock:
+            try:
+                self._db.execute("BEGIN IMMEDIATE")
+                rows = self._db.execute(f"SELECT path FROM audio_artifacts {where}", params).fetchall()
+                self._db.execute(f"DELETE FROM audio_artifacts {where}", params)
+                self._db.commit()
+            except sqlite3.Error:
+                self._db.rollback()
+                raise
+        self._remove_files(path for (path,) in rows)
+        return len(rows)
+
+    def cleanup(self, max_age_seconds=None):
+        """Remove artifacts older than max_age_seconds; returns how many were removed"""
+        max_age = self.max_age_seconds if max_age_seconds is None else max_age_seconds
+        return self._delete("WHERE created_at <= ?", (time.time() - max_age,))
+
+    def clear(self):
+        """Remove every artifact (for every worker)"""
+        self._delete("")
+
+    def close(self):
+        """Close this worker's connection; artifacts stay available to the other workers"""
+        with self._lock:
+            self._db.close()
+
+    def stats(self):
+        """Artifact counts and bytes stored inline vs. as files"""
+        with self._lock:
+            count, inline_bytes, file_bytes = self._db.execute(
+                "SELECT COUNT(*), "
+                "COALESCE(SUM(CASE WHEN content IS NOT NULL THEN size END), 0), "
+                "COALESCE(SUM(CASE WHEN path IS NOT NULL THEN size END), 0) "
+                "FROM audio_artifacts"
+            ).fetchone()
+        return {
+            'backend': 'sqlite',
+            'artifacts': count,
+            'memory_bytes': inline_bytes,
+            'disk_bytes': file_bytes,
+        }
+
+
+def parse_range(range_header, size):
+    """Parse a single 'bytes=' range into (start, end) inclusive.
+
+    Returns None when the header should be ignored (absent, multi-range or not
+    bytes) and raises ValueError when the range cannot be satisfied.
+    """
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+    spec = range_header[len("bytes="):].strip()
+    if "," in spec:
+        return None
+    start_text, _, end_text = spec.partition("-")
+    try:
+        if start_text == "":
+            suffix = int(end_text)
+            if suffix <= 0:
+                raise ValueError("empty suffix range")
+            start, end = max(size - suffix, 0), size - 1
+        else:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+    except ValueError:
+        raise ValueError(f"invalid range: {range_header}")
+    end = min(end, size - 1)
+    if start < 0 or start > end:
+        raise ValueError(f"unsatisfiable range: {range_header}")
+    return start, end
+
+
+def _read_file_range(path, start, end):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def artifact_response(artifact, headers):
+    """Build the HTTP response for an artifact honouring If-None-Match, If-Range and Range"""
+    base_headers = {
+        'ETag': artifact.etag,
+        'Cache-Control': AUDIO_CACHE_CONTROL,
+        'Accept-Ranges': 'bytes',
+    }
+
+    if_none_match = headers.get('if-none-match')
+    if if_none_match and (if_none_match.strip() == '*' or artifact.etag in [t.strip() for t in if_none_match.split(',')]):
+        return Response(status_code=304, headers=base_headers)
+
+    range_header = headers.get('range')
+    if_range = headers.get('if-range')
+    if if_range and if_range.strip() != artifact.etag:
+        range_header = None
+
+    try:
+        byte_range = parse_range(range_header, artifact.size)
+    except ValueError:
+        return Response(status_code=416, headers={**base_headers, 'Content-Range': f"bytes */{artifact.size}"})
+
+    if byte_range is None:
+        if artifact.content is not None:
+            return Response(content=artifact.content, media_type=artifact.media_type, headers=base_headers)
+        return FileResponse(artifact.path, media_type=artifact.media_type, headers=base_headers)
+
+    start, end = byte_range
+    partial_headers = {
+        **base_headers,
+        'Content-Range': f"bytes {start}-{end}/{artifact.size}",
+        'Content-Length': str(end - start + 1),
+    }
+    if artifact.content is not None:
+        return Response(
+            content=artifact.content[start:end + 1],
+            status_code=206,
+            media_type=artifact.media_type,
+            headers=partial_headers,
+        )
+    return StreamingResponse(
+        _read_file_range(artifact.path, start, end),
+        status_code=206,
+        media_type=artifact.media_type,
+        headers=partial_headers,
+    )
+
+
+def audio_store_from_env():
+    """Build the artifact store from AUDIO_* environment variables (shared when SHARED_STATE_DIR is set)"""
+    directory = os.getenv('AUDIO_STORE_DIR', '') or None
+    memory_max_bytes = int(os.getenv('AUDIO_MEMORY_MAX_BYTES', str(256 * 1024)))
+    max_age_seconds = float(os.getenv('AUDIO_MAX_AGE', '3600'))
+    db_path = shared_state_path('audio.sqlite')
+    if db_path:
+        return SqliteAudioArtifactStore(
+            db_path,
+            directory=directory or shared_state_path('audio'),
+            memory_max_bytes=memory_max_bytes,
+            max_age_seconds=max_age_seconds,
+        )
+    return AudioArtifactStore(
+        directory=directory,
+        memory_max_bytes=memory_max_bytes,
+        max_age_seconds=max_age_seconds,
+    )
@@ -0,0 +1,104 @@
+"""Batch scoring of many recordings/transcripts, streamed back as NDJSON as items finish."""
+import json
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class GrammarBatcher:
+    """Collects sentences from concurrently running batch items and corrects them in groups.
+
+    correct_many: blocking callable(list of texts) -> list of corrected texts;
+    a group is sent when it reaches max_group sentences or max_wait seconds after
+    its first sentence arrived, whichever comes first.
+    """
+
+    def __init__(self, correct_many, run_blocking, max_group=20, max_wait=0.02):
+        self.correct_many = correct_many
+        self.run_blocking = run_blocking
+        self.max_group = max_group
+        self.max_wait = max_wait
+        self.groups_sent = 0
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+    async def correct(self, text):
+        """Queue one sentence and wait for its corrected form"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_group:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        group, self._pending = self._pending, []
+        if group:
+            task = asyncio.ensure_future(self._send(group))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, group):
+        self.groups_sent += 1
+        try:
+            results = await self.run_blocking(self.correct_many, [text for text, _ in group])
+        except Exception as e:
+            for _, future in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), corrected in zip(group, results):
+            if not future.done():
+                future.set_result(corrected)
+
+    def close(self):
+        """Drop queued sentences and cancel groups still in flight"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for _, future in self._pending:
+            future.cancel()
+        self._pending = []
+        for task in list(self._tasks):
+            task.cancel()
+
+
+async def run_batch(items, process, concurrency=4):
+    """Yield one result dict per item in completion order, running at most `concurrency` at once.
+
+    process: async callable(item) -> dict; an exception fails only that item.
+    Each result carries the item's index and id.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(item):
+        async with semaphore:
+            try:
+                result = await process(item)
+                result.setdefault('success', True)
+            except Exception as e:
+                logger.warning(f"Batch item {item['index']} failed: {e}")
+                result = {'success': False, 'error': str(e) or type(e).__name__}
+        return {'index': item['index'], 'id': item['id'], **result}
+
+    tasks = [asyncio.ensure_future(run_one(item)) for item in items]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Client went away: stop the remaining work
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+def ndjson_line(obj):
+    """Format one newline-delimited JSON record"""
+    return json.dumps(obj) + "\n"
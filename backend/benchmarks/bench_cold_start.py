@@ -0,0 +1,74 @@
+"""Cold-start budget: time to import the app and to answer its first request.
+
+Each run is a fresh interpreter, so nothing is warm. Exits non-zero when the
+median exceeds a budget.
+
+Usage (from backend/):
+    python benchmarks/bench_cold_start.py [--runs 5]
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_BUDGET_SECONDS = 1.5
+FIRST_REQUEST_BUDGET_SECONDS = 0.5
+
+_PROBE = r"""
+import json, sys, time
+started = time.perf_counter()
+import main
+import_seconds = time.perf_counter() - started
+state_after_import = main.google_clients_state
+from fastapi.testclient import TestClient
+client = TestClient(main.app)
+started = time.perf_counter()
+status = client.get('/health').status_code
+first_request_seconds = time.perf_counter() - started
+print(json.dumps({
+    'import_seconds': import_seconds,
+    'first_request_seconds': first_request_seconds,
+    'status': status,
+    'google_clients_state_after_import': state_after_import,
+    'google_cloud_imported': any(name.startswith('google.cloud') for name in sys.modules),
+    'uvicorn_imported': 'uvicorn' in sys.modules,
+}))
+"""
+
+
+def measure_cold_start(env=None):
+    """Import the app in a fresh interpreter and time the import and the first /health request"""
+    result = subprocess.run(
+        [sys.executable, '-c', _PROBE],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **(env or {})},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [measure_cold_start() for _ in range(args.runs)]
+    over_budget = False
+    for key, budget in (('import_seconds', IMPORT_BUDGET_SECONDS), ('first_request_seconds', FIRST_REQUEST_BUDGET_SECONDS)):
+        samples = [run[key] for run in runs]
+        median = statistics.median(samples)
+        verdict = "ok" if median <= budget else "OVER BUDGET"
+        over_budget |= median > budget
+        print(f"{key}: median {median * 1000:.0f} ms, max {max(samples) * 1000:.0f} ms (budget {budget * 1000:.0f} ms) {verdict}")
+    print(f"google.cloud imported at startup: {any(run['google_cloud_imported'] for run in runs)}")
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Compare the in-process grammar tier with LanguageTool: corrections/sec and latency percentiles.
+
+Usage (from backend/):
+    python benchmarks/bench_grammar.py [--iterations 2000] [--remote-url URL] [--remote-requests 50] [--skip-remote]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests  # noqa: E402
+
+import local_grammar  # noqa: E402
+
+SENTENCES = [
+    "i has a apple",
+    "she go to school every day",
+    "he don't like the the movie",
+    "I would like to practice English",
+    "they is happy and we was late",
+    "Can you help me with English grammar?",
+    "my friend speak english very well",
+    "I want to improve my speaking skills",
+    "It is an university in my city",
+    "What a beautiful day it is",
+]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(name, samples, elapsed):
+    print(f"{name}:")
+    print(f"  corrections/sec: {len(samples) / elapsed:,.0f}")
+    print(f"  p50: {percentile(samples, 50) * 1000:.3f} ms")
+    print(f"  p99: {percentile(samples, 99) * 1000:.3f} ms")
+    print(f"  mean: {statistics.mean(samples) * 1000:.3f} ms")
+
+
+def bench_local(iterations):
+    samples = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        text = SENTENCES[i % len(SENTENCES)]
+        t0 = time.perf_counter()
+        local_grammar.check(text)
+        samples.append(time.perf_counter() - t0)
+    return samples, time.perf_counter() - start
+
+
+def bench_remote(url, requests_count):
+    session = requests.Session()
+    samples = []
+    start = time.perf_counter()
+    for i in range(requests_count):
+        text = SENTENCES[i % len(SENTENCES)]
+        t0 = time.perf_counter()
+        response = session.post(url, data={"text": text, "language": "en-US"}, timeout=10)
+        response.raise_for_status()
+        samples.append(time.perf_counter() - t0)
+    return samples, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--remote-url', default=os.getenv('LANGUAGETOOL_URL', 'https://api.languagetoolplus.com/v2/check'))
+    parser.add_argument('--remote-requests', type=int, default=50)
+    parser.add_argument('--skip-remote', action='store_true')
+    args = parser.parse_args()
+
+    report("local tier", *bench_local(args.iterations))
+    if not args.skip_remote:
+        try:
+            report(f"remote tier ({args.remote_url})", *bench_remote(args.remote_url, args.remote_requests))
+        except requests.RequestException as e:
+            print(f"remote tier unavailable: {e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Compare the compiled intent classifier with the old linear substring scans.
+
+Reports classifications/sec for both and their accuracy on tests/data/intent_cases.json.
+
+Usage (from backend/):
+    python benchmarks/bench_intents.py [--iterations 20000]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from intents import intent_classifier  # noqa: E402
+
+CASES_PATH = os.path.join(BACKEND_DIR, 'tests', 'data', 'intent_cases.json')
+
+
+def legacy_classify(text):
+    """The substring scans _generate_local_response used before the intent table"""
+    user_lower = text.lower().strip()
+    if any(word in user_lower for word in ['hello', 'hi', 'hey', 'greetings', 'good morning', 'good afternoon', 'good evening', 'howdy']):
+        return 'greeting'
+    if any(word in user_lower for word in ['goodbye', 'bye', 'see you', 'farewell', 'bye bye', 'take care', 'see you later', 'catch you']):
+        return 'farewell'
+    if any(word in user_lower for word in ['thank', 'thanks', 'appreciate', 'grateful', 'thank you']):
+        return 'thanks'
+    if '?' in user_lower or any(word in user_lower for word in ['what', 'why', 'how', 'when', 'where', 'who', 'which']):
+        return 'question'
+    if any(word in user_lower for word in ['yes', 'okay', 'ok', 'sure', 'alright', 'indeed', 'agree', 'correct', 'right']):
+        return 'affirmation'
+    if any(word in user_lower for word in ['no', 'not', 'never', 'nope', 'cannot', 'can\'t', 'won\'t']):
+        return 'negative'
+    if any(word in user_lower for word in ['help', 'assist', 'teach', 'explain', 'show me', 'guide']):
+        return 'help'
+    return None
+
+
+def throughput(classify_many, texts, iterations):
+    batch = (texts * (iterations // len(texts) + 1))[:iterations]
+    start = time.perf_counter()
+    classify_many(batch)
+    return iterations / (time.perf_counter() - start)
+
+
+def accuracy(predictions, labels):
+    return sum(p == l for p, l in zip(predictions, labels)) / len(labels)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    with open(CASES_PATH) as f:
+        cases = json.load(f)
+    texts = [c['text'] for c in cases]
+    labels = [c['intent'] for c in cases]
+
+    def legacy_many(batch):
+        return [legacy_classify(t) for t in batch]
+
+    for name, classify_many in (("legacy substring scans", legacy_many), ("compiled classifier", intent_classifier.classify_many)):
+        print(f"{name}:")
+        print(f"  classifications/sec: {throughput(classify_many, texts, args.iterations):,.0f}")
+        print(f"  accuracy: {accuracy(classify_many(texts), labels):.1%} on {len(cases)} labelled sentences")
+
+
+if __name__ == '__main__':
+    main()
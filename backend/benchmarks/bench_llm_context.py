@@ -0,0 +1,76 @@
+"""Prompt tokens and time to first token over a long session, with and without prefix reuse.
+
+One session runs --turns tutor turns against the fake OpenAI and Ollama
+upstreams from fakes.py, streamed like /chat/stream. The fakes charge
+--prompt-token-ms for each prompt token they have to evaluate. OpenAI skips
+the prefix it has seen before. Ollama skips the context posted back to it.
+
+"reuse" is the normal app: a token-budgeted history window that stays put
+between trims, and Ollama's returned context sent back with only the new line.
+"no reuse" rebuilds the full prompt on every turn with no session. The history
+then slides by one turn each time, and Ollama contexts are not kept.
+
+Usage (from backend/):
+    python benchmarks/bench_llm_context.py [--turns 40] [--prompt-token-ms 0.5]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+from contextlib import nullcontext
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+from fakes import SAMPLE_TRANSCRIPTS, FakeUpstreamServer  # noqa: E402
+
+
+def run_session(streamer, turns, reuse):
+    from llm_context import conversation_scope
+    from sessions import Session
+
+    session = Session('bench', 2 * turns, 0)
+    first_token = []
+    for turn in range(turns):
+        text = f"{SAMPLE_TRANSCRIPTS[turn % len(SAMPLE_TRANSCRIPTS)]} (turn {turn})"
+        started = time.perf_counter()
+        reply = []
+        with conversation_scope(session) if reuse else nullcontext():
+            for token in streamer(text, session.history()):
+                if not reply:
+                    first_token.append(time.perf_counter() - started)
+                reply.append(token)
+        session.append({'type': 'user', 'content': text})
+        session.append({'type': 'assistant', 'content': "".join(reply).strip()})
+    return first_token
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turns', type=int, default=40)
+    parser.add_argument('--prompt-token-ms', type=float, default=0.5, help="fake prompt evaluation time per uncached token")
+    args = parser.parse_args()
+
+    server = FakeUpstreamServer(prompt_token_seconds=args.prompt_token_ms / 1000).start()
+    os.environ.update(server.env())
+    import main as app
+
+    print(f"{'provider':<10} {'mode':<10} {'evaluated':>10} {'per turn':>9} {'ttft p50':>9} {'ttft last':>10}")
+    try:
+        for provider, streamer in (('openai', app.bot._stream_openai_api), ('ollama', app.bot._stream_ollama_local)):
+            for reuse in (False, True):
+                server.openai_prompts.clear()
+                before = server.evaluated_tokens
+                first_token = run_session(streamer, args.turns, reuse)
+                evaluated = server.evaluated_tokens - before
+                print(
+                    f"{provider:<10} {'reuse' if reuse else 'no reuse':<10} {evaluated:>10} {evaluated / args.turns:>9.0f} "
+                    f"{statistics.median(first_token) * 1000:>7.1f}ms {first_token[-1] * 1000:>8.1f}ms"
+                )
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Tokens per second of the in-process local LLM, one prompt per call vs. micro-batched.
+
+--clients callers each ask for --replies-per-client tutor replies. The table
+reports aggregate generated tokens per second, per-reply latency and the mean
+batch size for each LOCAL_LLM_MAX_BATCH setting.
+
+The default engine is FakeLocalLLMEngine from fakes.py. Each of its decode
+steps costs --step-ms for the whole batch plus --row-ms per prompt, which is
+the shape of CPU decoding with a small model. To measure a real model, pass
+--engine transformers (needs transformers and torch).
+
+Usage (from backend/):
+    python benchmarks/bench_local_llm.py [--clients 1 4 8] [--batches 1 4 8]
+    python benchmarks/bench_local_llm.py --engine transformers --model HuggingFaceTB/SmolLM2-135M-Instruct
+"""
+import os
+import sys
+import time
+import argparse
+import functools
+import statistics
+import threading
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+from fakes import SAMPLE_TRANSCRIPTS, FakeLocalLLMEngine  # noqa: E402
+from local_llm import LocalLLM  # noqa: E402
+
+SYSTEM_PROMPT = "You are a helpful English learning tutor. Keep responses between 2-3 sentences."
+
+
+def run(llm, clients, replies_per_client):
+    latencies = []
+    lock = threading.Lock()
+
+    def client(index):
+        for turn in range(replies_per_client):
+            text = SAMPLE_TRANSCRIPTS[(index + turn) % len(SAMPLE_TRANSCRIPTS)]
+            messages = [{'role': 'system', 'content': SYSTEM_PROMPT}, {'role': 'user', 'content': text}]
+            started = time.perf_counter()
+            llm.generate(messages)
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--engine', default=None, help="local_llm engine (default: FakeLocalLLMEngine from fakes.py)")
+    parser.add_argument('--model', default='HuggingFaceTB/SmolLM2-360M-Instruct')
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--batches', type=int, nargs='+', default=[1, 4, 8], help="LOCAL_LLM_MAX_BATCH values to compare")
+    parser.add_argument('--replies-per-client', type=int, default=3)
+    parser.add_argument('--max-tokens', type=int, default=60)
+    parser.add_argument('--batch-wait', type=float, default=0.02)
+    parser.add_argument('--step-ms', type=float, default=8, help="fake engine cost per decode step")
+    parser.add_argument('--row-ms', type=float, default=1, help="fake engine cost per prompt per decode step")
+    args = parser.parse_args()
+
+    if args.engine:
+        engine = args.engine
+    else:
+        engine = functools.partial(FakeLocalLLMEngine, step_seconds=args.step_ms / 1000, row_seconds=args.row_ms / 1000)
+
+    print(f"{'clients':>7} {'max batch':>9} {'tokens/s':>9} {'p50':>7} {'p95':>7} {'batch':>6}")
+    for clients in args.clients:
+        for max_batch in args.batches:
+            llm = LocalLLM(
+                engine, args.model, max_tokens=args.max_tokens, max_queue=clients * 2,
+                max_batch=max_batch, batch_wait=args.batch_wait if max_batch > 1 else 0,
+            )
+            try:
+                if not llm.warm():
+                    print(f"engine unavailable ({llm.state})")
+                    return
+                elapsed, latencies = run(llm, clients, args.replies_per_client)
+                stats = llm.stats()
+            finally:
+                llm.close()
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            print(
+                f"{clients:>7} {max_batch:>9} {stats['generated_tokens'] / elapsed:>9.1f}"
+                f" {statistics.median(latencies):>6.2f}s {p95:>6.2f}s {stats['mean_batch_size']:>6}"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""Real-time factor of local speech-to-text: processing time per second of audio.
+
+Each configuration is warmed first, so model loading is not counted. Then
+--clients callers send --clips-per-client clips each. The table reports:
+    RTF        busy time / audio seconds (below 1 is faster than real time)
+    p50 / p95  per-clip latency
+    batch      mean clips per engine call
+    tick lag   worst delay of a 5 ms timer on the calling process. A model that
+               holds the GIL stalls it; one in a separate process does not.
+
+The default engine is ToneEngine from fakes.py. It decodes tone_words_clip()
+audio and spins the CPU for --cost seconds per audio second, so the pool and
+batching overheads show up against a known compute cost. To measure a real
+model, pass --engine faster-whisper and --wav with recorded speech.
+
+Usage (from backend/):
+    python benchmarks/bench_local_stt.py [--clients 1 4] [--cost 0.1] [--batch-cost 0.05]
+    python benchmarks/bench_local_stt.py --engine faster-whisper --model base.en --wav clip1.wav clip2.wav
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import functools
+import statistics
+import threading
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+from fakes import TONE_WORDS, ToneEngine, tone_words_clip  # noqa: E402
+from audio_preprocessing import decode_wav  # noqa: E402
+from local_stt import LocalSpeechToText  # noqa: E402
+
+CONFIGURATIONS = [
+    # (label, pool, workers, max batch)
+    ('thread x1', 'thread', 1, 1),
+    ('process x1', 'process', 1, 1),
+    ('process x2', 'process', 2, 1),
+    ('process x2 batch 4', 'process', 2, 4),
+]
+
+
+def tone_clips(count, seconds, seed):
+    rng = random.Random(seed)
+    clips = []
+    for _ in range(count):
+        words = [rng.choice(TONE_WORDS) for _ in range(max(1, int(seconds / 0.7)))]
+        clips.append(tone_words_clip(words))
+    return clips
+
+
+def clip_seconds(clip):
+    decoded = decode_wav(clip)
+    return len(decoded[0]) / decoded[1] if decoded else 0.0
+
+
+class TickLag:
+    """Worst overshoot of a short sleep on this process while the benchmark runs"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.worst = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.perf_counter()
+            time.sleep(self.interval)
+            self.worst = max(self.worst, time.perf_counter() - started - self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run(stt, clips, clients):
+    latencies = []
+    lock = threading.Lock()
+
+    def client(assigned):
+        for clip in assigned:
+            started = time.perf_counter()
+            stt.transcribe(clip)
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=client, args=(clips[index::clients],)) for index in range(clients)]
+    with TickLag() as lag:
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    return elapsed, sorted(latencies), lag.worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--engine', default=None, help="local_stt engine (default: ToneEngine from fakes.py)")
+    parser.add_argument('--model', default='tiny.en')
+    parser.add_argument('--wav', nargs='+', default=None, help="speech recordings to transcribe (real engines)")
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--clips-per-client', type=int, default=4)
+    parser.add_argument('--clip-seconds', type=float, default=5)
+    parser.add_argument('--cost', type=float, default=0.1, help="ToneEngine CPU seconds per audio second")
+    parser.add_argument('--batch-cost', type=float, default=0.05, help="ToneEngine CPU seconds per engine call")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    if args.engine:
+        engine = args.engine
+    else:
+        engine = functools.partial(ToneEngine, seconds_per_audio_second=args.cost, batch_seconds=args.batch_cost)
+
+    print(f"{'configuration':<20} {'clients':>7} {'audio':>7} {'RTF':>6} {'p50':>7} {'p95':>7} {'batch':>6} {'tick lag':>9}")
+    for clients in args.clients:
+        count = clients * args.clips_per_client
+        if args.wav:
+            recordings = [open(path, 'rb').read() for path in args.wav]
+            clips = [recordings[index % len(recordings)] for index in range(count)]
+        else:
+            clips = tone_clips(count, args.clip_seconds, args.seed)
+        audio_seconds = sum(clip_seconds(clip) for clip in clips)
+
+        for label, pool, workers, max_batch in CONFIGURATIONS:
+            stt = LocalSpeechToText(
+                engine, model=args.model, pool=pool, workers=workers,
+                max_queue=count, max_batch=max_batch, batch_wait=0.01 if max_batch > 1 else 0,
+            )
+            try:
+                if not stt.warm():
+                    print(f"{label:<20} engine unavailable ({stt.state})")
+                    continue
+                elapsed, latencies, lag = run(stt, clips, clients)
+                stats = stt.stats()
+            finally:
+                stt.close()
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            print(
+                f"{label:<20} {clients:>7} {audio_seconds:>6.0f}s {elapsed / audio_seconds:>6.3f}"
+                f" {statistics.median(latencies):>6.2f}s {p95:>6.2f}s {stats['mean_batch_size']:>6}"
+                f" {lag * 1000:>7.1f}ms"
+            )
+
+
+if __name__ == '__main__':
+    main()
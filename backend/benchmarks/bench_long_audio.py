@@ -0,0 +1,88 @@
+"""Wall-clock transcription time vs. clip length: one synchronous request vs. chunked parallel recognition.
+
+The recognizer is ToneSpeechClient from fakes.py, which takes time in
+proportion to the audio it is sent (like a real recognizer) and rejects clips
+over a minute (like synchronous Google recognition). Transcripts are checked
+against the words in the clip, so stitching errors show up as "wrong".
+
+Usage (from backend/):
+    python benchmarks/bench_long_audio.py [--lengths 30 60 120 300 600] [--concurrency 1 4 8]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from types import SimpleNamespace
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+from fakes import TONE_WORDS, Latency, ToneSpeechClient, tone_words_clip  # noqa: E402
+from long_audio import ChunkedTranscriber  # noqa: E402
+
+WORD_SECONDS = 0.4
+GAP_SECONDS = 0.3
+
+
+def clip_for(seconds, seed):
+    rng = random.Random(seed)
+    words = [rng.choice(TONE_WORDS) for _ in range(int(seconds / (WORD_SECONDS + GAP_SECONDS)))]
+    return words, tone_words_clip(words, word_seconds=WORD_SECONDS, gap_seconds=GAP_SECONDS)
+
+
+def transcript_of(client, content):
+    response = client.recognize(audio=SimpleNamespace(content=content))
+    return " ".join(result.alternatives[0].transcript for result in response.results)
+
+
+def run_single(client, words, clip):
+    start = time.perf_counter()
+    try:
+        transcript = transcript_of(client, clip)
+    except ValueError:
+        return None, 'rejected'
+    return time.perf_counter() - start, 'ok' if transcript == " ".join(words) else 'wrong'
+
+
+def run_chunked(client, words, clip, concurrency, chunk_seconds, overlap_seconds):
+    transcriber = ChunkedTranscriber(chunk_seconds, overlap_seconds, concurrency)
+    start = time.perf_counter()
+    try:
+        transcript = transcriber.transcribe(clip, lambda content, audio_format: transcript_of(client, content))
+        if transcript is None:
+            transcript = transcript_of(client, clip)
+    finally:
+        transcriber.close()
+    return time.perf_counter() - start, 'ok' if transcript == " ".join(words) else 'wrong'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lengths', type=float, nargs='+', default=[30, 60, 120, 300, 600], help="clip lengths in seconds")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--chunk-seconds', type=float, default=50)
+    parser.add_argument('--overlap-seconds', type=float, default=1.0)
+    parser.add_argument('--latency', type=float, default=0.2, help="fixed recognizer latency per request")
+    parser.add_argument('--realtime-factor', type=float, default=0.02, help="recognizer seconds per second of audio")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    client = ToneSpeechClient(Latency(args.latency), seconds_per_audio_second=args.realtime_factor)
+    columns = ['single'] + [f'chunked x{n}' for n in args.concurrency]
+    print(f"{'clip':>8}  " + "  ".join(f"{name:>14}" for name in columns))
+    for seconds in args.lengths:
+        words, clip = clip_for(seconds, args.seed)
+        cells = []
+        for name in columns:
+            if name == 'single':
+                elapsed, outcome = run_single(client, words, clip)
+            else:
+                concurrency = int(name.split('x')[1])
+                elapsed, outcome = run_chunked(client, words, clip, concurrency, args.chunk_seconds, args.overlap_seconds)
+            cells.append(f"{elapsed:.2f}s" if outcome == 'ok' else f"{elapsed:.2f}s {outcome}" if elapsed else outcome)
+        print(f"{seconds:>7.0f}s  " + "  ".join(f"{cell:>14}" for cell in cells))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,512 @@
+"""Local stand-ins for every upstream, with configurable latency and error injection.
+
+FakeUpstreamServer answers LanguageTool (/v2/check), the OpenAI chat API
+(/v1/chat/completions, plain and streamed), Ollama (/api/generate, plain and
+streamed) and Hugging Face inference (/hf-inference/...) on one local port.
+The OpenAI and Ollama fakes model prompt caching (a seen prefix, a posted
+context) and can charge time per prompt token they still have to evaluate.
+FakeSpeechClient / FakeTextToSpeechClient replace the Google clients in-process;
+ToneSpeechClient actually listens to PCM audio built by tone_words_clip(), so
+how audio is cut up before recognition shows in the transcript; ToneEngine
+does the same as a local speech-to-text engine. FakeLocalLLMEngine stands in
+for the in-process LLM.
+
+Run standalone to point a separately started server at the fakes:
+    python benchmarks/fakes.py --port 8765 --latency 0.05 --error-rate 0.05
+and export the printed environment variables before starting uvicorn.
+"""
+import json
+import time
+import zlib
+import random
+import argparse
+import threading
+from types import SimpleNamespace
+from urllib.parse import parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SAMPLE_TRANSCRIPTS = [
+    "hello how are you today",
+    "i would like to practice english",
+    "she go to school every day",
+    "Thank you for helping me learn",
+    "What a beautiful day it is",
+    "can you help me with english grammar?",
+    "I enjoy learning new languages",
+    "he don't like the the movie",
+    "How do you spell this word?",
+    "i want to improve my speaking skills",
+]
+
+SAMPLE_REPLY = "Great job practicing today! Your sentence was clear. What else would you like to talk about?"
+
+
+class Latency:
+    """Latency and failure profile of one fake upstream"""
+
+    def __init__(self, mean=0.0, jitter=0.0, error_rate=0.0, seed=None):
+        self.mean = mean
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            delay = self.mean + self._random.uniform(-self.jitter, self.jitter) if self.jitter else self.mean
+        if delay > 0:
+            time.sleep(delay)
+
+    def should_fail(self):
+        if not self.error_rate:
+            return False
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+
+def fake_tokens(text):
+    """Word-level token ids, enough to model a prompt cache"""
+    return [zlib.crc32(word.encode()) & 0x7fffffff for word in text.split()]
+
+
+def common_prefix(a, b):
+    size = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        size += 1
+    return size
+
+
+def languagetool_matches(text):
+    """Flag lowercase standalone 'i' and a lowercase sentence start, like LanguageTool would"""
+    matches = []
+    if text[:1].islower():
+        matches.append({'offset': 0, 'length': 1, 'message': 'Uppercase', 'replacements': [{'value': text[0].upper()}]})
+    for index in range(len(text)):
+        if text[index] == 'i' and index > 0 and (index + 1 == len(text) or not text[index + 1].isalpha()) and not text[index - 1].isalpha():
+            matches.append({'offset': index, 'length': 1, 'message': 'Pronoun', 'replacements': [{'value': 'I'}]})
+    return matches
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type='application/json'):
+        payload = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_stream(self, chunks, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for chunk in chunks:
+            data = chunk.encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_POST(self):
+        server = self.server.fakes
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        service = server.service_for(self.path)
+        if service is None:
+            self._send(404, {'error': 'unknown upstream'})
+            return
+        server.count(service)
+        profile = server.profiles[service]
+        profile.wait()
+        if profile.should_fail():
+            self._send(503, {'error': f'injected {service} failure'})
+            return
+
+        if service == 'languagetool':
+            text = parse_qs(body.decode()).get('text', [''])[0]
+            self._send(200, {'matches': languagetool_matches(text)})
+            return
+
+        request = json.loads(body or b'{}')
+        words = [word + ' ' for word in SAMPLE_REPLY.split(' ')]
+        if service == 'openai':
+            prompt = fake_tokens(" ".join(message['content'] for message in request.get('messages', [])))
+            cached = server.openai_cached_tokens(prompt)
+            server.evaluate(len(prompt) - cached)
+            usage = {'prompt_tokens': len(prompt), 'prompt_tokens_details': {'cached_tokens': cached}}
+            if request.get('stream'):
+                chunks = [f"data: {json.dumps({'choices': [{'delta': {'content': w}}]})}\n\n" for w in words]
+                if request.get('stream_options', {}).get('include_usage'):
+                    chunks.append(f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n")
+                self._send_stream(chunks + ["data: [DONE]\n\n"], 'text/event-stream')
+            else:
+                self._send(200, {'choices': [{'message': {'content': SAMPLE_REPLY}}], 'usage': usage})
+        elif service == 'ollama':
+            # Like Ollama: a posted context is already evaluated, only the new prompt is
+            prompt = fake_tokens(request.get('prompt', ''))
+            server.evaluate(len(prompt))
+            final = {
+                'done': True,
+                'context': list(request.get('context') or []) + prompt + fake_tokens(SAMPLE_REPLY),
+                'prompt_eval_count': len(prompt),
+            }
+            if request.get('stream'):
+                chunks = [json.dumps({'response': w, 'done': False}) + "\n" for w in words]
+                self._send_stream(chunks + [json.dumps({'response': '', **final}) + "\n"], 'application/x-ndjson')
+            else:
+                self._send(200, {'response': SAMPLE_REPLY, **final})
+        else:
+            self._send(200, [{'generated_text': f"{request.get('inputs', '')} {SAMPLE_REPLY}"}])
+
+
+class FakeUpstreamServer:
+    """LanguageTool, OpenAI, Ollama and Hugging Face fakes served from one local HTTP server"""
+
+    ROUTES = (
+        ('/v2/check', 'languagetool'),
+        ('/v1/chat/completions', 'openai'),
+        ('/api/generate', 'ollama'),
+        ('/hf-inference', 'huggingface'),
+    )
+
+    def __init__(self, host='127.0.0.1', port=0, profiles=None, prompt_token_seconds=0.0):
+        self.host = host
+        self.port = port
+        self.profiles = {service: Latency() for _, service in self.ROUTES}
+        self.profiles.update(profiles or {})
+        self.requests = {service: 0 for _, service in self.ROUTES}
+        # Time an LLM fake spends per prompt token it has to evaluate (not cached)
+        self.prompt_token_seconds = prompt_token_seconds
+        self.evaluated_tokens = 0
+        self.openai_prompts = []
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def service_for(self, path):
+        for prefix, service in self.ROUTES:
+            if path.startswith(prefix):
+                return service
+        return None
+
+    def count(self, service):
+        with self._lock:
+            self.requests[service] += 1
+
+    def evaluate(self, tokens):
+        """Spend the prompt evaluation time for tokens the fake LLM has to read"""
+        with self._lock:
+            self.evaluated_tokens += tokens
+        if self.prompt_token_seconds and tokens > 0:
+            time.sleep(tokens * self.prompt_token_seconds)
+
+    def openai_cached_tokens(self, prompt):
+        """Longest prefix shared with a recent prompt, like OpenAI's automatic prompt caching"""
+        with self._lock:
+            cached = max((common_prefix(prompt, seen) for seen in self.openai_prompts), default=0)
+            self.openai_prompts = (self.openai_prompts + [prompt])[-64:]
+        return cached
+
+    def start(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._server.daemon_threads = True
+        self._server.fakes = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-upstreams', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    @property
+    def base_url(self):
+        return f'http://{self.host}:{self.port}'
+
+    def env(self):
+        """Environment variables that point the app at these fakes"""
+        return {
+            'LANGUAGETOOL_URL': f'{self.base_url}/v2/check',
+            'OPENAI_API_URL': f'{self.base_url}/v1/chat/completions',
+            'OLLAMA_URL': f'{self.base_url}/api/generate',
+            'HUGGINGFACE_API_URL': f'{self.base_url}/hf-inference/models/fake',
+            'OPENAI_API_KEY': 'fake-openai-key',
+            'HUGGINGFACE_API_KEY': 'fake-hf-key',
+        }
+
+
+class FakeSpeechClient:
+    """Stands in for google.cloud.speech.SpeechClient"""
+
+    def __init__(self, profile=None, transcripts=SAMPLE_TRANSCRIPTS):
+        self.profile = profile or Latency()
+        self.transcripts = transcripts
+        self.calls = 0
+
+    def _transcript_for(self, content):
+        return self.transcripts[len(content) % len(self.transcripts)]
+
+    def recognize(self, config=None, audio=None):
+        self.calls += 1
+        self.profile.wait()
+        if self.profile.should_fail():
+            raise RuntimeError("injected speech failure")
+        alternative = SimpleNamespace(transcript=self._transcript_for(audio.content))
+        return SimpleNamespace(results=[SimpleNamespace(alternatives=[alternative], is_final=True)])
+
+    def streaming_recognize(self, config=None, requests=None):
+        self.calls += 1
+        content = b"".join(request.audio_content for request in requests)
+        self.profile.wait()
+        if self.profile.should_fail():
+            raise RuntimeError("injected speech failure")
+        transcript = self._transcript_for(content)
+        words = transcript.split()
+        for count in range(1, len(words)):
+            partial = SimpleNamespace(transcript=" ".join(words[:count]))
+            yield SimpleNamespace(results=[SimpleNamespace(alternatives=[partial], is_final=False)])
+        final = SimpleNamespace(transcript=transcript)
+        yield SimpleNamespace(results=[SimpleNamespace(alternatives=[final], is_final=True)])
+
+
+# Words spoken by tone_words_clip(), one tone frequency each
+TONE_WORDS = (
+    "today", "i", "want", "to", "practice", "my", "english", "with", "you",
+    "because", "speaking", "every", "day", "helps", "me", "learn",
+)
+TONE_BASE_HZ = 200
+TONE_STEP_HZ = 60
+
+
+def tone_words_clip(words, sample_rate=16000, word_seconds=0.4, gap_seconds=0.3, amplitude=8000):
+    """16-bit mono WAV where each word is a burst of its own tone, separated by silence"""
+    import numpy as np
+    from audio_preprocessing import encode_wav
+
+    t = np.arange(int(sample_rate * word_seconds)) / sample_rate
+    gap = np.zeros(int(sample_rate * gap_seconds))
+    pieces = [gap]
+    for word in words:
+        frequency = TONE_BASE_HZ + TONE_STEP_HZ * TONE_WORDS.index(word)
+        pieces.extend([amplitude * np.sin(2 * np.pi * frequency * t), gap])
+    return encode_wav(np.concatenate(pieces), sample_rate)
+
+
+class ToneSpeechClient:
+    """A recognizer for tone_words_clip() audio, with synchronous recognition's one-minute limit"""
+
+    def __init__(self, profile=None, seconds_per_audio_second=0.0, max_seconds=60.0, min_word_seconds=0.2):
+        self.profile = profile or Latency()
+        self.seconds_per_audio_second = seconds_per_audio_second
+        self.max_seconds = max_seconds
+        self.min_word_seconds = min_word_seconds
+        self.transcripts = list(TONE_WORDS)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def words_in(self, content):
+        """Decode the tone bursts in a WAV back into words; returns (words, duration in seconds)"""
+        import numpy as np
+        from audio_preprocessing import decode_wav
+
+        mono, sample_rate = decode_wav(bytes(content))
+        frame = sample_rate // 100
+        count = len(mono) // frame
+        rms = np.sqrt(np.mean(mono[:count * frame].reshape(count, frame) ** 2, axis=1))
+        voiced = np.concatenate([[False], rms > 1000, [False]])
+        edges = np.flatnonzero(voiced[1:] != voiced[:-1])
+        words = []
+        for start, end in zip(edges[::2] * frame, edges[1::2] * frame):
+            if (end - start) / sample_rate < self.min_word_seconds:
+                continue  # a clipped fragment at the edge of the audio
+            burst = mono[start:end]
+            frequency = np.count_nonzero(np.diff(np.signbit(burst))) / 2 / ((end - start) / sample_rate)
+            index = int(round((frequency - TONE_BASE_HZ) / TONE_STEP_HZ))
+            words.append(TONE_WORDS[min(max(index, 0), len(TONE_WORDS) - 1)])
+        return words, len(mono) / sample_rate
+
+    def recognize(self, config=None, audio=None):
+        with self._lock:
+            self.calls += 1
+        words, duration = self.words_in(audio.content)
+        if duration > self.max_seconds:
+            raise ValueError(f"Sync input too long ({duration:.1f}s); use long-running recognition")
+        self.profile.wait()
+        if self.seconds_per_audio_second:
+            time.sleep(duration * self.seconds_per_audio_second)
+        if self.profile.should_fail():
+            raise RuntimeError("injected speech failure")
+        alternative = SimpleNamespace(transcript=" ".join(words))
+        return SimpleNamespace(results=[SimpleNamespace(alternatives=[alternative], is_final=True)])
+
+
+def burn_cpu(seconds):
+    """Spin for a while holding the GIL, the way pure-Python model code would"""
+    until = time.perf_counter() + seconds
+    while time.perf_counter() < until:
+        pass
+
+
+class ToneEngine:
+    """A local speech-to-text engine (local_stt) for tone_words_clip() audio.
+
+    Costs CPU like a model: batch_seconds per call plus seconds_per_audio_second
+    per clip, spent spinning so that it holds the GIL.
+    """
+
+    def __init__(self, model=None, language=None, threads=0, seconds_per_audio_second=0.0, batch_seconds=0.0, load_seconds=0.0, fail_on=None):
+        time.sleep(load_seconds)
+        self.recognizer = ToneSpeechClient(max_seconds=float('inf'))
+        self.seconds_per_audio_second = seconds_per_audio_second
+        self.batch_seconds = batch_seconds
+        self.fail_on = fail_on  # clips starting with these bytes raise
+        self.batch_sizes = []
+
+    def transcribe_batch(self, clips):
+        self.batch_sizes.append(len(clips))
+        burn_cpu(self.batch_seconds)
+        transcripts = []
+        for clip in clips:
+            if self.fail_on and clip.startswith(self.fail_on):
+                raise ValueError("undecodable clip")
+            words, duration = self.recognizer.words_in(clip)
+            burn_cpu(duration * self.seconds_per_audio_second)
+            transcripts.append(" ".join(words))
+        return transcripts
+
+
+class FakeLocalLLMEngine:
+    """A local LLM engine (local_llm) whose cost has the shape of CPU decoding.
+
+    Each decode step costs step_seconds for the whole batch plus row_seconds per
+    prompt in it, so batching prompts raises tokens per second the way it does
+    for a real model. One word of SAMPLE_REPLY is one token.
+    """
+
+    def __init__(self, model=None, threads=0, step_seconds=0.0, row_seconds=0.0, load_seconds=0.0):
+        time.sleep(load_seconds)
+        self.step_seconds = step_seconds
+        self.row_seconds = row_seconds
+        self.words = SAMPLE_REPLY.split()
+        self.calls = []  # (batch size, max_new_tokens, max_time)
+
+    def generate_batch(self, prompts, max_new_tokens, max_time=None):
+        self.calls.append((len(prompts), list(max_new_tokens), max_time))
+        started = time.perf_counter()
+        steps = 0
+        while steps < min(max(max_new_tokens), len(self.words)):
+            if max_time is not None and time.perf_counter() - started >= max_time:
+                break
+            time.sleep(self.step_seconds + self.row_seconds * len(prompts))
+            steps += 1
+        replies = []
+        for limit in max_new_tokens:
+            words = self.words[:min(steps, limit)]
+            replies.append((" ".join(words), len(words)))
+        return replies
+
+
+class FakeTextToSpeechClient:
+    """Stands in for google.cloud.texttospeech.TextToSpeechClient"""
+
+    def __init__(self, profile=None, bytes_per_char=120):
+        self.profile = profile or Latency()
+        self.bytes_per_char = bytes_per_char
+        self.calls = 0
+
+    def synthesize_speech(self, input=None, voice=None, audio_config=None):
+        self.calls += 1
+        self.profile.wait()
+        if self.profile.should_fail():
+            raise RuntimeError("injected TTS failure")
+        # Roughly MP3-sized output, deterministic per text
+        seed = input.text.encode()
+        size = max(len(input.text), 1) * self.bytes_per_char
+        return SimpleNamespace(audio_content=(seed * (size // len(seed) + 1))[:size] if seed else b"")
+
+
+def _message_type(**defaults):
+    """A keyword-argument record type standing in for a protobuf message"""
+    def build(**kwargs):
+        return SimpleNamespace(**{**defaults, **kwargs})
+    return build
+
+
+def fake_speech_module():
+    """The parts of google.cloud.speech the app uses"""
+    return SimpleNamespace(
+        RecognitionAudio=_message_type(content=b""),
+        RecognitionConfig=_recognition_config(),
+        StreamingRecognitionConfig=_message_type(),
+        StreamingRecognizeRequest=_message_type(audio_content=b""),
+    )
+
+
+def _recognition_config():
+    # Called to build a config and also carries the AudioEncoding enum
+    build = _message_type()
+    build.AudioEncoding = SimpleNamespace(
+        WEBM_OPUS='WEBM_OPUS', LINEAR16='LINEAR16', OGG_OPUS='OGG_OPUS', FLAC='FLAC', MULAW='MULAW',
+    )
+    return build
+
+
+def fake_texttospeech_module():
+    """The parts of google.cloud.texttospeech the app uses"""
+    return SimpleNamespace(
+        SynthesisInput=_message_type(text=""),
+        VoiceSelectionParams=_message_type(),
+        SsmlVoiceGender=SimpleNamespace(NEUTRAL='NEUTRAL'),
+        AudioConfig=_message_type(),
+        AudioEncoding=SimpleNamespace(MP3='MP3', OGG_OPUS='OGG_OPUS'),
+    )
+
+
+def install_google_fakes(app_module, speech_profile=None, tts_profile=None, speech_client=None):
+    """Point the app's speech globals at fake Google clients; returns (speech_client, tts_client)"""
+    speech_client = speech_client or FakeSpeechClient(speech_profile)
+    tts_client = FakeTextToSpeechClient(tts_profile)
+    app_module.speech = fake_speech_module()
+    app_module.texttospeech = fake_texttospeech_module()
+    app_module.speech_client = speech_client
+    app_module.tts_client = tts_client
+    app_module.google_cloud_enabled = True
+    app_module.google_clients_state = 'ready'
+    return speech_client, tts_client
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.05, help="mean upstream latency in seconds")
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--prompt-token-ms', type=float, default=0.0, help="LLM prompt evaluation time per uncached token")
+    args = parser.parse_args()
+
+    profiles = {
+        service: Latency(args.latency, args.jitter, args.error_rate, seed=args.seed)
+        for _, service in FakeUpstreamServer.ROUTES
+    }
+    server = FakeUpstreamServer(args.host, args.port, profiles, args.prompt_token_ms / 1000).start()
+    for name, value in server.env().items():
+        print(f"export {name}={value}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
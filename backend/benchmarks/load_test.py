@@ -0,0 +1,199 @@
+"""Load generator for the voice endpoints (/chat/voice and /audio).
+
+By default the app runs in-process against the local fakes in fakes.py, so
+results are reproducible without network access or credentials. With --url
+it drives a separately running server instead (start that one with the env
+printed by fakes.py for the same upstream profile).
+
+Every run is saved to benchmarks/results/<time>-<commit>.json; pass
+--compare with an earlier results file to print the change per endpoint.
+
+Usage (from backend/):
+    python benchmarks/load_test.py --requests 200 --concurrency 20 --latency 0.05
+    python benchmarks/load_test.py --error-rate 0.1 --compare benchmarks/results/<earlier>.json
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import subprocess
+from datetime import datetime
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+import httpx  # noqa: E402
+
+from fakes import FakeUpstreamServer, Latency, install_google_fakes  # noqa: E402
+
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, 'results')
+ENDPOINTS = ('/chat/voice', '/audio')
+
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies, errors, elapsed):
+    ms = lambda value: round(value * 1000, 1) if value is not None else None  # noqa: E731
+    return {
+        'requests': len(latencies) + errors,
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+    }
+
+
+async def drive(client, endpoint, total, concurrency, audio_bytes):
+    """Send `total` uploads to one endpoint with `concurrency` in flight; returns the summary"""
+    latencies = []
+    errors = 0
+    next_request = 0
+
+    async def worker():
+        nonlocal errors, next_request
+        while next_request < total:
+            index = next_request
+            next_request += 1
+            # Vary the clip size so transcripts (and cache keys) vary like real traffic
+            payload = b'\x1a' * (audio_bytes + index % 97)
+            start = time.perf_counter()
+            try:
+                response = await client.post(endpoint, files={'file': (f'clip-{index}.webm', payload, 'audio/webm')})
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+def configure_in_process_app(fakes, args):
+    """Import the app and point every upstream at the fakes"""
+    os.environ.update(fakes.env())
+    import main
+
+    # Per-request INFO logs would dominate the measurement
+    logging.getLogger().setLevel(args.log_level)
+    main.LANGUAGETOOL_URL = os.environ['LANGUAGETOOL_URL']
+    main.OPENAI_API_URL = os.environ['OPENAI_API_URL']
+    main.OLLAMA_URL = os.environ['OLLAMA_URL']
+    main.HUGGINGFACE_API_URL = os.environ['HUGGINGFACE_API_URL']
+    main.HUGGINGFACE_API_KEY = os.environ['HUGGINGFACE_API_KEY']
+    main.TUTOR_REPLY_MODE = args.reply_mode
+    google_profile = lambda: Latency(args.latency, args.jitter, args.error_rate, seed=args.seed)  # noqa: E731
+    install_google_fakes(main, google_profile(), google_profile())
+    return main
+
+
+async def run(args):
+    fakes = None
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=60)
+        app_module = None
+    else:
+        profiles = {
+            service: Latency(args.latency, args.jitter, args.error_rate, seed=args.seed)
+            for _, service in FakeUpstreamServer.ROUTES
+        }
+        fakes = FakeUpstreamServer(profiles=profiles).start()
+        app_module = configure_in_process_app(fakes, args)
+        client = httpx.AsyncClient(app=app_module.app, base_url='http://load-test', timeout=60)
+
+    results = {}
+    try:
+        async with client:
+            for endpoint in args.endpoints:
+                results[endpoint] = await drive(client, endpoint, args.requests, args.concurrency, args.audio_bytes)
+    finally:
+        if app_module is not None:
+            app_module.shutdown_blocking_executor()
+            app_module.http_clients.close()
+        if fakes is not None:
+            fakes.stop()
+    return results
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=BACKEND_DIR, capture_output=True, text=True).stdout.strip()
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def save_results(record, directory=RESULTS_DIR):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{record['commit']}.json")
+    with open(path, 'w') as f:
+        json.dump(record, f, indent=2)
+    return path
+
+
+def print_results(results, baseline=None):
+    for endpoint, summary in results.items():
+        print(f"{endpoint}:")
+        before = (baseline or {}).get(endpoint, {})
+        for key in ('requests', 'errors', 'throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms'):
+            line = f"  {key}: {summary[key]}"
+            if before.get(key) not in (None, 0) and summary[key] is not None:
+                change = (summary[key] - before[key]) / before[key] * 100
+                line += f"  ({change:+.1f}% vs {before[key]})"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help="drive a running server instead of the in-process app")
+    parser.add_argument('--endpoints', nargs='+', default=list(ENDPOINTS))
+    parser.add_argument('--requests', type=int, default=200, help="requests per endpoint")
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--audio-bytes', type=int, default=32000)
+    parser.add_argument('--latency', type=float, default=0.05, help="mean fake upstream latency in seconds")
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--reply-mode', default='chat', choices=('chat', 'feedback'))
+    parser.add_argument('--log-level', default='ERROR')
+    parser.add_argument('--label', default='', help="free-form note stored with the results")
+    parser.add_argument('--compare', help="earlier results file to compare against")
+    parser.add_argument('--no-save', action='store_true')
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+    print_results(results, baseline)
+
+    if not args.no_save:
+        config = {key: value for key, value in vars(args).items() if key not in ('compare', 'no_save')}
+        record = {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'label': args.label,
+            'config': config,
+            'results': results,
+        }
+        print(f"Saved results to {save_results(record)}")
+
+
+if __name__ == '__main__':
+    main()
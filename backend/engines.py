@@ -0,0 +1,27 @@
+"""Pluggable local inference engines, named or given as "module:factory".
+
+local_stt and local_llm each keep a table of built-in engine names. Any other
+name is read as "module:factory". A callable is used as the factory itself
+(picklable, so process pools can build it in their workers).
+"""
+import importlib
+import importlib.util
+
+
+def engine_available(engine, engines=None, requires=None):
+    """Whether the engine's module can be imported, without importing it"""
+    if callable(engine):
+        return True
+    module_name = (requires or {}).get(engine) or (engines or {}).get(engine, engine).partition(':')[0]
+    try:
+        return importlib.util.find_spec(module_name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def load_engine(engine, options, engines=None):
+    """Build an engine from its name, a "module:factory" string or a (picklable) factory"""
+    if callable(engine):
+        return engine(**options)
+    module_name, _, attribute = (engines or {}).get(engine, engine).partition(':')
+    return getattr(importlib.import_module(module_name), attribute)(**options)
@@ -0,0 +1,211 @@
+"""Cache for grammar corrections: bounded in-memory LRU with TTL and an optional sqlite tier."""
+import os
+import time
+import logging
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from shared_state import shared_state_path
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def normalize_text(text):
+    """Normalize text for cache keys without changing what the checker returns.
+
+    Unicode is NFC-normalized and whitespace runs are collapsed. Case is kept:
+    capitalization is itself something the grammar checker corrects.
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class GrammarCache:
+    """LRU + TTL cache with an optional on-disk tier and single-flight lookups"""
+
+    def __init__(self, max_entries=2048, ttl_seconds=86400, db_path=None, clock=time.time):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._inflight = {}  # key -> Future shared by concurrent identical lookups
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.collapsed = 0
+
+        self._db = None
+        self._db_lock = threading.Lock()
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS grammar_cache "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+            logger.info(f"Grammar cache persistent tier at {db_path}")
+
+    def _get_memory(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        value, expires_at = entry
+        if expires_at <= now:
+            del self._entries[key]
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def _put_memory(self, key, value, expires_at):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _get_disk(self, key, now):
+        if self._db is None:
+            return _MISSING, None
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM grammar_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return _MISSING, None
+            if row[1] <= now:
+                self._db.execute("DELETE FROM grammar_cache WHERE key = ?", (key,))
+                self._db.commit()
+                return _MISSING, None
+        return row[0], row[1]
+
+    def _put_disk(self, key, value, expires_at):
+        if self._db is None:
+            return
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO grammar_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, expires_at),
+                )
+                self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Grammar cache disk write failed: {e}")
+
+    def get(self, key):
+        """Return the cached value for key, or None"""
+        value = self._lookup(key)
+        return None if value is _MISSING else value
+
+    def _lookup(self, key):
+        now = self.clock()
+        with self._lock:
+            value = self._get_memory(key, now)
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+        try:
+            value, expires_at = self._get_disk(key, now)
+        except sqlite3.Error as e:
+            logger.warning(f"Grammar cache disk read failed: {e}")
+            value = _MISSING
+        with self._lock:
+            if value is _MISSING:
+                self.misses += 1
+                return _MISSING
+            self.hits += 1
+            self.disk_hits += 1
+            self._put_memory(key, value, expires_at)
+        return value
+
+    def set(self, key, value):
+        """Store a value in memory and, if configured, on disk"""
+        expires_at = self.clock() + self.ttl_seconds
+        with self._lock:
+            self._put_memory(key, value, expires_at)
+        self._put_disk(key, value, expires_at)
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value or compute it; concurrent callers for one key share a single call"""
+        value = self._lookup(key)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            # A leader may have finished between the lookup above and here
+            value = self._get_memory(key, self.clock())
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.collapsed += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = compute(key)
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+        # Failures are never cached; a success is visible in memory before the
+        # in-flight entry goes, so no caller can miss both and compute again
+        expires_at = self.clock() + self.ttl_seconds
+        with self._lock:
+            self._put_memory(key, value, expires_at)
+            self._inflight.pop(key, None)
+        future.set_result(value)
+        self._put_disk(key, value, expires_at)
+        return value
+
+    def clear(self):
+        """Drop every cached entry (both tiers)"""
+        with self._lock:
+            self._entries.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM grammar_cache")
+                self._db.commit()
+
+    def close(self):
+        """Close the persistent tier"""
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+                self._db = None
+
+    def stats(self):
+        """Hit/miss/eviction counters"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'collapsed_lookups': self.collapsed,
+                'persistent': self._db is not None,
+            }
+
+
+def grammar_cache_from_env():
+    """Build the grammar cache from GRAMMAR_CACHE_* environment variables"""
+    return GrammarCache(
+        max_entries=int(os.getenv('GRAMMAR_CACHE_SIZE', '2048')),
+        ttl_seconds=float(os.getenv('GRAMMAR_CACHE_TTL', '86400')),
+        db_path=os.getenv('GRAMMAR_CACHE_DB', '') or shared_state_path('grammar_cache.sqlite'),
+    )
@@ -0,0 +1,120 @@
+"""Shared pooled HTTP sessions for the upstream services (LanguageTool, OpenAI, Ollama, Hugging Face).
+
+Each upstream gets its own requests.Session with a keep-alive connection pool, so
+repeated turns reuse open TCP/TLS connections instead of paying a new handshake.
+requests/urllib3 only speak HTTP/1.1; keep-alive reuse is what removes the
+handshake from the hot path.
+"""
+import os
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from admission import capped_timeout, check_cancelled, upstream_limiter
+from metrics import upstream_response_hook
+
+logger = logging.getLogger(__name__)
+
+UPSTREAMS = ('languagetool', 'openai', 'ollama', 'huggingface')
+
+# Maximum open connections per upstream host (override per upstream with
+# HTTP_POOL_MAXSIZE_<NAME>, e.g. HTTP_POOL_MAXSIZE_OPENAI=4)
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '10'))
+
+
+def pool_maxsize_for(name):
+    """Return the configured connection limit for an upstream"""
+    return int(os.getenv(f'HTTP_POOL_MAXSIZE_{name.upper()}', HTTP_POOL_MAXSIZE))
+
+
+class LimitedSession(requests.Session):
+    """Session whose requests take an upstream concurrency slot and respect the request deadline
+
+    A request is not started once its caller has abandoned it (see admission.cancel_scope).
+    """
+
+    def __init__(self, upstream, limiter=upstream_limiter):
+        super().__init__()
+        self.upstream = upstream
+        self.limiter = limiter
+
+    def request(self, method, url, **kwargs):
+        check_cancelled(self.upstream)
+        with self.limiter.slot(self.upstream):
+            check_cancelled(self.upstream)
+            kwargs['timeout'] = capped_timeout(kwargs.get('timeout'))
+            return super().request(method, url, **kwargs)
+
+
+class HTTPClientPool:
+    """One keep-alive session per upstream, created on startup and closed on shutdown"""
+
+    def __init__(self, upstreams=UPSTREAMS):
+        self.upstreams = tuple(upstreams)
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _create_session(self, name):
+        maxsize = pool_maxsize_for(name)
+        # pool_block keeps us at the per-host limit: extra requests wait for a free connection
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=maxsize, pool_block=True)
+        session = LimitedSession(name)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.hooks['response'].append(upstream_response_hook(name))
+        logger.info(f"Opened HTTP connection pool for {name} (max {maxsize} connections)")
+        return session
+
+    def start(self):
+        """Create sessions for every known upstream"""
+        for name in self.upstreams:
+            self.session(name)
+
+    def session(self, name):
+        """Return the shared session for an upstream, creating it on first use"""
+        with self._lock:
+            session = self._sessions.get(name)
+            if session is None:
+                session = self._create_session(name)
+                self._sessions[name] = session
+            return session
+
+    def close(self):
+        """Close every session and its pooled connections"""
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+        for name, session in sessions.items():
+            try:
+                session.close()
+            except Exception as e:
+                logger.warning(f"Failed to close HTTP session for {name}: {e}")
+
+    def stats(self):
+        """Connections opened vs. reused per upstream"""
+        with self._lock:
+            sessions = dict(self._sessions)
+        stats = {}
+        for name, session in sessions.items():
+            opened = 0
+            requests_sent = 0
+            for adapter in set(session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for key in pools.keys():
+                    pool = pools.get(key)
+                    if pool is None:
+                        continue
+                    opened += pool.num_connections
+                    requests_sent += pool.num_requests
+            stats[name] = {
+                'requests': requests_sent,
+                'connections_opened': opened,
+                'connections_reused': max(requests_sent - opened, 0),
+                'pool_maxsize': pool_maxsize_for(name),
+            }
+        return stats
+
+
+# Shared pool used by the application
+http_clients = HTTPClientPool()
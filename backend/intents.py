@@ -0,0 +1,87 @@
+"""Intent detection for the local fallback replies.
+
+Intents are plain data: each has keywords/phrases and a priority. The table is
+compiled once into a single regex with token boundaries, so "hi" no longer
+matches inside "this" and "no" no longer matches inside "know".
+"""
+import re
+
+# (name, priority, phrases, symbols): lower priority wins when several intents match.
+# Symbols are matched anywhere in the text ("?" marks a question).
+INTENTS = [
+    ('greeting', 0, [
+        'hello', 'hi', 'hey', 'greetings', 'good morning', 'good afternoon',
+        'good evening', 'howdy', 'hiya',
+    ], ()),
+    ('farewell', 1, [
+        'goodbye', 'good bye', 'bye', 'bye bye', 'see you', 'see you later',
+        'see ya', 'farewell', 'take care', 'catch you', 'catch you later', 'good night',
+    ], ()),
+    ('thanks', 2, [
+        'thank', 'thanks', 'thank you', 'thankful', 'appreciate', 'appreciated',
+        'grateful', 'cheers',
+    ], ()),
+    ('question', 3, [
+        'what', 'why', 'how', 'when', 'where', 'who', 'which', 'whose',
+    ], ('?',)),
+    ('affirmation', 4, [
+        'yes', 'yeah', 'yep', 'okay', 'ok', 'sure', 'alright', 'all right',
+        'indeed', 'agree', 'correct', 'right', 'of course',
+    ], ()),
+    ('negative', 5, [
+        'no', 'not', 'never', 'nope', 'cannot', "can't", "won't", "don't",
+        "didn't", "isn't",
+    ], ()),
+    ('help', 6, [
+        'help', 'assist', 'teach', 'explain', 'show me', 'guide',
+    ], ()),
+]
+
+
+class IntentClassifier:
+    """Matches every intent phrase in one regex pass; the highest-priority hit wins"""
+
+    def __init__(self, intents):
+        self._phrase_intent = {}
+        self._priority = {}
+        self._symbols = []
+        for name, priority, phrases, symbols in intents:
+            self._priority[name] = priority
+            for phrase in phrases:
+                key = " ".join(phrase.lower().split())
+                # The first (highest-priority) intent keeps a phrase listed twice
+                current = self._phrase_intent.get(key)
+                if current is None or priority < self._priority[current]:
+                    self._phrase_intent[key] = name
+            for symbol in symbols:
+                self._symbols.append((symbol, name))
+
+        # Longest phrases first so "see you later" is preferred over "see you"
+        alternatives = sorted(self._phrase_intent, key=len, reverse=True)
+        body = "|".join(r"\s+".join(re.escape(word) for word in phrase.split()) for phrase in alternatives)
+        self._pattern = re.compile(rf"(?<![\w'])(?:{body})(?![\w'])")
+
+    def classify(self, text):
+        """Return the best intent name for text, or None"""
+        lower = text.lower()
+        best = None
+        best_priority = None
+        for symbol, name in self._symbols:
+            if symbol in lower and (best is None or self._priority[name] < best_priority):
+                best, best_priority = name, self._priority[name]
+        for match in self._pattern.finditer(lower):
+            name = self._phrase_intent[" ".join(match.group().split())]
+            priority = self._priority[name]
+            if best is None or priority < best_priority:
+                best, best_priority = name, priority
+                if priority == 0:
+                    break
+        return best
+
+    def classify_many(self, texts):
+        """Classify a batch of texts (for offline evaluation)"""
+        classify = self.classify
+        return [classify(text) for text in texts]
+
+
+intent_classifier = IntentClassifier(INTENTS)
@@ -0,0 +1,179 @@
+"""Prompt building for the LLM providers: a fixed system prefix, token-budgeted history
+and per-session reuse of provider-side caches.
+
+The system prompt is rendered once, and every prompt starts with exactly those
+bytes. History is kept to LLM_HISTORY_TOKENS, estimated at about four characters
+per token. Trimming is not a sliding window. Once a session runs over the
+budget, the oldest turns are dropped until only LLM_HISTORY_TRIM_RATIO of the
+budget is used. The window then stays put for the next several turns. Prompt
+caches match on prefixes (OpenAI's automatic prompt caching, llama.cpp and
+Ollama's KV cache), so a stable window keeps the start of the prompt
+cacheable.
+
+Ollama returns a `context` (the conversation so far as token ids) with each
+reply. The next turn of the same session sends it back with only the new
+user line. Ollama then skips evaluating the system prompt and the history
+again. The context is dropped and the prompt rebuilt when another provider
+answered in between, or when the context has grown past LLM_CONTEXT_TOKENS.
+
+The session is known through conversation_scope(), a context variable that
+run_blocking carries into the provider threads, in the same way as the request
+deadline.
+"""
+import os
+import array
+import contextvars
+from contextlib import contextmanager
+
+from metrics import registry
+
+LLM_HISTORY_TOKENS = int(os.getenv('LLM_HISTORY_TOKENS', '600'))
+LLM_HISTORY_TRIM_RATIO = float(os.getenv('LLM_HISTORY_TRIM_RATIO', '0.5'))
+LLM_CONTEXT_TOKENS = int(os.getenv('LLM_CONTEXT_TOKENS', '2048'))
+OLLAMA_CONTEXT_REUSE = os.getenv('OLLAMA_CONTEXT_REUSE', 'true').lower() == 'true'
+
+PROMPT_TOKENS = registry.counter(
+    'fluentflow_llm_prompt_tokens_total',
+    'LLM prompt tokens: sent (estimated), evaluated by the provider, or reused from its cache or a kept context',
+    ('provider', 'kind'),
+)
+
+_conversation = contextvars.ContextVar('conversation', default=None)
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English)"""
+    return (len(text) + 3) // 4
+
+
+@contextmanager
+def conversation_scope(session):
+    """Make session (anything with a provider_state dict) the one LLM calls are made for"""
+    token = _conversation.set(session)
+    try:
+        yield
+    finally:
+        _conversation.reset(token)
+
+
+async def scoped_tokens(tokens, session):
+    """An async token stream that is consumed within conversation_scope(session)"""
+    with conversation_scope(session):
+        async for item in tokens:
+            yield item
+
+
+def provider_state(provider):
+    """The current session's state dict for one provider, or None outside a conversation"""
+    session = _conversation.get()
+    if session is None:
+        return None
+    return session.provider_state.setdefault(provider, {})
+
+
+def _turn_key(turn):
+    return hash((turn.get('type'), turn.get('content')))
+
+
+class ContextBuilder:
+    """Prompts for one system prompt, rendered once and reused for every turn"""
+
+    def __init__(self, system_prompt, history_tokens=LLM_HISTORY_TOKENS, trim_ratio=LLM_HISTORY_TRIM_RATIO):
+        self.system_prompt = system_prompt
+        self.history_tokens = history_tokens
+        self.trim_ratio = trim_ratio
+        self.system_message = {"role": "system", "content": system_prompt}
+        self.text_prefix = system_prompt + "\n\n"
+        self.prefix_tokens = estimate_tokens(self.text_prefix)
+
+    def window(self, conversation_history):
+        """The most recent turns that fit the history budget.
+
+        The start of the window is remembered per session. It only moves when
+        the budget is exceeded, and then far enough to leave room for several
+        more turns.
+        """
+        state = provider_state('history')
+        start = 0
+        if state and 'start_key' in state:
+            keys = [_turn_key(turn) for turn in conversation_history]
+            if state['start_key'] in keys:
+                start = keys.index(state['start_key'])
+        costs = [estimate_tokens(turn.get('content', '')) + 2 for turn in conversation_history]
+        if sum(costs[start:]) > self.history_tokens:
+            # Over budget: drop the oldest turns until only trim_ratio of the budget is used
+            # (with no session to remember the window, trim just enough to fit)
+            target = self.history_tokens * self.trim_ratio if state is not None else self.history_tokens
+            total = sum(costs[start:])
+            while start < len(costs) and total > target:
+                total -= costs[start]
+                start += 1
+        if state is not None and start < len(conversation_history):
+            state['start_key'] = _turn_key(conversation_history[start])
+        return conversation_history[start:]
+
+    def messages(self, user_message, conversation_history):
+        """Chat messages: the system message, the history window, then the new message"""
+        messages = [self.system_message]
+        for msg in self.window(conversation_history):
+            role = "user" if msg['type'] == 'user' else "assistant"
+            messages.append({"role": role, "content": msg['content']})
+        messages.append({"role": "user", "content": user_message})
+        return messages
+
+    def text_prompt(self, user_message, conversation_history):
+        """Plain-text prompt: the system prefix, the history window, then the new message"""
+        lines = [self.text_prefix]
+        for msg in self.window(conversation_history):
+            role = "User" if msg['type'] == 'user' else "Assistant"
+            lines.append(f"{role}: {msg['content']}\n")
+        lines.append(f"User: {user_message}\nAssistant:")
+        return "".join(lines)
+
+    def ollama_request(self, user_message, conversation_history):
+        """(prompt, context or None) for Ollama.
+
+        The session's last context is reused when the last turn in the history
+        is the reply that context ended with.
+        """
+        state = provider_state('ollama')
+        if OLLAMA_CONTEXT_REUSE and state and state.get('context'):
+            last = conversation_history[-1] if conversation_history else None
+            reply = state.get('reply', '')
+            fits = len(state['context']) + estimate_tokens(user_message) <= LLM_CONTEXT_TOKENS
+            if fits and last and last.get('type') == 'assistant' and last['content'] and reply.startswith(last['content']):
+                PROMPT_TOKENS.inc(len(state['context']), provider='ollama', kind='reused')
+                return f"\nUser: {user_message}\nAssistant:", list(state['context'])
+            state.pop('context', None)
+        return self.text_prompt(user_message, conversation_history), None
+
+    def remember_ollama(self, data, reply):
+        """Keep the context Ollama returned with a reply for the session's next turn"""
+        state = provider_state('ollama')
+        if data.get('prompt_eval_count') is not None:
+            PROMPT_TOKENS.inc(data['prompt_eval_count'], provider='ollama', kind='evaluated')
+        if state is None or not OLLAMA_CONTEXT_REUSE:
+            return
+        if data.get('context'):
+            # Packed 32-bit ids: 4 bytes per token instead of a list of Python ints
+            state['context'] = array.array('i', data['context'])
+            state['reply'] = reply
+        else:
+            state.pop('context', None)
+
+
+def count_sent(provider, prompt):
+    """Record the estimated size of a prompt (text or chat messages) sent to a provider"""
+    if isinstance(prompt, list):
+        tokens = sum(estimate_tokens(message['content']) + 4 for message in prompt)
+    else:
+        tokens = estimate_tokens(prompt)
+    PROMPT_TOKENS.inc(tokens, provider=provider, kind='sent')
+    return tokens
+
+
+def count_cached(provider, usage):
+    """Record the prompt tokens a provider reports as read from its prompt cache"""
+    details = (usage or {}).get('prompt_tokens_details') or {}
+    if details.get('cached_tokens'):
+        PROMPT_TOKENS.inc(details['cached_tokens'], provider=provider, kind='reused')
@@ -0,0 +1,276 @@
+"""In-process grammar checks that run before (or instead of) the LanguageTool round trip.
+
+Rules cover sentence/pronoun capitalization, a/an, subject-verb agreement on
+common verbs and doubled words. Matches use the LanguageTool structure
+(offset/length/replacements) so apply_grammar_matches handles both tiers.
+
+A result is only "confident" when the rules covered the whole sentence: every
+word is common vocabulary, and every verb sits where the agreement rule (or an
+auxiliary before it) accounts for its form. Tense, compound subjects, verb
+chains like "am go" and stacked determiners are left to LanguageTool.
+"""
+import re
+
+_WORD = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)?")
+
+# Vowel-letter words that start with a consonant sound, and h-words with a silent h
+_CONSONANT_SOUND = ("uni", "use", "usu", "uti", "eu", "one", "once", "ewe", "ufo", "ur")
+_VOWEL_SOUND = ("hour", "honest", "honor", "honour", "heir")
+
+THIRD_PERSON = {
+    'go': 'goes', 'do': 'does', 'have': 'has', 'want': 'wants', 'like': 'likes',
+    'need': 'needs', 'make': 'makes', 'know': 'knows', 'think': 'thinks',
+    'come': 'comes', 'see': 'sees', 'get': 'gets', 'play': 'plays', 'eat': 'eats',
+    'live': 'lives', 'work': 'works', 'study': 'studies', 'read': 'reads',
+    'speak': 'speaks', 'say': 'says', 'take': 'takes', 'watch': 'watches',
+    'love': 'loves', 'feel': 'feels', 'try': 'tries', 'learn': 'learns',
+    'help': 'helps', 'write': 'writes', 'walk': 'walks', 'drink': 'drinks',
+    'don\'t': 'doesn\'t',
+}
+BASE_FORM = {third: base for base, third in THIRD_PERSON.items()}
+
+THIRD_PERSON_SUBJECTS = {'he', 'she', 'it'}
+PLURAL_SUBJECTS = {'i', 'you', 'we', 'they'}
+# A base verb after these is correct ("does he have", "can she go")
+AUXILIARIES = {
+    'do', 'does', 'did', 'can', 'could', 'will', 'would', 'shall', 'should',
+    'may', 'might', 'must', 'to', "doesn't", "didn't", "can't", "won't",
+    "don't", "let", "make", "help", "let's",
+}
+# A bare infinitive follows the object of these ("watch it go", "let him speak"),
+# so the pronoun before the verb is not its subject
+PERCEPTION_CAUSATIVE = {
+    'see', 'sees', 'saw', 'watch', 'watches', 'watched', 'hear', 'hears', 'heard',
+    'feel', 'feels', 'felt', 'make', 'makes', 'made', 'let', 'lets', 'help', 'helps', 'helped',
+}
+COORDINATORS = {'and', 'or'}
+# "were" stays after these ("if I were you", "I wish it were")
+SUBJUNCTIVE_MARKERS = {'if', 'wish'}
+# Word classes the coverage check needs (the rules never rewrite tense or verb chains)
+BE_FORMS = {
+    'am', 'is', 'are', 'was', 'were', "i'm", "you're", "he's", "she's", "it's", "we're", "they're",
+    "isn't", "aren't", "wasn't", "weren't", "that's", "what's",
+}
+HAVE_FORMS = {'have', 'has', 'had', "i've", "you've", "we've", "they've"}
+MODALS = {'can', 'could', 'will', 'would', 'shall', 'should', 'may', 'might', 'must', "can't", "won't"}
+# Simple past forms take the same shape after every subject; participles only
+# follow a form of "have" ("I have gone", not "I have went")
+PAST_SIMPLE = set("""
+went came got made knew thought saw said took wanted liked loved needed felt played ate drank lived
+worked studied learned read wrote spoke talked watched walked helped tried did had improved practiced
+""".split())
+PARTICIPLES = set("""
+gone come got made known thought seen said taken wanted liked loved needed felt played eaten drunk
+lived worked studied learned read written spoken talked watched walked helped tried done had been
+improved practiced
+""".split())
+PAST_TIME = {'yesterday', 'ago', 'last', 'tomorrow'}
+DETERMINERS = {'a', 'an', 'the', 'my', 'your', 'our', 'their'}
+
+# Doubled words that are grammatical
+ALLOWED_DOUBLES = {'that', 'had', 'is', 'very', 'so', 'bye', 'no'}
+
+# Common learner vocabulary: a sentence with any other word is never confident
+LEXICON = set("""
+a an the i me my mine you your yours he him his she her hers it its we us our ours they them their theirs
+this that these those there here what which who whom whose why how when where
+am is are was were be been being do does did doing have has had having
+can could will would shall should may might must not no yes ok okay
+and or but so because if then than too also very really just only
+in on at to from with without for of by about into over under after before up down out off
+again now today tomorrow yesterday always never often sometimes usually every all some any many much more most
+one two three four five six seven eight nine ten first second last next new old good bad great nice
+big small long short happy sad beautiful interesting easy hard difficult important favorite favourite
+hello hi hey bye goodbye please thank thanks sorry welcome
+go goes went gone going come comes came coming get gets got getting make makes made making
+know knows knew known think thinks thought see sees saw seen say says said take takes took taken
+want wants wanted like likes liked love loves loved need needs needed feel feels felt
+play plays played eat eats ate eaten drink drinks drank live lives lived work works worked
+study studies studied learn learns learned learning read reads reading write writes wrote written
+speak speaks spoke speaking talk talks talked watch watches watched walk walks walked
+help helps helped try tries tried practice practise practicing improve improving
+day days week weeks month year years time morning afternoon evening night
+man woman men women boy girl child children friend friends family mother father brother sister teacher student
+school class lesson book books word words sentence sentences question questions answer
+english language languages grammar vocabulary spelling skills
+home house city country world job food water tea coffee apple apples dog cat car bus
+name people thing things way life weather music movie movies game games sport sports
+don't doesn't didn't can't won't isn't aren't wasn't weren't i'm you're he's she's it's we're they're
+i've you've we've they've i'll you'll he'll she'll we'll they'll i'd let's that's what's
+""".split())
+LEXICON.update(THIRD_PERSON, BASE_FORM)
+
+# Verbs the agreement rule has a correct form for after every subject pronoun
+AGREEMENT_VERBS = set(THIRD_PERSON) | set(BASE_FORM) | {'am', 'is', 'are', 'was', 'were'}
+# Every verb form the coverage check has to account for
+VERB_FORMS = (
+    set(THIRD_PERSON) | set(BASE_FORM) | BE_FORMS | HAVE_FORMS | MODALS | PAST_SIMPLE | PARTICIPLES
+    | {w for w in LEXICON if w.endswith('ing')} - {'morning', 'evening', 'spelling'}
+)
+
+MAX_CONFIDENT_WORDS = 20
+
+
+def _match(offset, length, replacement, rule_id, message):
+    return {
+        'offset': offset,
+        'length': length,
+        'message': message,
+        'replacements': [{'value': replacement}],
+        'rule': {'id': rule_id},
+    }
+
+
+def _match_case(template, word):
+    """Return word with the capitalization of template"""
+    if template.isupper() and len(template) > 1:
+        return word.upper()
+    if template[:1].isupper():
+        return word[:1].upper() + word[1:]
+    return word
+
+
+def _starts_with_vowel_sound(word):
+    lower = word.lower()
+    if lower.startswith(_VOWEL_SOUND):
+        return True
+    if lower.startswith(_CONSONANT_SOUND):
+        return False
+    return lower[:1] in "aeiou"
+
+
+def check(text):
+    """Run the local rules; returns (matches, confident)"""
+    tokens = [(m.start(), m.group()) for m in _WORD.finditer(text)]
+    matches = []
+    claimed = {}  # token index -> the match covering it
+    agreed = set()  # token indexes whose form the agreement rule checked
+
+    def add(indexes, match):
+        if any(index in claimed for index in indexes):
+            return
+        for index in indexes:
+            claimed[index] = match
+        matches.append(match)
+
+    for i, (offset, word) in enumerate(tokens):
+        lower = word.lower()
+        previous = tokens[i - 1][1].lower() if i > 0 else None
+        following = tokens[i + 1] if i + 1 < len(tokens) else None
+
+        # Doubled words ("the the")
+        if following and following[1].lower() == lower and lower not in ALLOWED_DOUBLES:
+            gap = text[offset + len(word):following[0]]
+            if gap.strip() == "":
+                end = following[0] + len(following[1])
+                add((i, i + 1), _match(offset, end - offset, word, 'LOCAL_DOUBLED_WORD', "Possible typo: you repeated a word"))
+                continue
+
+        # Standalone pronoun "i"
+        if lower == 'i' or lower.startswith("i'"):
+            if word[0] == 'i':
+                add((i,), _match(offset, 1, 'I', 'LOCAL_I_LOWERCASE', "The pronoun 'I' is always capitalized"))
+
+        # a / an
+        if lower in ('a', 'an') and following:
+            wants_an = _starts_with_vowel_sound(following[1])
+            if wants_an and lower == 'a':
+                add((i,), _match(offset, len(word), _match_case(word, 'an'), 'LOCAL_A_AN', "Use 'an' before a vowel sound"))
+            elif not wants_an and lower == 'an':
+                add((i,), _match(offset, len(word), _match_case(word, 'a'), 'LOCAL_A_AN', "Use 'a' before a consonant sound"))
+
+        # Subject-verb agreement on common verbs (not after an auxiliary or an inverted
+        # "is"/"are", not for a compound subject, not for the object of "see"/"make" etc.)
+        before_previous = tokens[i - 2][1].lower() if i >= 2 else None
+        if previous is not None and before_previous not in AUXILIARIES | BE_FORMS | COORDINATORS | PERCEPTION_CAUSATIVE:
+            replacement = None
+            if previous in THIRD_PERSON_SUBJECTS | PLURAL_SUBJECTS and lower in AGREEMENT_VERBS:
+                agreed.add(i)
+            if lower == 'were' and previous in THIRD_PERSON_SUBJECTS | {'i'}:
+                if before_previous not in SUBJUNCTIVE_MARKERS:
+                    replacement = 'was'
+            elif previous in THIRD_PERSON_SUBJECTS:
+                if lower in THIRD_PERSON:
+                    replacement = THIRD_PERSON[lower]
+                elif lower in ('are', 'am'):
+                    replacement = 'is'
+            elif previous in PLURAL_SUBJECTS:
+                if lower in BASE_FORM:
+                    replacement = BASE_FORM[lower]
+                elif lower in ('is', 'am', 'are') and previous == 'i':
+                    replacement = 'am' if lower != 'am' else None
+                elif lower in ('is', 'am'):
+                    replacement = 'are'
+                elif lower == 'was' and previous != 'i':
+                    replacement = 'were'
+            if replacement and replacement != lower:
+                add((i,), _match(offset, len(word), _match_case(word, replacement), 'LOCAL_AGREEMENT', "The verb does not agree with the subject"))
+
+    # Sentence-initial capitalization
+    for m in re.finditer(r"(?:^|[.!?]\s+)([a-z])", text):
+        position = m.start(1)
+        index = next((k for k, (o, _) in enumerate(tokens) if o == position), None)
+        if index is None:
+            continue
+        existing = claimed.get(index)
+        if existing is not None:
+            # Another rule already rewrites this word ("a apple" -> "An apple")
+            if existing['offset'] == position:
+                value = existing['replacements'][0]['value']
+                existing['replacements'][0]['value'] = value[:1].upper() + value[1:]
+        else:
+            add((index,), _match(position, 1, text[position].upper(), 'LOCAL_UPPERCASE_SENTENCE_START', "Start the sentence with a capital letter"))
+
+    matches.sort(key=lambda m: m['offset'])
+    words = [w.lower() for _, w in tokens]
+    confident = (
+        0 < len(words) <= MAX_CONFIDENT_WORDS
+        and all(w in LEXICON for w in words)
+        and _covered(text, tokens, words, agreed)
+    )
+    return matches, confident
+
+
+def _verb_is_accounted_for(word, previous, before_previous, sentence_start, agreed):
+    """Whether the rules (or the word before) settle this verb form"""
+    base = word in THIRD_PERSON or word in ('be', 'have')
+    if sentence_start:
+        # Imperative or question ("Watch it", "Can you", "Is it")
+        return base or word in MODALS or word in BE_FORMS or word in ('does', 'did')
+    if previous in THIRD_PERSON_SUBJECTS | PLURAL_SUBJECTS:
+        if before_previous in COORDINATORS:
+            return False  # compound subject: agreement is not checked
+        if before_previous in AUXILIARIES | MODALS | PERCEPTION_CAUSATIVE:
+            return base  # "does he have", "can you see", "watch it go"
+        if before_previous in BE_FORMS:
+            return word.endswith('ing')  # "are you going"
+        if before_previous in HAVE_FORMS:
+            return word in PARTICIPLES  # "have you seen"
+        # Checked by the agreement rule, or the same form after every subject
+        return agreed or word in MODALS or word in PAST_SIMPLE
+    if previous in AUXILIARIES | MODALS:
+        return base
+    if previous in BE_FORMS:
+        # Passives and "am went" are left to LanguageTool
+        return word.endswith('ing')
+    if previous in HAVE_FORMS:
+        return word in PARTICIPLES
+    return False
+
+
+def _covered(text, tokens, words, agreed):
+    """Whether every part of the sentence is something the rules check"""
+    if any(w in PAST_TIME for w in words):
+        return False  # tense is never checked
+    for i, word in enumerate(words):
+        previous = words[i - 1] if i > 0 else None
+        if previous in DETERMINERS and word in DETERMINERS:
+            return False  # "to the a book"
+        if word not in VERB_FORMS:
+            continue
+        gap = text[tokens[i - 1][0] + len(tokens[i - 1][1]):tokens[i][0]] if i > 0 else ""
+        sentence_start = i == 0 or any(mark in gap for mark in ".!?")
+        before_previous = words[i - 2] if i >= 2 else None
+        if not _verb_is_accounted_for(word, previous, before_previous, sentence_start, i in agreed):
+            return False
+    return True
@@ -0,0 +1,214 @@
+"""In-process local LLM replies on the CPU, micro-batched across concurrent turns.
+
+The default engine runs a small instruction-tuned model through Hugging Face
+transformers. LOCAL_LLM_ENGINE may also name a "module:factory" whose result
+has generate_batch(prompts, max_new_tokens, max_time) -> [(text, tokens)],
+with max_new_tokens given per prompt.
+The model is loaded once, on a dedicated generation thread. torch releases the
+GIL while it computes, so the event loop keeps running during generation.
+
+Tutor prompts arriving within LOCAL_LLM_BATCH_WAIT seconds of each other are
+padded into one generate() call, up to LOCAL_LLM_MAX_BATCH at a time. On a
+CPU, a batch of N costs far less than N single calls, so tokens per second
+across users go up. Each reply is capped at LOCAL_LLM_MAX_TOKENS new tokens.
+A prompt whose request deadline has already passed is dropped from its batch.
+Generation runs until just before the latest remaining deadline, and never
+past LOCAL_LLM_MAX_SECONDS. A client with a short deadline stops waiting on
+its own and does not cut the other replies in the batch short.
+"""
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from admission import time_remaining
+from engines import engine_available, load_engine
+from micro_batch import MicroBatcher
+
+logger = logging.getLogger(__name__)
+
+LOCAL_LLM_ENGINE = os.getenv('LOCAL_LLM_ENGINE', 'transformers')
+LOCAL_LLM_MODEL = os.getenv('LOCAL_LLM_MODEL', 'HuggingFaceTB/SmolLM2-360M-Instruct')
+# CPU threads for the model; 0 lets torch decide
+LOCAL_LLM_THREADS = int(os.getenv('LOCAL_LLM_THREADS', '0'))
+LOCAL_LLM_MAX_TOKENS = int(os.getenv('LOCAL_LLM_MAX_TOKENS', '100'))
+LOCAL_LLM_MAX_SECONDS = float(os.getenv('LOCAL_LLM_MAX_SECONDS', '10'))
+LOCAL_LLM_MAX_QUEUE = int(os.getenv('LOCAL_LLM_MAX_QUEUE', '32'))
+LOCAL_LLM_MAX_BATCH = int(os.getenv('LOCAL_LLM_MAX_BATCH', '8'))
+LOCAL_LLM_BATCH_WAIT = float(os.getenv('LOCAL_LLM_BATCH_WAIT', '0.05'))
+LOCAL_LLM_WARMUP = os.getenv('LOCAL_LLM_WARMUP', 'true').lower() == 'true'
+
+# Generation stops this long before a deadline so the partial reply still gets back in time
+DEADLINE_MARGIN_SECONDS = 0.1
+
+ENGINES = {'transformers': 'local_llm:TransformersEngine'}
+ENGINE_REQUIRES = {'transformers': 'transformers'}
+
+
+class TransformersEngine:
+    """A causal LM from the Hugging Face hub on the CPU, generating for a padded batch of chats"""
+
+    def __init__(self, model=LOCAL_LLM_MODEL, threads=LOCAL_LLM_THREADS):
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(model)
+        # Left padding keeps every prompt's last token at the end, where generation continues
+        self.tokenizer.padding_side = 'left'
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.model = AutoModelForCausalLM.from_pretrained(model, torch_dtype=torch.float32)
+        self.model.eval()
+
+    def prompt_text(self, messages):
+        if getattr(self.tokenizer, 'chat_template', None):
+            return self.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+        lines = [f"{message['role'].capitalize()}: {message['content']}" for message in messages]
+        return "\n".join(lines) + "\nAssistant:"
+
+    def generate_batch(self, prompts, max_new_tokens, max_time=None):
+        """[(reply, new token count)] for a batch of chats (lists of role/content messages),
+        each cut at its own entry in max_new_tokens"""
+        inputs = self.tokenizer([self.prompt_text(messages) for messages in prompts], return_tensors='pt', padding=True)
+        with self.torch.inference_mode():
+            output = self.model.generate(
+                **inputs,
+                max_new_tokens=max(max_new_tokens),
+                max_time=max_time,
+                do_sample=True,
+                temperature=0.7,
+                top_p=0.9,
+                pad_token_id=self.tokenizer.pad_token_id,
+            )
+        replies = []
+        for row, limit in zip(output[:, inputs['input_ids'].shape[1]:], max_new_tokens):
+            tokens = [token for token in row.tolist()[:limit] if token != self.tokenizer.pad_token_id]
+            replies.append((self.tokenizer.decode(tokens, skip_special_tokens=True).strip(), len(tokens)))
+        return replies
+
+
+class LocalLLM:
+    """One local model on a generation thread, fed micro-batches of concurrent prompts"""
+
+    def __init__(self, engine=LOCAL_LLM_ENGINE, model=LOCAL_LLM_MODEL, threads=LOCAL_LLM_THREADS, max_tokens=LOCAL_LLM_MAX_TOKENS,
+                 max_seconds=LOCAL_LLM_MAX_SECONDS, max_queue=LOCAL_LLM_MAX_QUEUE, max_batch=LOCAL_LLM_MAX_BATCH,
+                 batch_wait=LOCAL_LLM_BATCH_WAIT):
+        self.engine = engine
+        self.options = {'model': model, 'threads': threads}
+        self.max_tokens = max_tokens
+        self.max_seconds = max_seconds
+        # not_loaded -> loading -> ready | unavailable (engine not installed) | failed
+        self.state = 'not_loaded'
+        self.load_seconds = None
+        self.generated_tokens = 0
+        self.generate_seconds = 0.0
+        self.batcher = MicroBatcher('local_llm', self._submit, 1, max_queue, max_batch, batch_wait)
+        self._model = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='local-llm')
+        self._lock = threading.Lock()
+
+    @property
+    def engine_name(self):
+        if isinstance(self.engine, str):
+            return self.engine
+        factory = getattr(self.engine, 'func', self.engine)  # functools.partial
+        return getattr(factory, '__name__', repr(factory))
+
+    def available(self):
+        if self.state in ('unavailable', 'failed'):
+            return False
+        if self.state == 'not_loaded' and not engine_available(self.engine, ENGINES, ENGINE_REQUIRES):
+            logger.info(f"ℹ Local LLM engine {self.engine_name} is not installed")
+            self.state = 'unavailable'
+            return False
+        return True
+
+    def _load(self):
+        """Build the model once (runs on the generation thread)"""
+        if self._model is not None:
+            return self._model
+        self.state = 'loading'
+        started = time.perf_counter()
+        try:
+            self._model = load_engine(self.engine, self.options, ENGINES)
+        except Exception as e:
+            logger.warning(f"✗ Failed to load local LLM {self.options['model']}: {e}")
+            self.state = 'failed'
+            raise
+        self.load_seconds = time.perf_counter() - started
+        self.state = 'ready'
+        logger.info(f"✓ Local LLM {self.options['model']} loaded in {self.load_seconds:.2f}s")
+        return self._model
+
+    def warm(self):
+        """Load the model now instead of on the first reply"""
+        if not self.available():
+            return False
+        try:
+            self._executor.submit(self._load).result()
+        except Exception:
+            return False
+        return True
+
+    def _generate_batch(self, items):
+        model = self._load()
+        now = time.monotonic()
+        budgets = [None if deadline is None else deadline - now - DEADLINE_MARGIN_SECONDS for _, _, deadline in items]
+        live = [i for i, budget in enumerate(budgets) if budget is None or budget > 0]
+        results = [(None, "request deadline passed before generation") for _ in items]
+        if not live:
+            return results
+        # Run as long as the most patient caller waits: one short deadline must not cut everyone short
+        if any(budgets[i] is None for i in live):
+            max_time = self.max_seconds
+        else:
+            max_time = min(self.max_seconds, max(budgets[i] for i in live))
+        started = time.perf_counter()
+        replies = model.generate_batch([items[i][0] for i in live], [items[i][1] for i in live], max_time)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.generated_tokens += sum(tokens for _, tokens in replies)
+            self.generate_seconds += elapsed
+        for i, (text, _) in zip(live, replies):
+            results[i] = (text, None)
+        return results
+
+    def _submit(self, items):
+        return self._executor.submit(self._generate_batch, items)
+
+    def generate(self, messages, max_tokens=None):
+        """Reply to a chat (role/content messages), waiting no longer than the request deadline"""
+        limit = min(max_tokens or self.max_tokens, self.max_tokens)
+        remaining = time_remaining()
+        deadline = time.monotonic() + remaining if remaining is not None else None
+        return self.batcher.run((messages, limit, deadline))
+
+    def stats(self):
+        with self._lock:
+            tokens, seconds = self.generated_tokens, self.generate_seconds
+        return {
+            'engine': self.engine_name,
+            'model': self.options['model'],
+            'state': self.state,
+            'load_seconds': round(self.load_seconds, 2) if self.load_seconds is not None else None,
+            'max_tokens': self.max_tokens,
+            'generated_tokens': tokens,
+            'tokens_per_second': round(tokens / seconds, 1) if seconds else None,
+            **self.batcher.stats(),
+        }
+
+    def close(self):
+        self.batcher.close()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def local_llm_from_env():
+    """Local model configured from LOCAL_LLM_* settings"""
+    return LocalLLM(
+        LOCAL_LLM_ENGINE, LOCAL_LLM_MODEL, LOCAL_LLM_THREADS, LOCAL_LLM_MAX_TOKENS, LOCAL_LLM_MAX_SECONDS,
+        LOCAL_LLM_MAX_QUEUE, LOCAL_LLM_MAX_BATCH, LOCAL_LLM_BATCH_WAIT,
+    )
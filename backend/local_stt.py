@@ -0,0 +1,235 @@
+"""Local speech-to-text on the CPU, for deployments without Google credentials.
+
+The engine is faster-whisper by default. LOCAL_STT_ENGINE may also name any
+"module:factory" whose result has transcribe_batch(clips) -> [transcript].
+The engine is loaded once per worker. By default the workers are
+LOCAL_STT_WORKERS child processes, so decoding never holds the event loop's
+GIL. LOCAL_STT_POOL=thread shares one model between threads instead, which
+suits engines that release the GIL while they decode.
+
+Clips wait in a bounded micro-batching queue (micro_batch.py). Once
+LOCAL_STT_MAX_QUEUE clips are waiting or being decoded, callers get Overloaded
+(503). A batch is formed when a worker frees up. It takes up to
+LOCAL_STT_MAX_BATCH clips, including any that arrive within
+LOCAL_STT_BATCH_WAIT seconds of the first.
+"""
+import io
+import os
+import abc
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from audio_preprocessing import preprocess_audio
+from engines import engine_available, load_engine
+from metrics import timed
+from micro_batch import MicroBatcher
+
+logger = logging.getLogger(__name__)
+
+LOCAL_STT_ENGINE = os.getenv('LOCAL_STT_ENGINE', 'faster-whisper')
+LOCAL_STT_MODEL = os.getenv('LOCAL_STT_MODEL', 'tiny.en')
+LOCAL_STT_LANGUAGE = os.getenv('LOCAL_STT_LANGUAGE', 'en')
+# "process" (a model per child process) or "thread" (one model shared by the pool's threads)
+LOCAL_STT_POOL = os.getenv('LOCAL_STT_POOL', 'process')
+LOCAL_STT_WORKERS = int(os.getenv('LOCAL_STT_WORKERS', '1'))
+# CPU threads per worker; 0 lets the engine decide
+LOCAL_STT_THREADS = int(os.getenv('LOCAL_STT_THREADS', '0'))
+LOCAL_STT_MAX_QUEUE = int(os.getenv('LOCAL_STT_MAX_QUEUE', '16'))
+LOCAL_STT_MAX_BATCH = int(os.getenv('LOCAL_STT_MAX_BATCH', '4'))
+LOCAL_STT_BATCH_WAIT = float(os.getenv('LOCAL_STT_BATCH_WAIT', '0.02'))
+
+# Built-in engines by name, and the module each one needs installed
+ENGINES = {'faster-whisper': 'local_stt:FasterWhisperEngine'}
+ENGINE_REQUIRES = {'faster-whisper': 'faster_whisper'}
+
+
+class FasterWhisperEngine:
+    """Whisper through CTranslate2 on the CPU with int8 weights"""
+
+    def __init__(self, model=LOCAL_STT_MODEL, language=LOCAL_STT_LANGUAGE, threads=LOCAL_STT_THREADS):
+        from faster_whisper import WhisperModel
+
+        self.model = WhisperModel(model, device='cpu', compute_type='int8', cpu_threads=threads)
+        self.language = language
+
+    def transcribe_one(self, clip):
+        # Any container PyAV can read (WAV, WebM/Ogg Opus, MP3...) is decoded in the worker
+        segments, _ = self.model.transcribe(io.BytesIO(clip), language=self.language, beam_size=1)
+        return " ".join(segment.text.strip() for segment in segments).strip()
+
+    def transcribe_batch(self, clips):
+        return [self.transcribe_one(clip) for clip in clips]
+
+
+# Worker side: each pool process holds one engine, built by the pool initializer
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def _load_worker_engine(engine, options):
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = load_engine(engine, options, ENGINES)
+
+
+def _worker_ready():
+    return os.getpid()
+
+
+def _transcribe_batch(clips, engine=None):
+    """[(transcript, error)] per clip; one clip the engine chokes on does not fail the rest of its batch"""
+    engine = engine or _engine
+    try:
+        return [(transcript, None) for transcript in engine.transcribe_batch(clips)]
+    except Exception as e:
+        if len(clips) == 1:
+            return [(None, f"{type(e).__name__}: {e}")]
+        return [_transcribe_batch([clip], engine)[0] for clip in clips]
+
+
+class SpeechToTextBackend(abc.ABC):
+    """A recognizer transcribe_audio can use: available() and transcribe(content) -> transcript"""
+
+    name = None
+
+    def available(self):
+        return True
+
+    @abc.abstractmethod
+    def transcribe(self, content):
+        """Transcript of one clip"""
+
+    def stats(self):
+        return {'backend': self.name}
+
+    def close(self):
+        pass
+
+
+class LocalSpeechToText(SpeechToTextBackend):
+    """A warm pool of local speech-to-text workers behind a bounded, micro-batching queue"""
+
+    name = 'local'
+
+    def __init__(self, engine=LOCAL_STT_ENGINE, model=LOCAL_STT_MODEL, language=LOCAL_STT_LANGUAGE, pool=LOCAL_STT_POOL,
+                 workers=LOCAL_STT_WORKERS, threads=LOCAL_STT_THREADS, max_queue=LOCAL_STT_MAX_QUEUE,
+                 max_batch=LOCAL_STT_MAX_BATCH, batch_wait=LOCAL_STT_BATCH_WAIT):
+        self.engine = engine
+        self.options = {'model': model, 'language': language, 'threads': threads}
+        self.pool = pool
+        self.workers = max(workers, 1)
+        # not_loaded -> loading -> ready | unavailable (engine not installed) | failed
+        self.state = 'not_loaded'
+        self.load_seconds = None
+        self.batcher = MicroBatcher(
+            'local_stt', self._submit, self.workers, max_queue, max_batch, batch_wait, on_broken=self._broken,
+        )
+        self._executor = None
+        self._engine = None  # the thread pool's shared engine
+        self._lock = threading.Lock()
+
+    @property
+    def engine_name(self):
+        if isinstance(self.engine, str):
+            return self.engine
+        factory = getattr(self.engine, 'func', self.engine)  # functools.partial
+        return getattr(factory, '__name__', repr(factory))
+
+    def available(self):
+        if self.state in ('unavailable', 'failed'):
+            return False
+        if self.state == 'not_loaded' and not engine_available(self.engine, ENGINES, ENGINE_REQUIRES):
+            logger.info(f"ℹ Local speech engine {self.engine_name} is not installed")
+            self.state = 'unavailable'
+            return False
+        return True
+
+    def _start(self):
+        """The worker pool, started on first use"""
+        with self._lock:
+            if self._executor is None:
+                if self.pool == 'thread':
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix='local-stt', initializer=self._load_shared_engine,
+                    )
+                else:
+                    # spawn, not fork: the server's threads would be copied into the children mid-flight
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                        initializer=_load_worker_engine, initargs=(self.engine, self.options),
+                    )
+            return self._executor
+
+    def _load_shared_engine(self):
+        with _engine_lock:
+            if self._engine is None:
+                self._engine = load_engine(self.engine, self.options, ENGINES)
+
+    def _transcribe_shared(self, clips):
+        return _transcribe_batch(clips, self._engine)
+
+    def _submit(self, clips):
+        task = self._transcribe_shared if self.pool == 'thread' else _transcribe_batch
+        return self._start().submit(task, clips)
+
+    def _broken(self, error):
+        # A worker died or its model would not load; stop routing clips here
+        logger.warning(f"✗ Local speech engine {self.engine_name} is unusable: {error}")
+        self.state = 'failed'
+
+    def warm(self):
+        """Start every worker and load its model now instead of on the first clip"""
+        if not self.available():
+            return False
+        self.state = 'loading'
+        started = time.perf_counter()
+        try:
+            executor = self._start()
+            # The pools start a worker per submission that finds none idle, so these land on different workers
+            for future in [executor.submit(_worker_ready) for _ in range(self.workers)]:
+                future.result()
+        except Exception as e:
+            logger.warning(f"✗ Failed to load local speech engine {self.engine_name}: {e}")
+            self.state = 'failed'
+            return False
+        self.state = 'ready'
+        self.load_seconds = time.perf_counter() - started
+        logger.info(f"✓ Local speech engine {self.engine_name} ({self.options['model']}) loaded in {self.workers} {self.pool} worker(s) in {self.load_seconds:.2f}s")
+        return True
+
+    def transcribe(self, content):
+        """Trim and downsample one clip, queue it and wait for its transcript, no longer than the request deadline"""
+        with timed('preprocess'):
+            prepared = preprocess_audio(content)
+        transcript = self.batcher.run(prepared.content)
+        if self.state == 'not_loaded':
+            self.state = 'ready'
+        return transcript
+
+    def stats(self):
+        return {
+            'backend': self.name,
+            'engine': self.engine_name,
+            'model': self.options['model'],
+            'pool': self.pool,
+            'state': self.state,
+            'load_seconds': round(self.load_seconds, 2) if self.load_seconds is not None else None,
+            **self.batcher.stats(),
+        }
+
+    def close(self):
+        self.batcher.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def local_stt_from_env():
+    """Local recognizer configured from LOCAL_STT_* settings"""
+    return LocalSpeechToText(
+        LOCAL_STT_ENGINE, LOCAL_STT_MODEL, LOCAL_STT_LANGUAGE, LOCAL_STT_POOL, LOCAL_STT_WORKERS,
+        LOCAL_STT_THREADS, LOCAL_STT_MAX_QUEUE, LOCAL_STT_MAX_BATCH, LOCAL_STT_BATCH_WAIT,
+    )
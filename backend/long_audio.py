@@ -0,0 +1,195 @@
+"""Chunked transcription for recordings longer than one synchronous recognize call accepts.
+
+Long PCM recordings are cut at the quietest point near each chunk limit, with a
+little overlap on either side of every cut so a word on the boundary is heard
+whole by at least one chunk. Chunks are recognized concurrently on a small
+bounded pool and the transcripts are joined in order, dropping the words the
+overlap made both neighbours hear. If any chunk fails, the recording fails
+with IncompleteTranscript (what was heard, and the time ranges that were not)
+rather than coming back with a silent gap.
+"""
+import os
+import re
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_preprocessing import VAD_FRAME_SECONDS, AudioFormat, decode_wav, encode_wav
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Synchronous recognition rejects audio over a minute; stay clear of the limit
+LONG_AUDIO_CHUNK_SECONDS = float(os.getenv('LONG_AUDIO_CHUNK_SECONDS', '50'))
+LONG_AUDIO_OVERLAP_SECONDS = float(os.getenv('LONG_AUDIO_OVERLAP_SECONDS', '1.0'))
+LONG_AUDIO_CONCURRENCY = int(os.getenv('LONG_AUDIO_CONCURRENCY', '4'))
+
+# How far back from the chunk limit to look for a pause to cut at
+SEARCH_FRACTION = 0.3
+# Energy is averaged over this long when looking for a pause, so a quiet frame inside a word does not win
+PAUSE_SECONDS = 0.1
+
+
+def plan_chunks(mono, sample_rate, chunk_seconds=LONG_AUDIO_CHUNK_SECONDS, overlap_seconds=LONG_AUDIO_OVERLAP_SECONDS):
+    """(start, end) sample ranges covering the signal, each at most chunk_seconds long"""
+    total = len(mono)
+    max_length = int(chunk_seconds * sample_rate)
+    if total <= max_length:
+        return [(0, total)]
+
+    half_overlap = int(overlap_seconds * sample_rate / 2)
+    frame = max(int(sample_rate * VAD_FRAME_SECONDS), 1)
+    count = total // frame
+    frames = mono[:count * frame].reshape(count, frame)
+    energy = np.sqrt(np.mean(frames * frames, axis=1))
+    width = max(int(PAUSE_SECONDS / VAD_FRAME_SECONDS), 1)
+    energy = np.convolve(energy, np.ones(width) / width, mode='same')
+
+    chunks = []
+    start = 0
+    while total - start > max_length:
+        # The chunk runs half an overlap past the cut, so the cut itself must come that much earlier
+        window_end = start + max_length - half_overlap
+        window_start = max(window_end - int(max_length * SEARCH_FRACTION), start + 2 * half_overlap + frame)
+        first, last = -(-window_start // frame), min(window_end // frame, count)
+        if last > first:
+            cut = (first + int(np.argmin(energy[first:last]))) * frame + frame // 2
+        else:
+            cut = window_end
+        chunks.append((start, min(cut + half_overlap, total)))
+        start = cut - half_overlap
+    chunks.append((start, total))
+    return chunks
+
+
+def _normalize_word(word):
+    return re.sub(r"[^\w']", '', word.lower())
+
+
+def stitch_transcripts(parts, max_overlap_words=8):
+    """Join chunk transcripts in order, dropping words repeated across each overlap"""
+    words = []
+    normalized = []
+    for part in parts:
+        new_words = (part or '').split()
+        new_normalized = [_normalize_word(word) for word in new_words]
+        # Longest run that ends the text so far and starts this chunk
+        for size in range(min(len(words), len(new_words), max_overlap_words), 0, -1):
+            if normalized[-size:] == new_normalized[:size]:
+                new_words = new_words[size:]
+                new_normalized = new_normalized[size:]
+                break
+        words.extend(new_words)
+        normalized.extend(new_normalized)
+    return ' '.join(words)
+
+
+class IncompleteTranscript(RuntimeError):
+    """Some chunks of a long recording could not be recognized"""
+
+    def __init__(self, transcript, missing, errors):
+        ranges = ", ".join(f"{start:.1f}-{end:.1f}s" for start, end in missing)
+        super().__init__(f"No transcript for {ranges} of the recording ({errors[-1]})")
+        self.transcript = transcript  # stitched from the chunks that worked
+        self.missing = missing  # [(start seconds, end seconds)] of the failed chunks
+        self.errors = errors
+
+
+class ChunkedTranscriber:
+    """Splits long PCM recordings and recognizes the pieces on a bounded pool"""
+
+    def __init__(self, chunk_seconds=LONG_AUDIO_CHUNK_SECONDS, overlap_seconds=LONG_AUDIO_OVERLAP_SECONDS, concurrency=LONG_AUDIO_CONCURRENCY):
+        self.chunk_seconds = chunk_seconds
+        self.overlap_seconds = overlap_seconds
+        self.concurrency = max(concurrency, 1)
+        # Generous bound on how many words fit in one overlap
+        self.max_overlap_words = int(overlap_seconds * 4) + 4
+        self._executor = None
+        self._lock = threading.Lock()
+        self.recordings = 0
+        self.chunks = 0
+        self.failed_chunks = 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # One pool for all requests, so the bound also caps calls against the recognition quota
+                self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='stt-chunk')
+            return self._executor
+
+    def split(self, content):
+        """(WAV bytes per chunk, their format, their (start, end) in seconds), or None if the
+        audio is not PCM or fits in one request"""
+        decoded = decode_wav(content)
+        if decoded is None:
+            return None
+        mono, sample_rate = decoded
+        if len(mono) <= self.chunk_seconds * sample_rate:
+            return None
+        plan = plan_chunks(mono, sample_rate, self.chunk_seconds, self.overlap_seconds)
+        return (
+            [encode_wav(mono[start:end], sample_rate) for start, end in plan],
+            AudioFormat('wav', 'LINEAR16', sample_rate, 1, 2),
+            [(start / sample_rate, end / sample_rate) for start, end in plan],
+        )
+
+    def transcribe(self, content, recognize):
+        """Transcript of a long recording via recognize(content, audio_format) per chunk, or None if it needs no splitting.
+
+        Raises the chunk's error when every chunk fails, and IncompleteTranscript when only some do.
+        """
+        split = self.split(content)
+        if split is None:
+            return None
+        payloads, chunk_format, ranges = split
+
+        def recognize_chunk(payload):
+            try:
+                return recognize(payload, chunk_format)
+            except Exception as e:
+                logger.warning(f"Chunk recognition failed: {e}")
+                return e
+
+        # Each chunk runs in a copy of the caller's context (request deadline, stage timings)
+        context = contextvars.copy_context()
+        results = list(self._get_executor().map(lambda payload: context.copy().run(recognize_chunk, payload), payloads))
+        failures = [result for result in results if isinstance(result, Exception)]
+        with self._lock:
+            self.recordings += 1
+            self.chunks += len(payloads)
+            self.failed_chunks += len(failures)
+        if len(failures) == len(results):
+            raise failures[-1]
+
+        texts = [result for result in results if not isinstance(result, Exception)]
+        if failures:
+            missing = [span for span, result in zip(ranges, results) if isinstance(result, Exception)]
+            raise IncompleteTranscript(stitch_transcripts(texts, self.max_overlap_words), missing, failures)
+        logger.info(f"Transcribed long recording in {len(payloads)} chunks")
+        return stitch_transcripts(texts, self.max_overlap_words)
+
+    def stats(self):
+        return {
+            'chunk_seconds': self.chunk_seconds,
+            'overlap_seconds': self.overlap_seconds,
+            'concurrency': self.concurrency,
+            'recordings': self.recordings,
+            'chunks': self.chunks,
+            'failed_chunks': self.failed_chunks,
+        }
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+def chunked_transcriber_from_env():
+    """Transcriber configured from LONG_AUDIO_* settings"""
+    return ChunkedTranscriber(LONG_AUDIO_CHUNK_SECONDS, LONG_AUDIO_OVERLAP_SECONDS, LONG_AUDIO_CONCURRENCY)
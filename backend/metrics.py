@@ -0,0 +1,231 @@
+"""Request-stage latency histograms and fallback/upstream counters in Prometheus text format.
+
+Stages are timed with `with timed('transcribe'): ...`; the timings of the current
+request are also collected for an optional Server-Timing response header.
+"""
+import os
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Stage latencies span cache hits (milliseconds) to slow upstream calls (seconds)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Add a Server-Timing header (per-stage durations) to API responses
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'false').lower() == 'true'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    type_name = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple((name, str(labels.get(name, ''))) for name in self.labelnames)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in sorted(self._values.items())]
+
+
+class Gauge(Counter):
+    """Value that goes up and down (queue depth, calls in flight)"""
+
+    type_name = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series = {}  # labels -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple((name, str(labels.get(name, ''))) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels):
+        key = tuple((name, str(labels.get(name, ''))) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            return series[2] if series else 0
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (bucket_counts, total, count) in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    samples.append((f'{self.name}_bucket', key + (('le', _format_value(bound)),), bucket_count))
+                samples.append((f'{self.name}_sum', key, total))
+                samples.append((f'{self.name}_count', key, count))
+        return samples
+
+
+class MetricsRegistry:
+    """The metrics served at /metrics"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name, documentation, labelnames=()):
+        metric = Gauge(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type_name}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    'fluentflow_stage_seconds',
+    'Time spent in each stage of a voice turn',
+    ('stage',),
+)
+FALLBACKS = registry.counter(
+    'fluentflow_fallbacks_total',
+    'Turns served by a fallback path (mock transcription, local response, TTS disabled)',
+    ('kind',),
+)
+UPSTREAM_RESPONSES = registry.counter(
+    'fluentflow_upstream_responses_total',
+    'HTTP responses from upstream services by status code',
+    ('upstream', 'status'),
+)
+
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+@contextmanager
+def timed(stage):
+    """Time a block into the stage histogram and the current request's Server-Timing"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((stage, elapsed))
+
+
+def count_fallback(kind):
+    FALLBACKS.inc(kind=kind)
+
+
+def upstream_response_hook(upstream):
+    """requests response hook that counts status codes for one upstream"""
+    def hook(response, *args, **kwargs):
+        UPSTREAM_RESPONSES.inc(upstream=upstream, status=response.status_code)
+    return hook
+
+
+def server_timing_header(timings):
+    return ', '.join(f'{stage};dur={elapsed * 1000:.1f}' for stage, elapsed in timings)
+
+
+class ServerTimingMiddleware:
+    """Collect the stage timings of each request and send them as a Server-Timing header"""
+
+    def __init__(self, app, enabled=None):
+        self.app = app
+        self.enabled = SERVER_TIMING if enabled is None else enabled
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        # A mutable list so timings recorded in worker threads (copied contexts) land here too
+        timings = []
+        token = _request_timings.set(timings)
+
+        async def send_with_timing(message):
+            if message['type'] == 'http.response.start' and timings:
+                headers = list(message.get('headers', []))
+                headers.append((b'server-timing', server_timing_header(timings).encode('latin-1')))
+                message = {**message, 'headers': headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
@@ -0,0 +1,206 @@
+"""A bounded queue that hands work to a small pool of workers in micro-batches.
+
+Callers block in run(item) until their result is ready. Batching is only done
+once a worker frees up. That way items arriving while every worker is busy go
+out together, and a lone item on an idle pool waits at most batch_wait. The
+queue is bounded. A full queue raises Overloaded (503 with Retry-After). A
+waiting caller gives up at its request deadline, or as soon as its call is
+cancelled (a hedge that lost); a cancelled item still in the queue is dropped.
+"""
+import math
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import BrokenExecutor, Future
+
+from admission import (
+    DEADLINE_EXCEEDED, CallAbandoned, DeadlineExceeded, Overloaded, check_cancelled, check_deadline, on_cancel, time_remaining,
+)
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+QUEUE_DEPTH = registry.gauge('fluentflow_batch_queue_depth', 'Items waiting for a worker per micro-batch queue', ('queue',))
+BATCH_SIZE = registry.histogram(
+    'fluentflow_batch_size',
+    'Items per micro-batch',
+    ('queue',),
+    buckets=(1, 2, 4, 8, 16, 32),
+)
+
+
+class MicroBatcher:
+    """Bounded micro-batching queue in front of `workers` workers.
+
+    submit(items) starts one batch on a worker and returns a concurrent.futures
+    Future of [(result, error message or None)], one pair per item.
+    """
+
+    def __init__(self, name, submit, workers=1, max_queue=16, max_batch=4, batch_wait=0.02, alpha=0.2, on_broken=None):
+        self.name = name
+        self.submit = submit
+        self.workers = max(workers, 1)
+        self.max_queue = max_queue
+        self.max_batch = max(max_batch, 1)
+        self.batch_wait = batch_wait
+        self.alpha = alpha
+        self.on_broken = on_broken  # called when the pool behind submit() is broken for good
+        self.items = 0
+        self.batches = 0
+        self.failed = 0
+        self.rejected = 0
+        self.ewma_batch_seconds = None
+        self._queue = deque()
+        self._pending = 0  # queued plus running
+        self._busy = 0  # workers with a batch
+        self._cond = threading.Condition()
+        self._slots = threading.Semaphore(self.workers)
+        self._dispatcher = None
+        self._closed = False
+
+    def retry_after(self):
+        """Whole seconds until the queue has likely drained enough to take another item"""
+        batch_seconds = self.ewma_batch_seconds or 1.0
+        rounds = self._pending / (self.workers * self.max_batch)
+        return max(1, math.ceil(batch_seconds * rounds))
+
+    def run(self, item):
+        """Queue one item and wait for its result, no longer than the request deadline"""
+        check_deadline(self.name)
+        check_cancelled(self.name)
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"{self.name} is shut down")
+            if self._pending >= self.max_queue:
+                self.rejected += 1
+                logger.warning(f"{self.name} queue full ({self._pending} items)")
+                raise Overloaded(f'{self.name}_queue_full', self.retry_after())
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, name=f'{self.name}-batcher', daemon=True)
+                self._dispatcher.start()
+            self._pending += 1
+            self._queue.append((item, future))
+            QUEUE_DEPTH.set(len(self._queue), queue=self.name)
+            self._cond.notify_all()
+
+        wake = threading.Event()
+        future.add_done_callback(lambda done: wake.set())
+        on_cancel(wake.set)
+        if not wake.wait(time_remaining()):
+            future.cancel()  # still queued: the batcher drops it
+            DEADLINE_EXCEEDED.inc(upstream=self.name)
+            raise DeadlineExceeded(f"Request deadline passed waiting for {self.name}")
+        if not future.done():
+            # Cancelled: a queued item is dropped, a running one finishes unread
+            future.cancel()
+            raise CallAbandoned(f"{self.name} call abandoned")
+        result, error = future.result()
+        if error:
+            raise RuntimeError(f"{self.name} failed: {error}")
+        return result
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._queue and not self._closed:
+                self._cond.wait()
+            # Give items arriving just behind the first one a moment to join it
+            wait_until = time.monotonic() + self.batch_wait
+            while len(self._queue) < self.max_batch and not self._closed:
+                remaining = wait_until - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            if self._closed:
+                return None
+            # Spread what is queued over the idle workers rather than handing it all to one
+            size = min(self.max_batch, math.ceil(len(self._queue) / (self.workers - self._busy)))
+            batch = []
+            while self._queue and len(batch) < size:
+                item, future = self._queue.popleft()
+                if future.set_running_or_notify_cancel():
+                    batch.append((item, future))
+                else:
+                    self._pending -= 1  # its caller gave up waiting
+            QUEUE_DEPTH.set(len(self._queue), queue=self.name)
+            if batch:
+                self._busy += 1
+            return batch
+
+    def _dispatch(self):
+        while True:
+            self._slots.acquire()
+            batch = self._next_batch()
+            if batch is None:
+                return
+            if not batch:
+                self._slots.release()
+                continue
+            started = time.perf_counter()
+            try:
+                submitted = self.submit([item for item, _ in batch])
+            except Exception as e:
+                self._finish(batch, started, error=e)
+                continue
+            submitted.add_done_callback(lambda done, batch=batch, started=started: self._finish(batch, started, done))
+
+    def _finish(self, batch, started, done=None, error=None):
+        if error is None:
+            try:
+                results = done.result()
+            except Exception as e:
+                error = e
+        elapsed = time.perf_counter() - started
+        if error is not None:
+            logger.warning(f"{self.name} batch of {len(batch)} failed: {error}")
+            if isinstance(error, BrokenExecutor) and self.on_broken:
+                self.on_broken(error)
+            results = [(None, f"{type(error).__name__}: {error}")] * len(batch)
+
+        with self._cond:
+            self._pending -= len(batch)
+            self._busy -= 1
+            self.items += len(batch)
+            self.batches += 1
+            self.failed += sum(1 for _, item_error in results if item_error)
+            if error is None:
+                if self.ewma_batch_seconds is None:
+                    self.ewma_batch_seconds = elapsed
+                else:
+                    self.ewma_batch_seconds = self.alpha * elapsed + (1 - self.alpha) * self.ewma_batch_seconds
+        BATCH_SIZE.observe(len(batch), queue=self.name)
+        self._slots.release()
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'queue_depth': len(self._queue),
+                'pending': self._pending,
+                'max_batch': self.max_batch,
+                'batch_wait_ms': round(self.batch_wait * 1000, 1),
+                'items': self.items,
+                'batches': self.batches,
+                'mean_batch_size': round(self.items / self.batches, 2) if self.batches else None,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'ewma_batch_ms': round(self.ewma_batch_seconds * 1000, 1) if self.ewma_batch_seconds is not None else None,
+            }
+
+    def close(self):
+        """Stop batching and fail whatever is still queued"""
+        with self._cond:
+            self._closed = True
+            abandoned = list(self._queue)
+            self._queue.clear()
+            self._pending -= len(abandoned)
+            QUEUE_DEPTH.set(0, queue=self.name)
+            self._cond.notify_all()
+        self._slots.release()  # wake the batcher if it is waiting for a worker
+        for _, future in abandoned:
+            if future.set_running_or_notify_cancel():
+                future.set_result((None, f"{self.name} shut down"))
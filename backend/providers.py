@@ -0,0 +1,208 @@
+"""Latency-aware routing across the LLM providers with hedging and circuit breakers."""
+import time
+import asyncio
+import logging
+import threading
+
+from admission import CancelToken, cancel_scope, time_remaining
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures; lets one trial call through after a cooldown"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=3, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may be attempted right now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def release(self):
+        """Give back a half-open trial slot whose call was abandoned"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Circuit opened after {self.consecutive_failures} consecutive failures")
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+            self._trial_in_flight = False
+
+
+class Provider:
+    """One LLM backend plus its EWMA latency/error stats and circuit breaker"""
+
+    def __init__(self, name, call, is_configured=lambda: True, alpha=0.3, breaker=None):
+        self.name = name
+        self.call = call  # blocking callable(user_message, conversation_history) -> str or None
+        self.is_configured = is_configured
+        self.alpha = alpha
+        self.breaker = breaker or CircuitBreaker()
+        self.ewma_latency = None
+        self.ewma_error_rate = 0.0
+        self.calls = 0
+        self.failures = 0
+        self.wins = 0
+        self.abandoned = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency, ok):
+        with self._lock:
+            self.calls += 1
+            if not ok:
+                self.failures += 1
+            if self.ewma_latency is None:
+                self.ewma_latency = latency
+            else:
+                self.ewma_latency = self.alpha * latency + (1 - self.alpha) * self.ewma_latency
+            self.ewma_error_rate = self.alpha * (0.0 if ok else 1.0) + (1 - self.alpha) * self.ewma_error_rate
+        if ok:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def record_abandoned(self, elapsed):
+        """A call cancelled after elapsed seconds (it lost a hedge race): its latency is at least that.
+
+        The censored sample can only raise the estimate, so a provider that keeps
+        losing is ranked down instead of looking untried (score 0) forever.
+        """
+        with self._lock:
+            self.abandoned += 1
+            if self.ewma_latency is None:
+                self.ewma_latency = elapsed
+            elif elapsed > self.ewma_latency:
+                self.ewma_latency = self.alpha * elapsed + (1 - self.alpha) * self.ewma_latency
+        self.breaker.release()
+
+    def record_win(self):
+        with self._lock:
+            self.wins += 1
+
+    def score(self):
+        """Expected cost of trying this provider; untried providers score 0 so they get explored"""
+        latency = self.ewma_latency or 0.0
+        return latency * (1.0 + 4.0 * self.ewma_error_rate)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'configured': bool(self.is_configured()),
+                'circuit': self.breaker.state,
+                'calls': self.calls,
+                'failures': self.failures,
+                'wins': self.wins,
+                'abandoned': self.abandoned,
+                'ewma_latency_ms': round(self.ewma_latency * 1000, 1) if self.ewma_latency is not None else None,
+                'ewma_error_rate': round(self.ewma_error_rate, 3),
+            }
+
+
+class ProviderRouter:
+    """Hedged requests across providers: start the best one, add the next after hedge_delay
+    (or as soon as one fails), take the first valid answer and cancel the rest.
+
+    A cancelled call's CancelToken is set, so provider code that checks it (HTTP
+    requests not yet sent, streamed reads, the local model queue) stops early.
+
+    A hedge_delay of 0 races every available provider at once.
+    """
+
+    def __init__(self, providers, hedge_delay=1.0, run_blocking=None):
+        self.providers = list(providers)
+        self.hedge_delay = hedge_delay
+        self.run_blocking = run_blocking or asyncio.to_thread
+
+    def candidates(self):
+        """Configured providers, best first"""
+        available = [p for p in self.providers if p.is_configured()]
+        available.sort(key=lambda p: p.score())
+        return available
+
+    async def _attempt(self, provider, user_message, conversation_history):
+        start = time.perf_counter()
+        token = CancelToken()
+        try:
+            with cancel_scope(token):
+                result = await self.run_blocking(provider.call, user_message, conversation_history)
+        except asyncio.CancelledError:
+            # Tell the worker thread to stop (it would otherwise run to its timeout)
+            token.cancel()
+            provider.record_abandoned(time.perf_counter() - start)
+            raise
+        except Exception as e:
+            logger.debug(f"Provider {provider.name} raised: {e}")
+            result = None
+        ok = bool(result and result.strip())
+        provider.record(time.perf_counter() - start, ok)
+        return provider, (result.strip() if ok else None)
+
+    async def generate(self, user_message, conversation_history):
+        """Return (provider_name, text) from the first provider with a valid answer, or (None, None)"""
+        pending_providers = self.candidates()
+        running = set()
+        try:
+            while pending_providers or running:
+                if pending_providers:
+                    remaining = time_remaining()
+                    if remaining is not None and remaining <= 0:
+                        # Past the request deadline: no new attempts, only wait on those running
+                        pending_providers = []
+                        continue
+                    provider = pending_providers.pop(0)
+                    if not provider.breaker.allow():
+                        # Dead or failing provider: skip instantly instead of waiting on a timeout
+                        continue
+                    running.add(asyncio.create_task(self._attempt(provider, user_message, conversation_history)))
+                    timeout = self.hedge_delay if pending_providers else None
+                else:
+                    timeout = None
+                if not running:
+                    continue
+
+                done, running = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    provider, text = task.result()
+                    if text:
+                        provider.record_win()
+                        logger.info(f"✅ Reply from {provider.name}")
+                        return provider.name, text
+            return None, None
+        finally:
+            for task in running:
+                task.cancel()
+
+    def stats(self):
+        return {p.name: p.stats() for p in self.providers}
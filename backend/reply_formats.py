@@ -0,0 +1,159 @@
+"""Reply audio encodings and response framing, negotiated from the Accept header.
+
+Audio: audio/mpeg (MP3, the default) or audio/ogg (Opus, far smaller for
+speech). A rate parameter picks the Opus sample rate, which is what sets its
+bitrate through Google TTS:
+    Accept: application/json, audio/ogg; codecs=opus; rate=16000
+
+Framing: application/json (the default) returns an audio_url to fetch in a
+second request. multipart/mixed or application/vnd.fluentflow.reply carry the
+audio in the same response:
+    multipart/mixed                    part 1 the JSON reply, part 2 the audio
+    application/vnd.fluentflow.reply   4-byte big-endian JSON length, JSON,
+                                       4-byte big-endian audio length, audio
+"""
+import os
+import json
+import uuid
+import struct
+
+from fastapi.responses import Response
+
+# Opus sample rate used when the client does not ask for one
+TTS_OPUS_SAMPLE_RATE = int(os.getenv('TTS_OPUS_SAMPLE_RATE', '24000'))
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+FRAME_MEDIA_TYPE = 'application/vnd.fluentflow.reply'
+
+
+class SpeechFormat:
+    """An audio encoding Google TTS can produce and how it is served"""
+
+    def __init__(self, encoding, media_type, extension, sample_rate_hertz=None):
+        self.encoding = encoding  # texttospeech.AudioEncoding name
+        self.media_type = media_type
+        self.extension = extension
+        self.sample_rate_hertz = sample_rate_hertz
+
+    @property
+    def cache_key(self):
+        """Distinguishes synthesized audio in the TTS cache"""
+        return f"{self.encoding}@{self.sample_rate_hertz}" if self.sample_rate_hertz else self.encoding
+
+    def __repr__(self):
+        return f"SpeechFormat({self.cache_key})"
+
+
+MP3 = SpeechFormat('MP3', 'audio/mpeg', 'mp3')
+
+
+def ogg_opus(sample_rate_hertz=None):
+    """Ogg Opus at the nearest supported sample rate"""
+    requested = sample_rate_hertz or TTS_OPUS_SAMPLE_RATE
+    rate = min(OPUS_SAMPLE_RATES, key=lambda supported: abs(supported - requested))
+    return SpeechFormat('OGG_OPUS', 'audio/ogg', 'ogg', rate)
+
+
+def speech_format_named(name):
+    """SpeechFormat for a cache-key style name: MP3, OGG_OPUS or OGG_OPUS@16000"""
+    encoding, _, rate = name.strip().upper().partition('@')
+    if encoding == 'MP3':
+        return MP3
+    if encoding == 'OGG_OPUS':
+        return ogg_opus(int(rate) if rate else None)
+    raise ValueError(f"Unknown speech format: {name}")
+
+
+def parse_accept(header):
+    """[(media type, params, q)] from an Accept header, most preferred first"""
+    entries = []
+    for position, item in enumerate((header or '').split(',')):
+        parts = [part.strip() for part in item.split(';')]
+        media_type = parts[0].lower()
+        if not media_type:
+            continue
+        params = {}
+        for part in parts[1:]:
+            name, _, value = part.partition('=')
+            params[name.strip().lower()] = value.strip().strip('"')
+        try:
+            q = float(params.pop('q', 1))
+        except ValueError:
+            q = 1.0
+        entries.append((-q, position, media_type, params))
+    entries.sort()
+    return [(media_type, params, -neg_q) for neg_q, _, media_type, params in entries if neg_q < 0]
+
+
+def negotiate_speech_format(accept):
+    """The reply audio encoding the client prefers (MP3 unless it asks for Opus)"""
+    for media_type, params, _ in parse_accept(accept):
+        if media_type in ('audio/ogg', 'audio/opus'):
+            try:
+                rate = int(params['rate']) if 'rate' in params else None
+            except ValueError:
+                rate = None
+            return ogg_opus(rate)
+        if media_type in ('audio/mpeg', 'audio/mp3'):
+            return MP3
+    return MP3
+
+
+def negotiate_framing(accept):
+    """'json', 'multipart' or 'frame': how the reply and its audio are returned"""
+    for media_type, _, _ in parse_accept(accept):
+        if media_type == 'multipart/mixed':
+            return 'multipart'
+        if media_type == FRAME_MEDIA_TYPE:
+            return 'frame'
+        if media_type in ('application/json', 'application/*', '*/*'):
+            return 'json'
+    return 'json'
+
+
+def encode_frame(payload, audio):
+    body = json.dumps(payload).encode('utf-8')
+    audio = audio or b''
+    return struct.pack('>I', len(body)) + body + struct.pack('>I', len(audio)) + audio
+
+
+def decode_frame(data):
+    """(payload, audio bytes) from an encode_frame() body"""
+    json_length = struct.unpack('>I', data[:4])[0]
+    payload = json.loads(data[4:4 + json_length])
+    audio_start = 8 + json_length
+    audio_length = struct.unpack('>I', data[4 + json_length:audio_start])[0]
+    return payload, data[audio_start:audio_start + audio_length]
+
+
+def encode_multipart(payload, audio, audio_media_type, boundary=None):
+    """(body, content type) of a multipart/mixed reply; the audio part is left out when there is none"""
+    boundary = boundary or uuid.uuid4().hex
+    parts = [(b'application/json', json.dumps(payload).encode('utf-8'))]
+    if audio:
+        parts.append((audio_media_type.encode('ascii'), audio))
+    body = b''
+    for media_type, content in parts:
+        body += (
+            b'--' + boundary.encode('ascii') + b'\r\n'
+            + b'Content-Type: ' + media_type + b'\r\n'
+            + b'Content-Length: ' + str(len(content)).encode('ascii') + b'\r\n\r\n'
+            + content + b'\r\n'
+        )
+    body += b'--' + boundary.encode('ascii') + b'--\r\n'
+    return body, f'multipart/mixed; boundary={boundary}'
+
+
+def inline_reply_response(payload, audio, speech_format, framing):
+    """One response carrying both the JSON reply and its audio"""
+    payload = {
+        **payload,
+        'audio_url': None,
+        'audio_media_type': speech_format.media_type if audio else None,
+        'audio_bytes': len(audio) if audio else 0,
+    }
+    headers = {'Vary': 'Accept'}
+    if framing == 'multipart':
+        body, content_type = encode_multipart(payload, audio, speech_format.media_type)
+        return Response(content=body, media_type=content_type, headers=headers)
+    return Response(content=encode_frame(payload, audio), media_type=FRAME_MEDIA_TYPE, headers=headers)
@@ -0,0 +1,216 @@
+"""Token streaming of tutor replies with sentence-level incremental TTS."""
+import re
+import time
+import json
+import asyncio
+import logging
+
+from admission import CancelToken, cancel_scope
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+# Sentence end: terminal punctuation, optional closing quote/bracket, then whitespace
+_SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*\s+")
+_ABBREVIATIONS = {"mr.", "mrs.", "ms.", "dr.", "e.g.", "i.e.", "etc.", "vs.", "st."}
+
+
+class SentenceSplitter:
+    """Accumulates streamed text and hands back each sentence once it is complete"""
+
+    def __init__(self):
+        self._buffer = ""
+
+    def feed(self, text):
+        """Add text; return the list of sentences completed by it"""
+        self._buffer += text
+        sentences = []
+        search_from = 0
+        while True:
+            match = _SENTENCE_END.search(self._buffer, search_from)
+            if not match:
+                break
+            candidate = self._buffer[:match.end()].strip()
+            last_word = candidate.split()[-1].lower() if candidate else ""
+            if last_word in _ABBREVIATIONS:
+                search_from = match.end()
+                continue
+            sentences.append(candidate)
+            self._buffer = self._buffer[match.end():]
+            search_from = 0
+        return sentences
+
+    def flush(self):
+        """Return whatever is left as a final sentence (or None)"""
+        remainder, self._buffer = self._buffer.strip(), ""
+        return remainder or None
+
+
+async def iterate_in_thread(run_blocking, generator_factory, *args):
+    """Consume a blocking generator on a worker thread, yielding its items on the event loop.
+
+    When the consumer stops early (e.g. the client disconnected) the thread is
+    told to stop: it checks between items, the generator is closed, and
+    streamers that registered on_cancel() hang up their upstream response.
+    """
+    loop = asyncio.get_running_loop()
+    items = asyncio.Queue()
+    stop = CancelToken()
+
+    def put(item):
+        try:
+            loop.call_soon_threadsafe(items.put_nowait, item)
+        except RuntimeError:
+            pass  # the event loop is gone; nobody is listening
+
+    def pump():
+        generator = generator_factory(*args)
+        try:
+            with cancel_scope(stop):
+                for item in generator:
+                    if stop.cancelled:
+                        break
+                    put(item)
+        except Exception as e:
+            if not stop.cancelled:
+                put(e)
+        finally:
+            generator.close()
+            put(_DONE)
+
+    pump_task = asyncio.ensure_future(run_blocking(pump))
+    try:
+        while True:
+            item = await items.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.cancel()
+        if not pump_task.done():
+            pump_task.cancel()
+
+
+async def stream_tokens(providers, streamers, run_blocking, user_message, conversation_history, fallback):
+    """Yield (provider_name, token) from the first streaming provider that produces output.
+
+    providers: Provider objects in preference order (breakers and stats are honoured);
+    streamers: provider name -> blocking generator function(user_message, history);
+    fallback: callable returning a whole reply when no provider streams anything.
+    """
+    for provider in providers:
+        streamer = streamers.get(provider.name)
+        if streamer is None or not provider.breaker.allow():
+            continue
+        start = time.perf_counter()
+        produced = False
+        try:
+            async for token in iterate_in_thread(run_blocking, streamer, user_message, conversation_history):
+                if token:
+                    produced = True
+                    yield provider.name, token
+        except Exception as e:
+            logger.debug(f"Streaming from {provider.name} failed: {e}")
+            if produced:
+                # Tokens already went out; we cannot switch providers mid-reply
+                provider.record(time.perf_counter() - start, False)
+                return
+        provider.record(time.perf_counter() - start, produced)
+        if produced:
+            provider.record_win()
+            return
+
+    # No provider streamed anything: send the local reply word by word
+    words = fallback().split(" ")
+    for index, word in enumerate(words):
+        yield 'local', word if index == 0 else " " + word
+
+
+def sse_event(event, data):
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_reply_events(tokens, synthesize, on_complete=None):
+    """Turn a token stream into SSE events, synthesizing audio per sentence as soon as it completes.
+
+    tokens: async iterator of (provider_name, token);
+    synthesize: async callable(sentence) -> audio URL or None;
+    on_complete: optional callable(reply) returning extra fields for the done event.
+    Audio events are emitted in sentence order, interleaved with later tokens.
+    """
+    events = asyncio.Queue()
+    started = time.perf_counter()
+    first_audio_at = None
+    splitter = SentenceSplitter()
+    pending_audio = asyncio.Queue()
+
+    async def emit_audio():
+        nonlocal first_audio_at
+        while True:
+            item = await pending_audio.get()
+            if item is _DONE:
+                return
+            index, task = item
+            try:
+                audio_url = await task
+            except Exception as e:
+                logger.warning(f"Sentence TTS failed: {e}")
+                audio_url = None
+            if audio_url and first_audio_at is None:
+                first_audio_at = time.perf_counter()
+            await events.put(sse_event('audio', {'index': index, 'audio_url': audio_url}))
+
+    async def produce():
+        provider_name = None
+        reply = ""
+        index = 0
+
+        def sentence_ready(sentence):
+            nonlocal index
+            pending_audio.put_nowait((index, asyncio.ensure_future(synthesize(sentence))))
+            events.put_nowait(sse_event('sentence', {'index': index, 'text': sentence}))
+            index += 1
+
+        try:
+            async for provider_name, token in tokens:
+                reply += token
+                await events.put(sse_event('token', {'text': token}))
+                for sentence in splitter.feed(token):
+                    sentence_ready(sentence)
+            remainder = splitter.flush()
+            if remainder:
+                sentence_ready(remainder)
+        finally:
+            pending_audio.put_nowait(_DONE)
+        return provider_name, reply
+
+    audio_task = asyncio.ensure_future(emit_audio())
+    produce_task = asyncio.ensure_future(produce())
+    both = asyncio.ensure_future(asyncio.gather(produce_task, audio_task, return_exceptions=True))
+    both.add_done_callback(lambda _: events.put_nowait(_DONE))
+
+    try:
+        while True:
+            event = await events.get()
+            if event is _DONE:
+                break
+            yield event
+        if produce_task.exception() is not None:
+            logger.error(f"Reply streaming failed: {produce_task.exception()}")
+            yield sse_event('error', {'detail': 'Failed to generate a reply'})
+            return
+        provider_name, reply = produce_task.result()
+        done = {'reply': reply.strip(), 'provider': provider_name}
+        if on_complete is not None:
+            done.update(on_complete(reply.strip()) or {})
+        if first_audio_at is not None:
+            done['time_to_first_audio_ms'] = round((first_audio_at - started) * 1000, 1)
+        yield sse_event('done', done)
+    finally:
+        for task in (produce_task, audio_task, both):
+            if not task.done():
+                task.cancel()
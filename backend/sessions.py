@@ -0,0 +1,290 @@
+"""Server-side conversation sessions so clients send only the new turn.
+
+SessionStore keeps sessions in process (single worker); SqliteSessionStore keeps
+them in a sqlite file under SHARED_STATE_DIR so every worker sees every session.
+"""
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict, deque
+
+from shared_state import connect, shared_state_path
+
+logger = logging.getLogger(__name__)
+
+
+def valid_turns(history):
+    """The well-formed turns of a client-posted history: dicts with a string type and content"""
+    if not isinstance(history, list):
+        return []
+    return [
+        turn for turn in history
+        if isinstance(turn, dict) and isinstance(turn.get('type'), str) and isinstance(turn.get('content'), str)
+    ]
+
+
+def turn_size(turn):
+    """Approximate memory held by one turn"""
+    return len(turn.get('content', '')) + 64
+
+
+class Session:
+    """A bounded ring buffer of turns plus per-session provider state"""
+
+    def __init__(self, session_id, max_turns, now):
+        self.id = session_id
+        self.turns = deque(maxlen=max_turns)
+        self.last_seen = now
+        self.size = 0
+        self.provider_state = {}
+
+    def append(self, turn):
+        if len(self.turns) == self.turns.maxlen:
+            self.size -= turn_size(self.turns[0])
+        self.turns.append(turn)
+        self.size += turn_size(turn)
+
+    def history(self):
+        return list(self.turns)
+
+
+class SessionStore:
+    """Sessions keyed by ID with idle eviction and a memory cap across all sessions"""
+
+    def __init__(self, max_turns=20, idle_timeout=1800, max_bytes=16 * 1024 * 1024, clock=time.monotonic):
+        self.max_turns = max_turns
+        self.idle_timeout = idle_timeout
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self._sessions = OrderedDict()  # least recently used first
+        self._size = 0
+        self._lock = threading.Lock()
+        self.evicted_idle = 0
+        self.evicted_memory = 0
+
+    def _evict(self, now):
+        # Sessions are ordered by last use, so idle ones are always at the front
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_seen < self.idle_timeout:
+                break
+            self._drop(session.id)
+            self.evicted_idle += 1
+        while self._size > self.max_bytes and len(self._sessions) > 1:
+            oldest = next(iter(self._sessions))
+            self._drop(oldest)
+            self.evicted_memory += 1
+
+    def _drop(self, session_id):
+        session = self._sessions.pop(session_id)
+        self._size -= session.size
+
+    def _touch(self, session, now):
+        session.last_seen = now
+        self._sessions.move_to_end(session.id)
+
+    def get(self, session_id):
+        """Return the live session for an ID, or None"""
+        now = self.clock()
+        with self._lock:
+            self._evict(now)
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._touch(session, now)
+            return session
+
+    def get_or_create(self, session_id=None, history=None):
+        """Return the session for session_id, creating it (seeded with history) if missing"""
+        now = self.clock()
+        with self._lock:
+            self._evict(now)
+            session = self._sessions.get(session_id) if session_id else None
+            if session is None:
+                session = Session(session_id or uuid.uuid4().hex, self.max_turns, now)
+                for turn in history or []:
+                    session.append(turn)
+                self._sessions[session.id] = session
+                self._size += session.size
+            self._touch(session, now)
+            return session
+
+    def history(self, session_id):
+        """Copy of a session's turns (empty if the session is unknown or expired)"""
+        session = self.get(session_id)
+        if session is None:
+            return []
+        with self._lock:
+            return session.history()
+
+    def append(self, session_id, turns):
+        """Add turns to a session, creating it if it has been evicted"""
+        session = self.get_or_create(session_id)
+        with self._lock:
+            before = session.size
+            for turn in turns:
+                session.append(turn)
+            if session.id in self._sessions:
+                self._size += session.size - before
+            self._evict(self.clock())
+
+    def cleanup(self):
+        """Drop idle sessions now instead of on the next access"""
+        with self._lock:
+            self._evict(self.clock())
+
+    def close(self):
+        pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'sessions': len(self._sessions),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'max_turns': self.max_turns,
+                'idle_timeout_seconds': self.idle_timeout,
+                'evicted_idle': self.evicted_idle,
+                'evicted_memory': self.evicted_memory,
+            }
+
+
+class SqliteSessionStore:
+    """Sessions in a sqlite file shared by all workers; same interface as SessionStore.
+
+    The turn cap and idle timeout apply as in memory; max_bytes is not enforced
+    because nothing is held in process memory.
+    """
+
+    def __init__(self, db_path, max_turns=20, idle_timeout=1800, clock=time.time):
+        self.max_turns = max_turns
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+        self.evicted_idle = 0
+        self._db = connect(db_path)
+        self._db.execute("CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, last_seen REAL NOT NULL)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS session_turns "
+            "(seq INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, turn TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS session_turns_session ON session_turns (session_id, seq)")
+        self._db.commit()
+        self._lock = threading.Lock()
+        logger.info(f"Shared session store at {db_path}")
+
+    def _evict(self, now):
+        cutoff = now - self.idle_timeout
+        self._db.execute(
+            "DELETE FROM session_turns WHERE session_id IN (SELECT id FROM sessions WHERE last_seen <= ?)", (cutoff,)
+        )
+        self.evicted_idle += self._db.execute("DELETE FROM sessions WHERE last_seen <= ?", (cutoff,)).rowcount
+
+    def _load(self, session_id, now):
+        session = Session(session_id, self.max_turns, now)
+        rows = self._db.execute(
+            "SELECT turn FROM session_turns WHERE session_id = ? ORDER BY seq", (session_id,)
+        ).fetchall()
+        for (turn,) in rows:
+            session.append(json.loads(turn))
+        return session
+
+    def _add_turns(self, session_id, turns):
+        self._db.executemany(
+            "INSERT INTO session_turns (session_id, turn) VALUES (?, ?)",
+            [(session_id, json.dumps(turn)) for turn in turns],
+        )
+        # Keep only the newest max_turns, like the in-memory ring buffer
+        self._db.execute(
+            "DELETE FROM session_turns WHERE session_id = ? AND seq NOT IN "
+            "(SELECT seq FROM session_turns WHERE session_id = ? ORDER BY seq DESC LIMIT ?)",
+            (session_id, session_id, self.max_turns),
+        )
+
+    def _touch(self, session_id, now):
+        return self._db.execute("UPDATE sessions SET last_seen = ? WHERE id = ?", (now, session_id)).rowcount
+
+    def get(self, session_id):
+        """Return a snapshot of the live session for an ID, or None"""
+        now = self.clock()
+        with self._lock:
+            self._evict(now)
+            found = self._touch(session_id, now)
+            self._db.commit()
+            return self._load(session_id, now) if found else None
+
+    def get_or_create(self, session_id=None, history=None):
+        """Return the session for session_id, creating it (seeded with history) if missing"""
+        now = self.clock()
+        session_id = session_id or uuid.uuid4().hex
+        with self._lock:
+            self._evict(now)
+            if not self._touch(session_id, now):
+                self._db.execute("INSERT OR IGNORE INTO sessions (id, last_seen) VALUES (?, ?)", (session_id, now))
+                self._add_turns(session_id, history or [])
+            self._db.commit()
+            return self._load(session_id, now)
+
+    def history(self, session_id):
+        """Copy of a session's turns (empty if the session is unknown or expired)"""
+        session = self.get(session_id)
+        return session.history() if session is not None else []
+
+    def append(self, session_id, turns):
+        """Add turns to a session, creating it if it has been evicted"""
+        now = self.clock()
+        with self._lock:
+            if not self._touch(session_id, now):
+                self._db.execute("INSERT OR IGNORE INTO sessions (id, last_seen) VALUES (?, ?)", (session_id, now))
+            self._add_turns(session_id, turns)
+            self._db.commit()
+
+    def cleanup(self):
+        """Drop idle sessions now instead of on the next access"""
+        with self._lock:
+            self._evict(self.clock())
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def stats(self):
+        with self._lock:
+            sessions = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+            size = self._db.execute("SELECT COALESCE(SUM(LENGTH(turn)), 0) FROM session_turns").fetchone()[0]
+        return {
+            'backend': 'sqlite',
+            'sessions': sessions,
+            'bytes': size,
+            'max_turns': self.max_turns,
+            'idle_timeout_seconds': self.idle_timeout,
+            'evicted_idle': self.evicted_idle,
+        }
+
+
+def turns_for_reply(reply):
+    """The history entries one processed turn adds (same shape the frontend keeps)"""
+    turns = [{'type': 'user', 'content': reply['transcript']}]
+    if reply.get('corrected_transcript') and reply['corrected_transcript'] != reply['transcript']:
+        turns.append({'type': 'correction', 'content': reply['corrected_transcript']})
+    turns.append({'type': 'assistant', 'content': reply['reply']})
+    return turns
+
+
+def session_store_from_env():
+    """Build the session store from SESSION_* environment variables (shared when SHARED_STATE_DIR is set)"""
+    db_path = shared_state_path('sessions.sqlite')
+    if db_path:
+        return SqliteSessionStore(
+            db_path,
+            max_turns=int(os.getenv('SESSION_MAX_TURNS', '20')),
+            idle_timeout=float(os.getenv('SESSION_IDLE_TIMEOUT', '1800')),
+        )
+    return SessionStore(
+        max_turns=int(os.getenv('SESSION_MAX_TURNS', '20')),
+        idle_timeout=float(os.getenv('SESSION_IDLE_TIMEOUT', '1800')),
+        max_bytes=int(os.getenv('SESSION_MAX_BYTES', str(16 * 1024 * 1024))),
+    )
@@ -0,0 +1,87 @@
+"""State shared between uvicorn workers: sqlite connections under SHARED_STATE_DIR and cross-worker leases.
+
+Without SHARED_STATE_DIR every store stays in-process, which is only correct
+with a single worker.
+"""
+import os
+import time
+import socket
+import logging
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+SHARED_STATE_DIR = os.getenv('SHARED_STATE_DIR', '')
+
+# Identifies this worker as a lease holder
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def shared_state_path(*parts):
+    """Path under SHARED_STATE_DIR, or None when running without shared state"""
+    if not SHARED_STATE_DIR:
+        return None
+    os.makedirs(SHARED_STATE_DIR, exist_ok=True)
+    return os.path.join(SHARED_STATE_DIR, *parts)
+
+
+def connect(db_path):
+    """Open a sqlite connection that several processes can use concurrently"""
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Writers from other workers wait (up to timeout) instead of failing with "database is locked"
+    connection = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+class Lease:
+    """Time-limited named leases so periodic jobs run in one worker at a time"""
+
+    def __init__(self, db_path, owner=WORKER_ID, clock=time.time):
+        self.owner = owner
+        self.clock = clock
+        self._db = connect(db_path)
+        self._db.isolation_level = None  # transactions are managed explicitly below
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS leases "
+            "(name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+
+    def acquire(self, name, ttl_seconds):
+        """Take (or renew) the lease if it is free, expired or already ours; returns whether we hold it"""
+        now = self.clock()
+        with self._lock:
+            try:
+                self._db.execute("BEGIN IMMEDIATE")
+                row = self._db.execute("SELECT owner, expires_at FROM leases WHERE name = ?", (name,)).fetchone()
+                if row is not None and row[0] != self.owner and row[1] > now:
+                    self._db.execute("COMMIT")
+                    return False
+                self._db.execute(
+                    "INSERT OR REPLACE INTO leases (name, owner, expires_at) VALUES (?, ?, ?)",
+                    (name, self.owner, now + ttl_seconds),
+                )
+                self._db.execute("COMMIT")
+                return True
+            except sqlite3.Error as e:
+                logger.warning(f"Could not acquire lease {name}: {e}")
+                try:
+                    self._db.execute("ROLLBACK")
+                except sqlite3.Error:
+                    pass
+                return False
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def lease_from_env():
+    """Shared lease table under SHARED_STATE_DIR, or None with in-process state"""
+    path = shared_state_path('leases.sqlite')
+    return Lease(path) if path else None
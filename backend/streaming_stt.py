@@ -0,0 +1,171 @@
+"""Streaming speech recognition backends used by the /ws/voice WebSocket.
+
+Every recognizer takes audio chunks through feed(), is closed off with
+finish(), and yields (is_final, transcript) pairs from results() as they
+arrive, ending after the final transcript.
+"""
+import abc
+import asyncio
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+class StreamingRecognizer(abc.ABC):
+    """Base class: bridges recognition results onto the event loop"""
+
+    def __init__(self):
+        self._results = asyncio.Queue()
+        self._loop = None
+        self._finished = False
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+
+    def _emit(self, is_final, transcript):
+        # Safe to call from any thread
+        self._loop.call_soon_threadsafe(self._results.put_nowait, (is_final, transcript))
+
+    def _end(self):
+        self._loop.call_soon_threadsafe(self._results.put_nowait, _END)
+
+    @abc.abstractmethod
+    async def feed(self, chunk):
+        """Take the next chunk of audio"""
+
+    @abc.abstractmethod
+    async def finish(self):
+        """No more audio is coming; the final transcript follows"""
+
+    async def close(self):
+        """Release resources; safe to call more than once"""
+        self._finished = True
+
+    async def results(self):
+        """Yield (is_final, transcript) pairs until the final transcript"""
+        while True:
+            item = await self._results.get()
+            if item is _END:
+                return
+            yield item
+            if item[0]:
+                return
+
+
+class FakeStreamingRecognizer(StreamingRecognizer):
+    """Local stand-in for tests: each chunk is UTF-8 text standing in for spoken words"""
+
+    def __init__(self, delay=0.0):
+        super().__init__()
+        self.delay = delay
+        self._words = []
+
+    async def feed(self, chunk):
+        if self._finished:
+            return
+        self._words.extend(bytes(chunk).decode("utf-8", errors="ignore").split())
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self._emit(False, " ".join(self._words))
+
+    async def finish(self):
+        if self._finished:
+            return
+        self._finished = True
+        self._emit(True, " ".join(self._words))
+        self._end()
+
+
+class BufferedRecognizer(StreamingRecognizer):
+    """Fallback when no streaming backend is available: buffers audio and transcribes on finish"""
+
+    def __init__(self, transcribe):
+        super().__init__()
+        self._transcribe = transcribe  # async callable taking audio bytes
+        self._buffer = bytearray()
+
+    async def feed(self, chunk):
+        if not self._finished:
+            self._buffer.extend(chunk)
+
+    async def finish(self):
+        if self._finished:
+            return
+        self._finished = True
+        try:
+            transcript = await self._transcribe(bytes(self._buffer)) if self._buffer else ""
+            self._emit(True, transcript or "")
+        except Exception as e:
+            logger.warning(f"Buffered transcription failed: {e}")
+        finally:
+            self._end()
+
+
+class GoogleStreamingRecognizer(StreamingRecognizer):
+    """Google Cloud streaming_recognize with interim results, run on a dedicated thread"""
+
+    def __init__(self, client, speech_module, encoding="WEBM_OPUS", sample_rate_hertz=48000, language_code="en-US"):
+        super().__init__()
+        self._client = client
+        self._speech = speech_module
+        self._encoding = encoding
+        self._sample_rate_hertz = sample_rate_hertz
+        self._language_code = language_code
+        self._chunks = queue.Queue()
+        self._thread = None
+
+    async def start(self):
+        await super().start()
+        self._thread = threading.Thread(target=self._run, name="streaming-stt", daemon=True)
+        self._thread.start()
+
+    def _requests(self):
+        while True:
+            chunk = self._chunks.get()
+            if chunk is None:
+                return
+            yield self._speech.StreamingRecognizeRequest(audio_content=chunk)
+
+    def _run(self):
+        speech = self._speech
+        config = speech.StreamingRecognitionConfig(
+            config=speech.RecognitionConfig(
+                encoding=getattr(speech.RecognitionConfig.AudioEncoding, self._encoding),
+                sample_rate_hertz=self._sample_rate_hertz,
+                language_code=self._language_code,
+            ),
+            interim_results=True,
+            # Google ends the stream as soon as the learner stops talking,
+            # so the reply can start before the client sends "stop"
+            single_utterance=True,
+        )
+        try:
+            responses = self._client.streaming_recognize(config=config, requests=self._requests())
+            for response in responses:
+                for result in response.results:
+                    if not result.alternatives:
+                        continue
+                    transcript = result.alternatives[0].transcript.strip()
+                    self._emit(result.is_final, transcript)
+                    if result.is_final:
+                        return
+        except Exception as e:
+            logger.warning(f"Google streaming recognition failed: {e}")
+        finally:
+            self._finished = True
+            self._end()
+
+    async def feed(self, chunk):
+        if not self._finished:
+            self._chunks.put(bytes(chunk))
+
+    async def finish(self):
+        self._chunks.put(None)
+
+    async def close(self):
+        await super().close()
+        self._chunks.put(None)
@@ -0,0 +1,170 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import main
+from admission import (
+    REJECTIONS,
+    REQUEST_DEADLINE_SECONDS,
+    AdmissionController,
+    AdmissionMiddleware,
+    DeadlineExceeded,
+    Overloaded,
+    UpstreamLimiter,
+    capped_timeout,
+    check_deadline,
+    deadline_scope,
+    time_remaining,
+)
+from http_clients import LimitedSession
+from providers import Provider, ProviderRouter
+
+
+def test_queue_is_bounded_and_slots_pass_in_order():
+    async def run():
+        controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=1)
+        await controller.acquire()
+        waiting = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        assert controller.stats()['queue_depth'] == 1
+
+        with pytest.raises(Overloaded) as rejected:
+            await controller.acquire()
+        assert rejected.value.reason == 'queue_full'
+        assert rejected.value.retry_after >= 1
+
+        controller.release(0.1)
+        await waiting
+        assert controller.in_flight == 1 and controller.stats()['queue_depth'] == 0
+        controller.release(0.1)
+        assert controller.in_flight == 0
+        return controller.stats()
+
+    stats = asyncio.run(run())
+    assert stats['admitted'] == 2 and stats['rejected']['queue_full'] == 1
+
+
+def test_waiting_stops_at_queue_timeout_or_deadline():
+    async def run():
+        controller = AdmissionController(max_in_flight=1, max_queue=5, queue_timeout=0.05)
+        await controller.acquire()
+        with pytest.raises(Overloaded) as timed_out:
+            await controller.acquire()
+        with pytest.raises(Overloaded) as too_late:
+            await controller.acquire(deadline=time.monotonic() - 1)
+        return timed_out.value.reason, too_late.value.reason, controller.stats()['queue_depth']
+
+    assert asyncio.run(run()) == ('queue_timeout', 'deadline', 0)
+
+
+def slow_app(controller):
+    app = FastAPI()
+
+    @app.post('/audio')
+    async def audio():
+        await asyncio.sleep(0.1)
+        return {'remaining': time_remaining()}
+
+    app.add_middleware(AdmissionMiddleware, controller=controller)
+    return app
+
+
+def test_middleware_sheds_load_with_retry_after():
+    controller = AdmissionController(max_in_flight=1, max_queue=0)
+    app = slow_app(controller)
+
+    async def run():
+        async with httpx.AsyncClient(app=app, base_url='http://testserver') as client:
+            return await asyncio.gather(*(client.post('/audio') for _ in range(3)))
+
+    responses = asyncio.run(run())
+    statuses = sorted(response.status_code for response in responses)
+    assert statuses == [200, 503, 503]
+    rejected = [response for response in responses if response.status_code == 503]
+    assert all(int(response.headers['retry-after']) >= 1 for response in rejected)
+    assert rejected[0].json()['reason'] == 'queue_full'
+    assert controller.in_flight == 0
+
+
+def test_client_deadline_header_is_propagated():
+    client = TestClient(slow_app(AdmissionController()))
+    remaining = client.post('/audio', headers={'X-Request-Timeout': '2'}).json()['remaining']
+    assert 1.5 < remaining < 2
+    # Requests cannot ask for more than the server-side maximum
+    remaining = client.post('/audio', headers={'X-Request-Timeout': '9999'}).json()['remaining']
+    assert remaining <= REQUEST_DEADLINE_SECONDS
+
+
+def test_no_upstream_call_starts_after_the_deadline():
+    with deadline_scope(time.monotonic() - 1):
+        with pytest.raises(DeadlineExceeded):
+            check_deadline('languagetool')
+        # The session refuses before opening a connection
+        with pytest.raises(DeadlineExceeded):
+            LimitedSession('languagetool').post('http://127.0.0.1:9/never', timeout=5)
+
+    with deadline_scope(time.monotonic() + 2):
+        assert capped_timeout(10) <= 2
+        assert capped_timeout(0.5) == 0.5
+        connect, read = capped_timeout((3, 20))
+        assert connect <= 2 and read <= 2
+    assert capped_timeout(10) == 10
+
+
+def test_upstream_slots_wait_only_until_the_deadline():
+    limiter = UpstreamLimiter(default_limit=1)
+    holding = threading.Event()
+    done = threading.Event()
+
+    def hold():
+        with limiter.slot('google_stt'):
+            holding.set()
+            done.wait(2)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    holding.wait(1)
+    try:
+        assert limiter.stats()['google_stt'] == {'limit': 1, 'in_flight': 1}
+        start = time.monotonic()
+        with deadline_scope(time.monotonic() + 0.1):
+            with pytest.raises(DeadlineExceeded):
+                with limiter.slot('google_stt'):
+                    pass
+        assert time.monotonic() - start < 1
+    finally:
+        done.set()
+        thread.join()
+
+
+def test_router_starts_no_provider_after_the_deadline():
+    calls = []
+    router = ProviderRouter([Provider('fast', lambda message, history: calls.append(message) or "hi")])
+
+    async def run():
+        with deadline_scope(time.monotonic() - 1):
+            return await router.generate("hello", [])
+
+    assert asyncio.run(run()) == (None, None)
+    assert calls == []
+
+
+def test_voice_endpoint_returns_503_when_full(monkeypatch):
+    # Every slot taken and no room to queue
+    monkeypatch.setattr(main.admission_controller, 'in_flight', main.admission_controller.max_in_flight)
+    monkeypatch.setattr(main.admission_controller, 'max_queue', 0)
+    before = REJECTIONS.value(reason='queue_full')
+
+    response = TestClient(main.app).post('/chat/voice', files={'file': ('clip.webm', b'x' * 1000, 'audio/webm')})
+
+    assert response.status_code == 503
+    assert int(response.headers['retry-after']) >= 1
+    assert REJECTIONS.value(reason='queue_full') == before + 1
+    stats = TestClient(main.app).get('/stats/admission').json()
+    assert stats['rejected']['queue_full'] >= 1
+    assert 'fluentflow_admission_queue_depth' in TestClient(main.app).get('/metrics').text
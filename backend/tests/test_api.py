@@ -19,10 +19,10 @@ def test_health_check():
     data = response.json()
     assert 'status' in data
     assert 'message' in data
-    assert 'service' in data
-    assert 'huggingface_configured' in data
+    assert 'services' in data
+    assert 'huggingface_api_key' in data
     assert data['status'] == 'healthy'
-    assert 'Voice-First-Chat API is running' in data['message']
+    assert 'Fluent Flow Voice Chat API is running' in data['message']
 
 def test_audio_endpoint_echo():
     # Send a tiny dummy audio file (empty wav) as form-data
@@ -0,0 +1,117 @@
+import io
+import os
+import sys
+import struct
+import wave
+
+import pytest
+
+import main
+from audio_preprocessing import AudioFormat, preprocess_audio, recognition_config_kwargs, sniff_format
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'benchmarks'))
+
+from fakes import fake_speech_module, install_google_fakes  # noqa: E402
+
+
+def make_wav(frames, sample_rate, channels=1):
+    out = io.BytesIO()
+    with wave.open(out, 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(frames)
+    return out.getvalue()
+
+
+def speech_clip(sample_rate=48000, channels=2, silence=1.0, speech=0.5):
+    """Silence, a loud tone, silence, as interleaved int16 samples"""
+    np = pytest.importorskip('numpy')
+    quiet = np.zeros(int(sample_rate * silence))
+    t = np.arange(int(sample_rate * speech)) / sample_rate
+    tone = 8000 * np.sin(2 * np.pi * 220 * t)
+    mono = np.concatenate([quiet, tone, quiet]).astype('<i2')
+    return make_wav(np.repeat(mono, channels).tobytes(), sample_rate, channels)
+
+
+def test_sniffs_containers_from_header_bytes():
+    assert sniff_format(make_wav(b'\x00\x00' * 100, 8000)).encoding == 'LINEAR16'
+    assert sniff_format(make_wav(b'\x00\x00' * 100, 8000)).sample_rate_hertz == 8000
+    assert sniff_format(b'OggS\x00\x02' + b'\x00' * 22 + b'OpusHead').encoding == 'OGG_OPUS'
+    assert sniff_format(b'\x1a\x45\xdf\xa3' + b'\x00' * 40).encoding == 'WEBM_OPUS'
+    flac = b'fLaC' + b'\x00' * 14 + bytes([0x0A, 0xC4, 0x40]) + b'\x00' * 10
+    assert (sniff_format(flac).encoding, sniff_format(flac).sample_rate_hertz) == ('FLAC', 44100)
+    assert sniff_format(b'ID3\x04' + b'\x00' * 20).encoding == 'MP3'
+    assert sniff_format(b'x' * 100).container == 'unknown'
+
+
+@pytest.mark.parametrize('header', [
+    b'RIFF\x24\x00\x00\x00WAVEfmt \x10\x00\x00\x00\x01\x00',  # fmt chunk cut short
+    make_wav(b'\x00\x00' * 100, 8000).replace(struct.pack('<I', 8000), struct.pack('<I', 0), 1),  # 0 Hz
+])
+def test_broken_wav_headers_pass_through(header):
+    assert sniff_format(header).encoding is None
+    prepared = preprocess_audio(header, trim_silence=True)
+    assert prepared.content == header
+    assert prepared.format.container == 'wav'
+
+
+def test_pcm_is_trimmed_downmixed_and_downsampled():
+    clip = speech_clip()
+    prepared = preprocess_audio(clip, trim_silence=True, target_sample_rate=16000)
+
+    assert prepared.format.encoding == 'LINEAR16'
+    assert (prepared.format.sample_rate_hertz, prepared.format.channels) == (16000, 1)
+    assert prepared.duration_seconds == pytest.approx(2.5)
+    # Everything but the tone and the VAD padding on either side is gone
+    assert prepared.trimmed_seconds == pytest.approx(2.5 - 0.5 - 0.4, abs=0.05)
+    with wave.open(io.BytesIO(prepared.content)) as wav:
+        assert wav.getframerate() == 16000 and wav.getnchannels() == 1
+        assert wav.getnframes() / 16000 == pytest.approx(0.9, abs=0.05)
+    assert len(prepared.content) < len(clip) / 10
+
+
+def test_silence_only_clip_is_kept_whole():
+    np = pytest.importorskip('numpy')
+    clip = make_wav(np.zeros(16000, dtype='<i2').tobytes(), 16000)
+    prepared = preprocess_audio(clip, trim_silence=True)
+    assert prepared.trimmed_seconds == 0.0
+    assert prepared.duration_seconds == pytest.approx(1.0)
+
+
+def test_compressed_uploads_pass_through():
+    webm = b'\x1a\x45\xdf\xa3' + b'\x01' * 500
+    prepared = preprocess_audio(webm)
+    assert prepared.content == webm
+    assert prepared.format.encoding == 'WEBM_OPUS'
+
+
+def test_recognition_config_leaves_unknown_encodings_to_the_api():
+    speech = fake_speech_module()
+    assert recognition_config_kwargs(AudioFormat('webm', 'WEBM_OPUS', 48000), speech) == {
+        'encoding': 'WEBM_OPUS', 'sample_rate_hertz': 48000,
+    }
+    assert recognition_config_kwargs(AudioFormat('mp3', 'MP3'), speech) == {}
+    assert recognition_config_kwargs(AudioFormat('wav', 'LINEAR16', 44100, 2), speech) == {
+        'encoding': 'LINEAR16', 'sample_rate_hertz': 44100, 'audio_channel_count': 2,
+    }
+
+
+def test_transcription_sends_preprocessed_pcm(monkeypatch):
+    for name in ('speech', 'texttospeech', 'speech_client', 'tts_client', 'google_cloud_enabled', 'google_clients_state'):
+        monkeypatch.setattr(main, name, getattr(main, name, None), raising=False)
+    speech_client, _ = install_google_fakes(main)
+    sent = []
+    recognize = speech_client.recognize
+
+    def capture(config=None, audio=None):
+        sent.append((config, audio))
+        return recognize(config=config, audio=audio)
+
+    monkeypatch.setattr(speech_client, 'recognize', capture)
+    clip = speech_clip()
+
+    assert main.bot.transcribe_audio(clip) in speech_client.transcripts
+    config, audio = sent[0]
+    assert (config.encoding, config.sample_rate_hertz, config.language_code) == ('LINEAR16', 16000, 'en-US')
+    assert len(audio.content) < len(clip)
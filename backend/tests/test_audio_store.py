@@ -0,0 +1,70 @@
+import io
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from audio_store import AudioArtifactStore
+
+client = TestClient(main.app)
+
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    store = AudioArtifactStore(directory=str(tmp_path), memory_max_bytes=16)
+    monkeypatch.setattr(main, 'audio_store', store)
+    yield store
+    store.clear()
+
+
+def test_each_reply_gets_its_own_url(monkeypatch, store):
+    replies = iter([b'ID3-first-reply', b'ID3-second-reply'])
+    monkeypatch.setattr(main, 'correct_grammar', lambda text: text)
+    monkeypatch.setattr(main.bot, 'generate_speech', lambda text, speech_format=None: next(replies))
+
+    urls = []
+    for _ in range(2):
+        files = {'file': ('test.wav', io.BytesIO(b'RIFF....WAVEfmt '), 'audio/wav')}
+        resp = client.post('/chat/voice', files=files)
+        assert resp.status_code == 200
+        urls.append(resp.json()['audio_url'])
+
+    assert urls[0] != urls[1]
+    assert client.get(urls[0]).content == b'ID3-first-reply'
+    assert client.get(urls[1]).content == b'ID3-second-reply'
+
+
+@pytest.mark.parametrize('content', [b'small-clip', b'x' * 100])
+def test_etag_and_range_requests(store, content):
+    artifact = store.put(content)
+    assert (artifact.content is None) == (len(content) > 16)
+
+    resp = client.get(artifact.url)
+    assert resp.status_code == 200
+    assert resp.content == content
+    assert resp.headers['etag'] == artifact.etag
+    assert 'immutable' in resp.headers['cache-control']
+
+    resp = client.get(artifact.url, headers={'If-None-Match': artifact.etag})
+    assert resp.status_code == 304
+
+    resp = client.get(artifact.url, headers={'Range': 'bytes=2-5'})
+    assert resp.status_code == 206
+    assert resp.content == content[2:6]
+    assert resp.headers['content-range'] == f'bytes 2-5/{len(content)}'
+
+    resp = client.get(artifact.url, headers={'Range': 'bytes=-3'})
+    assert resp.content == content[-3:]
+
+    resp = client.get(artifact.url, headers={'Range': f'bytes={len(content) + 5}-'})
+    assert resp.status_code == 416
+
+
+def test_unknown_audio_id_is_404(store):
+    assert client.get('/audio/0123456789abcdef.mp3').status_code == 404
+
+
+def test_cleanup_removes_expired_files(store):
+    artifact = store.put(b'y' * 100)
+    assert store.cleanup(max_age_seconds=0) == 1
+    assert store.get(artifact.id) is None
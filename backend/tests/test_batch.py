@@ -0,0 +1,131 @@
+import json
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from batch import GrammarBatcher, run_batch
+
+client = TestClient(main.app)
+
+
+def read_ndjson(body):
+    return [json.loads(line) for line in body.strip().splitlines()]
+
+
+class FakeLanguageTool:
+    """Stands in for the LanguageTool session: records each request and flags 'goed'"""
+
+    def __init__(self):
+        self.requests = []
+
+    def post(self, url, data=None, timeout=None):
+        self.requests.append(data['text'])
+        text = data['text']
+        matches = []
+        start = text.find("goed")
+        while start != -1:
+            matches.append({'offset': start, 'length': 4, 'replacements': [{'value': 'went'}]})
+            start = text.find("goed", start + 1)
+        return FakeResponse({'matches': matches})
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+@pytest.fixture
+def languagetool(monkeypatch):
+    fake = FakeLanguageTool()
+    monkeypatch.setattr(main.http_clients, 'session', lambda name: fake)
+    monkeypatch.setattr(main, 'GRAMMAR_MODE', 'remote')
+    monkeypatch.setattr(main, 'grammar_cache', main.grammar_cache_from_env())
+    return fake
+
+
+def test_correct_grammar_many_groups_languagetool_requests(languagetool):
+    texts = ["I goed home", "She goed to school", "I goed home", "Hello there"]
+    assert main.correct_grammar_many(texts) == ["I went home", "She went to school", "I went home", "Hello there"]
+    # One request for the three distinct sentences, and they are now cached
+    assert len(languagetool.requests) == 1
+    main.correct_grammar_many(["She goed to school"])
+    assert len(languagetool.requests) == 1
+
+
+def test_correct_grammar_many_falls_back_per_group(monkeypatch, languagetool):
+    monkeypatch.setattr(main, 'GRAMMAR_MODE', 'remote-verify')
+
+    def offline(*args, **kwargs):
+        raise ConnectionError("offline")
+
+    monkeypatch.setattr(languagetool, 'post', offline)
+    assert main.correct_grammar_many(["she have a dog"]) == ["She has a dog"]
+
+
+def test_batch_streams_ndjson_with_per_item_errors(languagetool):
+    texts = ["I goed home", {"id": "q2", "text": "we goed out"}, ""]
+    files = [('files', ('clip.webm', b'x' * 1003, 'audio/webm'))]
+    response = client.post('/batch', data={'texts': json.dumps(texts)}, files=files)
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+
+    records = read_ndjson(response.text)
+    summary = records.pop()
+    assert summary['done'] and summary['items'] == 4 and summary['failed'] == 1
+    results = {r['index']: r for r in records}
+    assert results[0]['id'] == 'clip.webm' and results[0]['success']
+    assert results[1]['corrected_transcript'] == "I went home"
+    assert results[2]['id'] == 'q2' and results[2]['corrected_transcript'] == "we went out"
+    assert results[3] == {'index': 3, 'id': 3, 'success': False, 'error': 'Text is empty'}
+    # Sentences from concurrent items share LanguageTool requests
+    assert len(languagetool.requests) < 3
+
+
+def test_batch_rejects_empty_and_oversized_batches(monkeypatch):
+    assert client.post('/batch', data={'texts': '[]'}).status_code == 400
+    assert client.post('/batch', data={'texts': 'not json'}).status_code == 400
+    monkeypatch.setattr(main, 'BATCH_MAX_ITEMS', 2)
+    assert client.post('/batch', data={'texts': '["a b", "c d", "e f"]'}).status_code == 400
+
+
+def test_run_batch_bounds_concurrency():
+    running = 0
+    peak = 0
+
+    async def process(item):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return {}
+
+    async def collect():
+        items = [{'index': i, 'id': i} for i in range(10)]
+        return [r async for r in run_batch(items, process, concurrency=3)]
+
+    results = asyncio.run(collect())
+    assert len(results) == 10 and peak == 3
+
+
+def test_grammar_batcher_groups_concurrent_sentences():
+    calls = []
+
+    def correct_many(texts):
+        calls.append(list(texts))
+        return [t.upper() for t in texts]
+
+    async def run():
+        batcher = GrammarBatcher(correct_many, asyncio.to_thread, max_group=3, max_wait=0.05)
+        return await asyncio.gather(*(batcher.correct(t) for t in "abcde"))
+
+    assert asyncio.run(run()) == list("ABCDE")
+    assert calls == [['a', 'b', 'c'], ['d', 'e']]
@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pytest
+
+import main
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'benchmarks'))
+
+from fakes import FakeUpstreamServer, Latency, install_google_fakes  # noqa: E402
+
+
+@pytest.fixture
+def fakes(monkeypatch):
+    server = FakeUpstreamServer().start()
+    env = server.env()
+    monkeypatch.setattr(main, 'LANGUAGETOOL_URL', env['LANGUAGETOOL_URL'])
+    monkeypatch.setattr(main, 'OLLAMA_URL', env['OLLAMA_URL'])
+    monkeypatch.setattr(main, 'GRAMMAR_MODE', 'remote')
+    monkeypatch.setattr(main, 'grammar_cache', main.grammar_cache_from_env())
+    yield server
+    server.stop()
+
+
+def test_fake_languagetool_and_ollama(fakes):
+    assert main.correct_grammar("i think i can") == "I think I can"
+    assert main.bot._try_ollama_local("hello", []).startswith("Great job")
+    assert "".join(main.bot._stream_ollama_local("hello", [])).startswith("Great job")
+    assert fakes.requests['languagetool'] == 1 and fakes.requests['ollama'] == 2
+
+
+def test_error_injection(fakes):
+    fakes.profiles['languagetool'] = Latency(error_rate=1.0)
+    assert main.correct_grammar("i think") == "i think"
+
+
+def test_google_fakes_drive_transcription_and_speech(monkeypatch):
+    for name in ('speech', 'texttospeech', 'speech_client', 'tts_client', 'google_cloud_enabled', 'google_clients_state'):
+        monkeypatch.setattr(main, name, getattr(main, name, None), raising=False)
+    monkeypatch.setattr(main, 'tts_cache', main.tts_cache_from_env())
+    speech_client, tts_client = install_google_fakes(main)
+
+    assert main.bot.transcribe_audio(b'x' * 1002) == speech_client.transcripts[2]
+    assert main.bot.generate_speech("Hello there")
+    assert speech_client.calls == 1 and tts_client.calls == 1
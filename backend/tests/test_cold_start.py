@@ -0,0 +1,45 @@
+import os
+import sys
+
+from fastapi.testclient import TestClient
+
+import main
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'benchmarks'))
+
+from bench_cold_start import measure_cold_start  # noqa: E402
+
+client = TestClient(main.app)
+
+
+def test_import_and_first_request_load_nothing_heavy(tmp_path):
+    # Even with credentials configured, importing the app must not load the Google
+    # libraries (the time budget itself is checked by benchmarks/bench_cold_start.py)
+    credentials = tmp_path / 'credentials.json'
+    credentials.write_text('{}')
+    run = measure_cold_start({'GOOGLE_APPLICATION_CREDENTIALS': str(credentials)})
+    assert run['status'] == 200
+    assert run['google_clients_state_after_import'] == 'not_loaded'
+    assert not run['google_cloud_imported']
+    assert not run['uvicorn_imported']
+
+
+def test_readiness_is_separate_from_liveness(monkeypatch):
+    monkeypatch.setattr(main, 'SPEECH_CLIENTS_WARMUP', True)
+    monkeypatch.setattr(main, 'STT_BACKEND', 'google')
+    monkeypatch.setattr(main, 'google_clients_state', 'loading')
+    assert client.get('/health').status_code == 200
+    response = client.get('/health/ready')
+    assert response.status_code == 503
+    assert response.json()['speech_backends'] == 'loading'
+
+    monkeypatch.setattr(main, 'google_clients_state', 'disabled')
+    assert client.get('/health/ready').status_code == 200
+
+
+def test_clients_load_once_on_first_use(monkeypatch):
+    monkeypatch.setattr(main, 'google_clients_state', 'not_loaded')
+    monkeypatch.setattr(main, 'google_cloud_enabled', False)
+    monkeypatch.setattr(main, 'GOOGLE_CREDENTIALS_PATH', '')
+    assert main.load_google_clients() is False
+    assert main.google_clients_state == 'disabled'
@@ -0,0 +1,52 @@
+import asyncio
+import io
+import time
+
+import httpx
+import main
+
+SLOW_CALL_SECONDS = 0.2
+CONCURRENT_REQUESTS = 8
+
+
+def slow_transcribe(audio):
+    time.sleep(SLOW_CALL_SECONDS)
+    return "I would like to practice English"
+
+
+def slow_correct_grammar(text):
+    time.sleep(SLOW_CALL_SECONDS)
+    return text
+
+
+def slow_generate_speech(text, speech_format=None):
+    time.sleep(SLOW_CALL_SECONDS)
+    return None
+
+
+def test_concurrent_voice_requests_run_in_parallel(monkeypatch):
+    """N concurrent /chat/voice requests against slow upstreams take about as long as one"""
+    monkeypatch.setattr(main.bot, 'transcribe_audio', slow_transcribe)
+    monkeypatch.setattr(main, 'correct_grammar', slow_correct_grammar)
+    monkeypatch.setattr(main.bot, 'generate_speech', slow_generate_speech)
+
+    async def run():
+        async with httpx.AsyncClient(app=main.app, base_url='http://testserver') as client:
+            async def send():
+                files = {'file': ('test.wav', io.BytesIO(b'RIFF....WAVEfmt '), 'audio/wav')}
+                return await client.post('/chat/voice', files=files)
+
+            start = time.perf_counter()
+            single = await send()
+            single_elapsed = time.perf_counter() - start
+
+            start = time.perf_counter()
+            responses = await asyncio.gather(*[send() for _ in range(CONCURRENT_REQUESTS)])
+            concurrent_elapsed = time.perf_counter() - start
+            return [single] + list(responses), single_elapsed, concurrent_elapsed
+
+    responses, single_elapsed, concurrent_elapsed = asyncio.run(run())
+
+    assert all(r.status_code == 200 for r in responses)
+    # Serialized handling would take CONCURRENT_REQUESTS times as long as one request
+    assert concurrent_elapsed < single_elapsed * 2
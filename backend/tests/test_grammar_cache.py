@@ -0,0 +1,103 @@
+import threading
+import time
+
+import pytest
+
+from grammar_cache import GrammarCache, normalize_text
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_normalize_collapses_whitespace_but_keeps_case():
+    assert normalize_text("  i  has\ta   apple \n") == "i has a apple"
+    assert normalize_text("I has") != normalize_text("i has")
+
+
+def test_lru_eviction_and_counters():
+    cache = GrammarCache(max_entries=2)
+    cache.set("a", "A")
+    cache.set("b", "B")
+    assert cache.get("a") == "A"  # "a" is now most recently used
+    cache.set("c", "C")
+    assert cache.get("b") is None
+    stats = cache.stats()
+    assert stats['evictions'] == 1
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = GrammarCache(ttl_seconds=10, clock=clock)
+    cache.set("she go", "She goes")
+    clock.now += 11
+    assert cache.get("she go") is None
+
+
+def test_persistent_tier_survives_restart(tmp_path):
+    db_path = str(tmp_path / "grammar.sqlite")
+    cache = GrammarCache(db_path=db_path)
+    cache.set("he have a cat", "He has a cat")
+    cache.close()
+
+    restarted = GrammarCache(db_path=db_path)
+    assert restarted.get("he have a cat") == "He has a cat"
+    assert restarted.stats()['disk_hits'] == 1
+    restarted.close()
+
+
+def test_concurrent_identical_lookups_call_upstream_once():
+    cache = GrammarCache()
+    calls = []
+
+    def slow_compute(key):
+        calls.append(key)
+        time.sleep(0.2)
+        return key.capitalize()
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_compute("hello", slow_compute)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ["hello"]
+    assert results == ["Hello"] * 5
+
+
+def test_failures_are_not_cached():
+    cache = GrammarCache()
+
+    def failing(key):
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute("hello", failing)
+    assert cache.get_or_compute("hello", lambda key: "Hello") == "Hello"
+
+
+def test_lookup_racing_a_finishing_leader_does_not_compute_again():
+    cache = GrammarCache()
+    calls = []
+    lookup = cache._lookup
+
+    def late_lookup(key):
+        # Miss, then let another caller lead and finish before this one reaches the lock
+        value = lookup(key)
+        cache._lookup = lookup
+        cache.get_or_compute(key, lambda k: calls.append(k) or "Hello")
+        return value
+
+    cache._lookup = late_lookup
+    assert cache.get_or_compute("hello", lambda k: calls.append(k) or "Hello") == "Hello"
+    assert calls == ["hello"]
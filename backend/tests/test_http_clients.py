@@ -0,0 +1,54 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from http_clients import HTTPClientPool
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = b'{"matches": []}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def upstream_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/v2/check'
+    server.shutdown()
+    server.server_close()
+
+
+def test_sequential_requests_reuse_one_connection(upstream_url):
+    pool = HTTPClientPool(upstreams=['languagetool'])
+    pool.start()
+    try:
+        for _ in range(3):
+            response = pool.session('languagetool').post(upstream_url, data={'text': 'hi'}, timeout=5)
+            assert response.status_code == 200
+        stats = pool.stats()['languagetool']
+        assert stats['requests'] == 3
+        assert stats['connections_opened'] == 1
+        assert stats['connections_reused'] == 2
+    finally:
+        pool.close()
+
+
+def test_close_drops_sessions():
+    pool = HTTPClientPool(upstreams=['openai'])
+    pool.start()
+    assert 'openai' in pool.stats()
+    pool.close()
+    assert pool.stats() == {}
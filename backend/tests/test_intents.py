@@ -0,0 +1,36 @@
+import json
+import os
+
+import pytest
+
+import main
+from intents import INTENTS, IntentClassifier, intent_classifier
+
+CASES_PATH = os.path.join(os.path.dirname(__file__), 'data', 'intent_cases.json')
+
+with open(CASES_PATH) as f:
+    CASES = json.load(f)
+
+
+@pytest.mark.parametrize('case', CASES, ids=[c['text'] for c in CASES])
+def test_accuracy_set(case):
+    assert intent_classifier.classify(case['text']) == case['intent']
+
+
+def test_classify_many_matches_classify():
+    texts = [c['text'] for c in CASES]
+    assert intent_classifier.classify_many(texts) == [intent_classifier.classify(t) for t in texts]
+
+
+def test_priority_decides_between_intents():
+    # Greeting outranks the question mark; thanks outranks "no"
+    assert intent_classifier.classify("hello, how are you?") == 'greeting'
+    assert intent_classifier.classify("no thanks") == 'thanks'
+    classifier = IntentClassifier([('low', 5, ['help'], ()), ('high', 1, ['please'], ())])
+    assert classifier.classify("help me please") == 'high'
+
+
+def test_every_intent_has_local_replies():
+    assert {name for name, _, _, _ in INTENTS} == set(main.bot.intent_replies)
+    reply = main.bot._generate_local_response("thank you", [])
+    assert reply in main.bot.thank_responses
@@ -0,0 +1,101 @@
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from llm_context import ContextBuilder, conversation_scope, estimate_tokens
+from providers import Provider, ProviderRouter
+from sessions import Session
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'benchmarks'))
+
+from fakes import SAMPLE_REPLY, FakeUpstreamServer  # noqa: E402
+
+
+def turns(count):
+    history = []
+    for index in range(count):
+        history.append({'type': 'user', 'content': f"this is my sentence number {index} for practice"})
+        history.append({'type': 'assistant', 'content': f"well done on sentence {index}, keep going"})
+    return history
+
+
+def test_history_is_cut_to_the_token_budget():
+    builder = ContextBuilder("Be a tutor.", history_tokens=100)
+    history = turns(20)
+    messages = builder.messages("hello", history)
+    assert messages[0] == {'role': 'system', 'content': "Be a tutor."}
+    assert messages[-1] == {'role': 'user', 'content': "hello"}
+    assert messages[-2]['content'] == history[-1]['content']
+    assert sum(estimate_tokens(m['content']) + 2 for m in messages[1:-1]) <= 100
+    assert builder.messages("hello", turns(2))[1:-1] == [
+        {'role': 'user' if turn['type'] == 'user' else 'assistant', 'content': turn['content']} for turn in turns(2)
+    ]
+
+
+def test_session_window_keeps_a_stable_prefix_between_trims():
+    builder = ContextBuilder("Be a tutor.", history_tokens=100, trim_ratio=0.5)
+    session = Session('s', 100, 0)
+    history = turns(10)
+    prompts = []
+    with conversation_scope(session):
+        for index in range(6):
+            prompts.append(builder.text_prompt("next", history))
+            history = history + turns(11)[-2:]
+    # The first trim leaves room, so the next turns extend the same prompt
+    first = prompts[0][:-len("User: next\nAssistant:")]
+    assert prompts[1].startswith(first)
+    assert estimate_tokens(prompts[0]) < estimate_tokens(builder.text_prefix) + 60
+
+
+@pytest.fixture
+def ollama(monkeypatch):
+    server = FakeUpstreamServer().start()
+    monkeypatch.setattr(main, 'OLLAMA_URL', server.env()['OLLAMA_URL'])
+    yield server
+    server.stop()
+
+
+@pytest.mark.parametrize('streamed', [False, True])
+def test_ollama_context_is_sent_back_instead_of_the_history(ollama, streamed):
+    def ask(text, history):
+        if streamed:
+            return "".join(main.bot._stream_ollama_local(text, history)).strip()
+        return main.bot._try_ollama_local(text, history)
+
+    session = Session('s', 40, 0)
+    with conversation_scope(session):
+        for text in ("i like english", "i read books every day", "my sister go to school"):
+            before = ollama.evaluated_tokens
+            reply = ask(text, session.history())
+            session.append({'type': 'user', 'content': text})
+            session.append({'type': 'assistant', 'content': reply})
+    # Only the new line was evaluated: "User: my sister go to school Assistant:"
+    assert ollama.evaluated_tokens - before == 7
+    assert len(session.provider_state['ollama']['context']) > 40
+    assert session.provider_state['ollama']['reply'] == SAMPLE_REPLY
+
+
+def test_ollama_context_is_dropped_after_another_provider_replied(ollama):
+    session = Session('s', 40, 0)
+    with conversation_scope(session):
+        main.bot._try_ollama_local("i like english", [])
+        history = [{'type': 'user', 'content': "i like english"}, {'type': 'assistant', 'content': "From OpenAI."}]
+        before = ollama.evaluated_tokens
+        main.bot._try_ollama_local("and music", history)
+    assert ollama.evaluated_tokens - before > estimate_tokens(main.bot.context.text_prefix) // 2
+
+
+def test_chat_stream_reuses_the_ollama_context_across_turns(ollama, monkeypatch):
+    router = ProviderRouter([Provider('ollama', lambda m, h: None)], hedge_delay=0)
+    monkeypatch.setattr(main, 'provider_router', router)
+    monkeypatch.setattr(main.bot, 'generate_speech', lambda text, speech_format=None: None)
+    client = TestClient(main.app)
+
+    first = client.post('/chat/stream', json={'message': 'I like english'})
+    session_id = first.text.split('"session_id": "')[1].split('"')[0]
+    before = ollama.evaluated_tokens
+    client.post('/chat/stream', json={'message': 'I read books', 'session_id': session_id})
+    assert ollama.evaluated_tokens - before == 5
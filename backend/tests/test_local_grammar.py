@@ -0,0 +1,89 @@
+import pytest
+
+import main
+import local_grammar
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("i has a apple", "I have an apple"),
+    ("she go to school every day", "She goes to school every day"),
+    ("he don't like the the movie", "He doesn't like the movie"),
+    ("a hour ago i was here", "An hour ago I was here"),
+    ("They is happy. we was late", "They are happy. We were late"),
+    ("It is an university", "It is a university"),
+    ("you is my friend", "You are my friend"),
+    ("Does he have a car?", "Does he have a car?"),
+    ("He can go now", "He can go now"),
+    ("I like that that you said", "I like that that you said"),
+    ("watch it go", "Watch it go"),
+    ("Can you see it go?", "Can you see it go?"),
+    ("let him speak", "Let him speak"),
+    ("he and she go to school", "He and she go to school"),
+    ("I were happy", "I was happy"),
+    ("he were happy", "He was happy"),
+    ("it were good", "It was good"),
+    ("If I were you", "If I were you"),
+    ("Is he go?", "Is he go?"),
+])
+def test_local_rules(text, expected):
+    matches, _ = local_grammar.check(text)
+    assert main.apply_grammar_matches(text, matches) == expected
+
+
+def test_matches_use_languagetool_structure():
+    matches, _ = local_grammar.check("she go")
+    for match in matches:
+        assert {'offset', 'length', 'replacements'} <= set(match)
+        assert match['replacements'][0]['value']
+
+
+def test_confidence_depends_on_vocabulary():
+    assert local_grammar.check("i want to practice english")[1]
+    assert not local_grammar.check("photosynthesis converts light into chemical energy")[1]
+
+
+@pytest.mark.parametrize('text', [
+    "yesterday i go to school",
+    "I am go to school",
+    "he and she is friends",
+    "She want to the a book",
+    "I have went there",
+    "She has ate it",
+    "I am went",
+    "He is eaten",
+    "He has did it",
+])
+def test_sentences_the_rules_do_not_cover_are_not_confident(text):
+    assert not local_grammar.check(text)[1]
+
+
+@pytest.mark.parametrize('text', ["I were happy", "he were happy", "it were good"])
+def test_corrected_were_is_confident(text):
+    matches, confident = local_grammar.check(text)
+    assert confident and main.apply_grammar_matches(text, matches).split()[1] == 'was'
+
+
+def test_local_first_asks_remote_when_the_rules_do_not_cover_the_sentence(monkeypatch):
+    monkeypatch.setattr(main, 'GRAMMAR_MODE', 'local-first')
+    monkeypatch.setattr(main, '_languagetool_correct', lambda text: "Yesterday I went to school")
+    monkeypatch.setattr(main, 'grammar_cache', main.grammar_cache_from_env())
+    assert main.correct_grammar("yesterday i go to school") == "Yesterday I went to school"
+
+
+def test_local_first_skips_remote_when_confident(monkeypatch):
+    def remote(text):
+        raise AssertionError("LanguageTool should not be called")
+
+    monkeypatch.setattr(main, 'GRAMMAR_MODE', 'local-first')
+    monkeypatch.setattr(main, '_languagetool_correct', remote)
+    assert main.correct_grammar("she have a dog") == "She has a dog"
+
+
+def test_remote_failure_falls_back_to_local_result(monkeypatch):
+    def remote(text):
+        raise ConnectionError("offline")
+
+    monkeypatch.setattr(main, 'GRAMMAR_MODE', 'remote-verify')
+    monkeypatch.setattr(main, '_languagetool_correct', remote)
+    monkeypatch.setattr(main, 'grammar_cache', main.grammar_cache_from_env())
+    assert main.correct_grammar("she have a dog") == "She has a dog"
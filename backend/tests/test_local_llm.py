@@ -0,0 +1,117 @@
+import asyncio
+import functools
+import os
+import sys
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+import main
+from admission import deadline_scope
+from local_llm import LocalLLM
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'benchmarks'))
+
+from fakes import SAMPLE_REPLY, FakeLocalLLMEngine  # noqa: E402
+
+
+def local_model(**settings):
+    engine = FakeLocalLLMEngine(**settings.pop('engine', {}))
+    return LocalLLM(lambda **options: engine, **settings), engine
+
+
+def chat(text):
+    return [{'role': 'system', 'content': 'Be a tutor.'}, {'role': 'user', 'content': text}]
+
+
+def test_concurrent_prompts_share_a_batch_and_respect_max_tokens():
+    llm, engine = local_model(max_tokens=5, max_batch=8, batch_wait=0.1, engine={'step_seconds': 0.01})
+    replies = [None] * 4
+
+    def ask(index):
+        replies[index] = llm.generate(chat(f"sentence {index}"), max_tokens=3 if index == 0 else None)
+
+    threads = [threading.Thread(target=ask, args=(index,)) for index in range(4)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        stats = llm.stats()
+    finally:
+        llm.close()
+
+    words = SAMPLE_REPLY.split()
+    assert replies[0] == " ".join(words[:3])
+    assert replies[1:] == [" ".join(words[:5])] * 3
+    assert engine.calls[0][0] == 4  # one generate() call for all four
+    assert stats['state'] == 'ready' and stats['generated_tokens'] == 3 + 5 * 3
+    assert stats['tokens_per_second'] > 0 and stats['mean_batch_size'] == 4
+
+
+def test_generation_stops_at_the_request_deadline():
+    llm, engine = local_model(max_seconds=5, batch_wait=0, engine={'step_seconds': 0.02})
+    try:
+        with deadline_scope(time.monotonic() + 0.3):
+            start = time.monotonic()
+            reply = llm.generate(chat("hello"))
+        elapsed = time.monotonic() - start
+    finally:
+        llm.close()
+    assert engine.calls[0][2] < 0.3
+    assert elapsed < 0.5
+    assert 0 < len(reply.split()) < len(SAMPLE_REPLY.split())
+
+
+def test_a_short_deadline_does_not_cut_the_rest_of_its_batch_short():
+    llm, engine = local_model(max_seconds=5, engine={'step_seconds': 0})
+    now = time.monotonic()
+    try:
+        results = llm._generate_batch([
+            (chat("patient"), 5, now + 3),
+            (chat("in a hurry"), 5, now + 0.2),
+            (chat("too late"), 5, now - 1),
+        ])
+    finally:
+        llm.close()
+    size, _, max_time = engine.calls[0]
+    assert size == 2  # the expired prompt is dropped
+    assert 2.5 < max_time < 3
+    assert results[0] == results[1] == (" ".join(SAMPLE_REPLY.split()[:5]), None)
+    assert results[2][0] is None and 'deadline' in results[2][1]
+
+
+def test_local_llm_is_a_provider(monkeypatch):
+    llm, _ = local_model(batch_wait=0)
+    monkeypatch.setattr(main, 'local_llm', llm)
+    provider = next(p for p in main.provider_router.providers if p.name == 'local_llm')
+    monkeypatch.setattr(provider, 'is_configured', llm.available)
+    monkeypatch.setattr(main.provider_router, 'providers', [provider])
+    try:
+        name, reply = asyncio.run(main.provider_router.generate("i like english", []))
+        stats = TestClient(main.app).get('/stats/local-llm').json()
+    finally:
+        llm.close()
+    assert (name, reply) == ('local_llm', SAMPLE_REPLY)
+    assert stats['items'] == 1 and stats['state'] == 'ready'
+
+
+def test_missing_engine_is_not_configured(monkeypatch):
+    llm = LocalLLM('no_such_llm_engine:Engine')
+    monkeypatch.setattr(main, 'local_llm', llm)
+    assert not llm.available() and not llm.warm()
+    assert main.bot._try_local_llm("hello there", []) is None
+    llm.close()
+
+
+def test_a_failing_model_load_marks_the_engine_failed():
+    def broken(**options):
+        raise OSError("model files missing")
+
+    llm = LocalLLM(functools.partial(broken))
+    try:
+        assert llm.available() and not llm.warm()
+        assert llm.state == 'failed' and not llm.available()
+    finally:
+        llm.close()
@@ -0,0 +1,169 @@
+import functools
+import os
+import sys
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from admission import DeadlineExceeded, Overloaded, deadline_scope
+from engines import engine_available
+from local_stt import LocalSpeechToText, SpeechToTextBackend
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'benchmarks'))
+
+from fakes import TONE_WORDS, ToneEngine, tone_words_clip  # noqa: E402
+
+pytest.importorskip('numpy')
+
+
+def recognizer(pool='thread', **settings):
+    engine = functools.partial(ToneEngine, **settings.pop('engine', {}))
+    return LocalSpeechToText(engine, pool=pool, **settings)
+
+
+def transcribe_together(stt, clips):
+    results = [None] * len(clips)
+
+    def run(index):
+        try:
+            results[index] = stt.transcribe(clips[index])
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(len(clips))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    return results
+
+
+def test_concurrent_clips_are_batched_and_transcribed():
+    stt = recognizer(workers=1, max_batch=4, batch_wait=0.1, engine={'batch_seconds': 0.05})
+    phrases = [TONE_WORDS[index:index + 3] for index in range(6)]
+    try:
+        results = transcribe_together(stt, [tone_words_clip(words) for words in phrases])
+        stats = stt.stats()
+    finally:
+        stt.close()
+
+    assert results == [" ".join(words) for words in phrases]
+    assert stats['items'] == 6 and stats['batches'] < 6
+    assert stats['state'] == 'ready' and stats['pending'] == 0
+    # One engine shared by the pool
+    assert sum(stt._engine.batch_sizes) == 6
+
+
+def test_one_bad_clip_does_not_fail_its_batch():
+    stt = recognizer(max_batch=4, batch_wait=0.1, engine={'fail_on': b'BAD'})
+    try:
+        good, bad = transcribe_together(stt, [tone_words_clip(['practice']), b'BAD clip'])
+    finally:
+        stt.close()
+
+    assert good == 'practice'
+    assert isinstance(bad, RuntimeError) and 'undecodable' in str(bad)
+
+
+def test_queue_is_bounded_and_waits_stop_at_the_deadline():
+    stt = recognizer(workers=1, max_queue=2, max_batch=1, batch_wait=0, engine={'batch_seconds': 0.5})
+    clip = tone_words_clip(['practice'])
+    busy = threading.Thread(target=stt.transcribe, args=(clip,))
+    busy.start()
+    try:
+        time.sleep(0.1)
+        # The worker is busy, so this one waits in the queue until its deadline
+        with deadline_scope(time.monotonic() + 0.1):
+            with pytest.raises(DeadlineExceeded):
+                stt.transcribe(clip)
+
+        stt.max_queue = 1
+        with pytest.raises(Overloaded) as rejected:
+            stt.transcribe(clip)
+        assert rejected.value.retry_after >= 1
+        assert stt.stats()['rejected'] == 1
+    finally:
+        busy.join(5)
+        stt.close()
+
+
+def test_process_pool_workers_are_warm_before_the_first_clip():
+    stt = recognizer(pool='process', workers=2, max_batch=2, engine={'load_seconds': 0.2})
+    try:
+        assert stt.warm()
+        assert stt.stats()['state'] == 'ready'
+        clips = [tone_words_clip(TONE_WORDS[index:index + 2]) for index in range(4)]
+        start = time.perf_counter()
+        results = transcribe_together(stt, clips)
+        # Warm workers: no clip waits for a model load
+        assert time.perf_counter() - start < 2
+    finally:
+        stt.close()
+    assert results == [" ".join(TONE_WORDS[index:index + 2]) for index in range(4)]
+
+
+def test_missing_engine_is_unavailable():
+    assert not engine_available('no_such_speech_engine:Engine')
+    stt = LocalSpeechToText('no_such_speech_engine:Engine', pool='thread')
+    assert not stt.available() and not stt.warm()
+    assert stt.state == 'unavailable'
+
+
+def test_backends_must_implement_transcribe():
+    class Unfinished(SpeechToTextBackend):
+        name = 'unfinished'
+
+    with pytest.raises(TypeError):
+        Unfinished()
+
+
+def test_transcribe_audio_uses_the_local_backend(monkeypatch):
+    stt = recognizer(batch_wait=0)
+    monkeypatch.setattr(main, 'STT_BACKEND', 'google,local')
+    monkeypatch.setattr(main, 'local_stt', stt)
+    monkeypatch.setitem(main.stt_backends, 'local', stt)
+    words = TONE_WORDS[:4]
+    try:
+        assert main.bot.transcribe_audio(tone_words_clip(words, 48000)) == " ".join(words)
+        stats = TestClient(main.app).get('/stats/stt').json()
+    finally:
+        stt.close()
+    assert stats['backends'] == ['google', 'local']
+    assert stats['local']['items'] == 1
+
+    # mock skips every recognizer
+    monkeypatch.setattr(main, 'STT_BACKEND', 'mock')
+    assert main.bot.transcribe_audio(b'x' * 1002) == "Thank you for helping me learn"
+
+
+def test_local_engine_is_only_warmed_when_it_will_be_used(monkeypatch):
+    monkeypatch.setattr(main, 'SPEECH_CLIENTS_WARMUP', True)
+    monkeypatch.setattr(main, 'google_clients_state', 'ready')
+    monkeypatch.setattr(main.local_stt, 'state', 'not_loaded')
+    monkeypatch.setattr(main, 'STT_BACKEND', 'google,local')
+    monkeypatch.setattr(main, 'google_cloud_enabled', True)
+    assert not main.local_stt_needed()
+    assert main.speech_backends_ready()
+
+    monkeypatch.setattr(main, 'google_cloud_enabled', False)
+    assert main.local_stt_needed()
+    assert not main.speech_backends_ready()
+    monkeypatch.setattr(main, 'STT_BACKEND', 'local,google')
+    monkeypatch.setattr(main, 'google_cloud_enabled', True)
+    assert main.local_stt_needed()
+
+
+def test_audio_endpoint_returns_503_when_local_queue_is_full(monkeypatch):
+    stt = recognizer(max_queue=0)
+    monkeypatch.setattr(main, 'STT_BACKEND', 'local')
+    monkeypatch.setattr(main, 'local_stt', stt)
+    monkeypatch.setitem(main.stt_backends, 'local', stt)
+    try:
+        response = TestClient(main.app).post('/audio', files={'file': ('clip.wav', tone_words_clip(['practice']), 'audio/wav')})
+    finally:
+        stt.close()
+    assert response.status_code == 503
+    assert int(response.headers['retry-after']) >= 1
@@ -0,0 +1,129 @@
+import os
+import random
+import sys
+import threading
+import time
+
+import pytest
+
+import main
+from audio_preprocessing import decode_wav
+from long_audio import ChunkedTranscriber, IncompleteTranscript, plan_chunks, stitch_transcripts
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'benchmarks'))
+
+from fakes import TONE_WORDS, ToneSpeechClient, install_google_fakes, tone_words_clip  # noqa: E402
+
+np = pytest.importorskip('numpy')
+
+
+def random_words(count, seed=3):
+    rng = random.Random(seed)
+    return [rng.choice(TONE_WORDS) for _ in range(count)]
+
+
+def test_stitching_drops_words_heard_by_both_chunks():
+    parts = ["today I want to practice", "to practice my English with", "English with you"]
+    assert stitch_transcripts(parts) == "today I want to practice my English with you"
+    # Punctuation and case differences at the seam still count as the same words
+    assert stitch_transcripts(["I like it.", "It, really"]) == "I like it. really"
+    assert stitch_transcripts(["", "hello there", None]) == "hello there"
+
+
+def test_chunks_are_bounded_overlap_and_cut_in_pauses():
+    sample_rate = 16000
+    mono, _ = decode_wav(tone_words_clip(random_words(40), sample_rate))
+
+    chunks = plan_chunks(mono, sample_rate, chunk_seconds=5, overlap_seconds=1)
+    assert chunks[0][0] == 0 and chunks[-1][1] == len(mono)
+    for (start, end), (next_start, _) in zip(chunks, chunks[1:]):
+        assert end - start <= 5 * sample_rate
+        assert end - next_start == pytest.approx(sample_rate, abs=1)
+        # The cut (middle of the overlap) lands in a pause
+        cut = (end + next_start) // 2
+        assert np.abs(mono[cut - 80:cut + 80]).max() == 0
+
+
+def test_long_recording_is_transcribed_in_order():
+    words = random_words(60)
+    client = ToneSpeechClient(max_seconds=6)
+    transcriber = ChunkedTranscriber(chunk_seconds=5, overlap_seconds=1, concurrency=3)
+
+    def recognize(content, audio_format):
+        audio = type('Audio', (), {'content': content})
+        return client.recognize(audio=audio).results[0].alternatives[0].transcript
+
+    try:
+        assert transcriber.transcribe(tone_words_clip(words), recognize) == " ".join(words)
+        assert transcriber.stats()['chunks'] == client.calls > 1
+        # Short clips are left to a single request
+        assert transcriber.transcribe(tone_words_clip(words[:3]), recognize) is None
+    finally:
+        transcriber.close()
+
+
+def test_chunks_run_concurrently_up_to_the_bound():
+    in_flight = []
+    peak = []
+    lock = threading.Lock()
+
+    def recognize(content, audio_format):
+        with lock:
+            in_flight.append(1)
+            peak.append(len(in_flight))
+        time.sleep(0.05)
+        with lock:
+            in_flight.pop()
+        return "today"
+
+    transcriber = ChunkedTranscriber(chunk_seconds=3, overlap_seconds=0.5, concurrency=2)
+    try:
+        transcriber.transcribe(tone_words_clip(random_words(40)), recognize)
+    finally:
+        transcriber.close()
+    assert max(peak) == 2
+
+
+def test_a_failed_chunk_fails_the_recording_with_the_missing_range():
+    calls = []
+
+    def flaky(content, audio_format):
+        calls.append(1)
+        if len(calls) == 2:
+            raise RuntimeError("quota")
+        return "today"
+
+    transcriber = ChunkedTranscriber(chunk_seconds=5, overlap_seconds=1, concurrency=1)
+    clip = tone_words_clip(random_words(30))
+    try:
+        with pytest.raises(IncompleteTranscript) as failure:
+            transcriber.transcribe(clip, flaky)
+        assert transcriber.stats()['failed_chunks'] == 1
+        assert failure.value.transcript == "today"  # the neighbours' overlap is stitched as usual
+        [(start, end)] = failure.value.missing
+        assert 0 < start < end and end - start <= 5
+        assert 'quota' in str(failure.value)
+
+        def broken(content, audio_format):
+            raise RuntimeError("down")
+
+        with pytest.raises(RuntimeError):
+            transcriber.transcribe(clip, broken)
+    finally:
+        transcriber.close()
+
+
+def test_bot_transcribes_long_uploads_in_chunks(monkeypatch):
+    for name in ('speech', 'texttospeech', 'speech_client', 'tts_client', 'google_cloud_enabled', 'google_clients_state'):
+        monkeypatch.setattr(main, name, getattr(main, name, None), raising=False)
+    client = ToneSpeechClient(max_seconds=6)
+    install_google_fakes(main, speech_client=client)
+    monkeypatch.setattr(main, 'chunked_transcriber', ChunkedTranscriber(chunk_seconds=5, overlap_seconds=1, concurrency=4))
+    words = random_words(50)
+
+    try:
+        # 48 kHz upload: preprocessing downsamples it, then it is split
+        assert main.bot.transcribe_audio(tone_words_clip(words, 48000)) == " ".join(words)
+    finally:
+        main.chunked_transcriber.close()
+    assert client.calls > 1
@@ -0,0 +1,57 @@
+from fastapi.testclient import TestClient
+
+import main
+from metrics import FALLBACKS, STAGE_SECONDS, MetricsRegistry, ServerTimingMiddleware, upstream_response_hook, UPSTREAM_RESPONSES
+
+client = TestClient(main.app)
+
+
+def test_voice_turn_records_stages_and_fallbacks():
+    before = {stage: STAGE_SECONDS.count(stage=stage) for stage in ('upload_read', 'transcribe', 'grammar', 'reply', 'tts')}
+    mock_before = FALLBACKS.value(kind='mock_transcription')
+
+    response = client.post('/chat/voice', files={'file': ('clip.webm', b'x' * 1000, 'audio/webm')})
+    assert response.status_code == 200
+
+    for stage, count in before.items():
+        assert STAGE_SECONDS.count(stage=stage) == count + 1, stage
+    assert FALLBACKS.value(kind='mock_transcription') == mock_before + 1
+
+
+def test_metrics_endpoint_serves_prometheus_text():
+    client.post('/chat/voice', files={'file': ('clip.webm', b'x' * 1000, 'audio/webm')})
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain')
+    body = response.text
+    assert '# TYPE fluentflow_stage_seconds histogram' in body
+    assert 'fluentflow_stage_seconds_bucket{stage="transcribe",le="+Inf"}' in body
+    assert 'fluentflow_fallbacks_total{kind="mock_transcription"}' in body
+
+
+def test_histogram_rendering():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('demo_seconds', 'Demo', ('stage',), buckets=(0.1, 1.0))
+    histogram.observe(0.05, stage='a')
+    histogram.observe(0.5, stage='a')
+    lines = registry.render().splitlines()
+    assert 'demo_seconds_bucket{stage="a",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{stage="a",le="1.0"} 2' in lines
+    assert 'demo_seconds_bucket{stage="a",le="+Inf"} 2' in lines
+    assert 'demo_seconds_count{stage="a"} 2' in lines
+
+
+def test_upstream_status_codes_are_counted():
+    class Response:
+        status_code = 503
+
+    before = UPSTREAM_RESPONSES.value(upstream='languagetool', status=503)
+    upstream_response_hook('languagetool')(Response())
+    assert UPSTREAM_RESPONSES.value(upstream='languagetool', status=503) == before + 1
+
+
+def test_server_timing_header(monkeypatch):
+    monkeypatch.setattr(main.app, 'middleware_stack', ServerTimingMiddleware(main.app.build_middleware_stack(), enabled=True))
+    response = client.post('/chat/voice', files={'file': ('clip.webm', b'x' * 1000, 'audio/webm')})
+    timing = response.headers['server-timing']
+    assert 'transcribe;dur=' in timing and 'grammar;dur=' in timing
@@ -0,0 +1,167 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+
+import main
+from admission import CallAbandoned, CancelToken, cancel_scope, cancel_token
+from micro_batch import MicroBatcher
+from providers import CircuitBreaker, Provider, ProviderRouter
+
+
+def slow(seconds, reply):
+    def call(message, history):
+        time.sleep(seconds)
+        return reply
+    return call
+
+
+def failing(message, history):
+    raise ConnectionError("daemon not running")
+
+
+def test_hedged_request_takes_first_valid_answer():
+    router = ProviderRouter(
+        [Provider('slow', slow(1.0, 'slow reply')), Provider('fast', slow(0.05, 'fast reply'))],
+        hedge_delay=0.05,
+    )
+
+    async def timed():
+        start = time.perf_counter()
+        result = await router.generate('hello', [])
+        return result, time.perf_counter() - start
+
+    (name, text), elapsed = asyncio.run(timed())
+    assert (name, text) == ('fast', 'fast reply')
+    # The slow provider is abandoned rather than awaited
+    assert elapsed < 0.5
+
+
+def test_a_provider_that_keeps_losing_hedges_is_ranked_down():
+    slow_provider = Provider('slow', slow(0.5, 'slow reply'))
+    router = ProviderRouter([slow_provider, Provider('fast', slow(0.02, 'fast reply'))], hedge_delay=0.1)
+
+    async def timed():
+        start = time.perf_counter()
+        result = await router.generate('hello', [])
+        return result, time.perf_counter() - start
+
+    asyncio.run(timed())
+    stats = router.stats()['slow']
+    assert stats['abandoned'] == 1 and stats['ewma_latency_ms'] >= 100
+    assert router.candidates()[0].name == 'fast'
+    # From now on the fast provider goes first and nobody waits for the hedge delay
+    (name, _), elapsed = asyncio.run(timed())
+    assert name == 'fast' and elapsed < 0.1
+
+
+def test_an_abandoned_call_is_told_to_stop():
+    stopped = threading.Event()
+
+    def stubborn(message, history):
+        token = cancel_token()
+        for _ in range(200):
+            if token.cancelled:
+                stopped.set()
+                return None
+            time.sleep(0.01)
+        return 'too late'
+
+    router = ProviderRouter([Provider('stubborn', stubborn), Provider('fast', slow(0.02, 'fast reply'))], hedge_delay=0.05)
+    assert asyncio.run(router.generate('hello', []))[0] == 'fast'
+    assert stopped.wait(0.5)
+
+
+def test_a_cancelled_caller_leaves_the_batch_queue():
+    started = []
+
+    def submit(items):
+        started.append(items)
+        return Future()  # never finishes: the worker stays busy
+
+    batcher = MicroBatcher('test', submit, workers=1, max_batch=1, batch_wait=0)
+    token = CancelToken()
+    errors = []
+
+    def wait_for(item, scope=None):
+        try:
+            with cancel_scope(scope or CancelToken()):
+                batcher.run(item)
+        except CallAbandoned as e:
+            errors.append(e)
+
+    busy = threading.Thread(target=wait_for, args=('first',), daemon=True)
+    busy.start()
+    while not started:
+        time.sleep(0.005)
+    queued = threading.Thread(target=wait_for, args=('second', token))
+    queued.start()
+    time.sleep(0.05)
+    token.cancel()
+    queued.join(1)
+    assert not queued.is_alive() and len(errors) == 1
+    assert batcher.stats()['queue_depth'] == 1  # dropped when a worker next looks at it
+    batcher.close()
+
+
+def test_failure_moves_on_to_next_provider_immediately():
+    router = ProviderRouter(
+        [Provider('broken', failing), Provider('backup', slow(0, 'backup reply'))],
+        hedge_delay=10,
+    )
+    start = time.perf_counter()
+    assert asyncio.run(router.generate('hello', [])) == ('backup', 'backup reply')
+    assert time.perf_counter() - start < 1
+
+
+def test_circuit_opens_and_skips_dead_provider():
+    calls = []
+
+    def dead(message, history):
+        calls.append(message)
+        return None
+
+    provider = Provider('ollama', dead, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+    router = ProviderRouter([provider], hedge_delay=0)
+    for _ in range(5):
+        assert asyncio.run(router.generate('hello', [])) == (None, None)
+    assert len(calls) == 2
+    assert router.stats()['ollama']['circuit'] == 'open'
+
+
+def test_half_open_trial_closes_circuit_on_success():
+    clock = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: clock[0])
+    breaker.record_failure()
+    assert not breaker.allow()
+    clock[0] = 11
+    assert breaker.allow()
+    assert not breaker.allow()  # only one trial at a time
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_unconfigured_provider_is_never_called():
+    calls = []
+    router = ProviderRouter(
+        [Provider('openai', lambda m, h: calls.append(m), is_configured=lambda: False)],
+        hedge_delay=0,
+    )
+    assert asyncio.run(router.generate('hello', [])) == (None, None)
+    assert calls == []
+
+
+def test_ewma_tracks_latency_and_errors():
+    provider = Provider('p', lambda m, h: 'ok', alpha=0.5)
+    provider.record(0.2, True)
+    provider.record(0.4, False)
+    stats = provider.stats()
+    assert stats['ewma_latency_ms'] == 300.0
+    assert stats['ewma_error_rate'] == 0.5
+
+
+def test_provider_stats_endpoint():
+    from fastapi.testclient import TestClient
+    resp = TestClient(main.app).get('/stats/providers')
+    assert resp.status_code == 200
+    assert set(resp.json()) == {'openai', 'ollama', 'huggingface', 'local_llm'}
@@ -0,0 +1,118 @@
+import email
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from audio_store import AudioArtifactStore
+from reply_formats import FRAME_MEDIA_TYPE, MP3, decode_frame, encode_frame, negotiate_framing, negotiate_speech_format
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'benchmarks'))
+
+from fakes import install_google_fakes  # noqa: E402
+
+client = TestClient(main.app)
+
+
+@pytest.fixture
+def turn(monkeypatch, tmp_path):
+    """Deterministic turns whose speech records the format it was asked for"""
+    formats = []
+
+    def fake_speech(text, speech_format=MP3):
+        formats.append(speech_format)
+        return f"{speech_format.encoding}:{text}".encode()
+
+    store = AudioArtifactStore(directory=str(tmp_path))
+    monkeypatch.setattr(main, 'audio_store', store)
+    monkeypatch.setattr(main, 'correct_grammar', lambda text: text)
+    monkeypatch.setattr(main.bot, 'generate_speech', fake_speech)
+    yield formats
+    store.clear()
+
+
+def test_negotiation_defaults_to_mp3_and_json():
+    assert negotiate_speech_format(None) is MP3
+    assert negotiate_speech_format('*/*') is MP3
+    assert negotiate_framing(None) == 'json'
+    assert negotiate_framing('text/html, */*') == 'json'
+
+
+def test_negotiation_honours_preference_and_rate():
+    opus = negotiate_speech_format('audio/mpeg;q=0.5, audio/ogg; codecs=opus; rate=16000')
+    assert (opus.encoding, opus.sample_rate_hertz, opus.media_type) == ('OGG_OPUS', 16000, 'audio/ogg')
+    # Unsupported rates snap to the nearest one Opus supports
+    assert negotiate_speech_format('audio/ogg; rate=22050').sample_rate_hertz == 24000
+    assert negotiate_speech_format('audio/ogg;q=0, audio/mpeg') is MP3
+    assert negotiate_framing(f'application/json;q=0.5, {FRAME_MEDIA_TYPE}') == 'frame'
+    assert negotiate_framing('multipart/mixed, application/json') == 'multipart'
+
+
+def test_frame_round_trip():
+    payload, audio = decode_frame(encode_frame({'reply': 'hi'}, b'\x00\x01audio'))
+    assert payload == {'reply': 'hi'} and audio == b'\x00\x01audio'
+    assert decode_frame(encode_frame({'reply': 'hi'}, None)) == ({'reply': 'hi'}, b'')
+
+
+def test_frame_reply_carries_the_audio_in_one_response(turn):
+    accept = f'{FRAME_MEDIA_TYPE}, audio/ogg; codecs=opus; rate=16000'
+    resp = client.post('/chat/text', json={'transcript': 'Hello there'}, headers={'Accept': accept})
+
+    assert resp.status_code == 200
+    assert resp.headers['content-type'] == FRAME_MEDIA_TYPE
+    payload, audio = decode_frame(resp.content)
+    assert payload['reply'] and payload['session_id']
+    assert payload['audio_url'] is None
+    assert payload['audio_media_type'] == 'audio/ogg' and payload['audio_bytes'] == len(audio)
+    assert audio == f"OGG_OPUS:{payload['reply']}".encode()
+    assert [f.cache_key for f in turn] == ['OGG_OPUS@16000']
+    # Inline audio is not stored for a second fetch
+    assert main.audio_store.stats()['artifacts'] == 0
+
+
+def test_multipart_reply_has_json_then_audio(turn):
+    files = {'file': ('clip.webm', b'x' * 1000, 'audio/webm')}
+    resp = client.post('/chat/voice', files=files, headers={'Accept': 'multipart/mixed'})
+
+    assert resp.status_code == 200
+    content_type = resp.headers['content-type']
+    assert content_type.startswith('multipart/mixed; boundary=')
+    message = email.message_from_bytes(b'Content-Type: ' + content_type.encode() + b'\r\n\r\n' + resp.content)
+    json_part, audio_part = message.get_payload()
+    assert json_part.get_content_type() == 'application/json'
+    assert audio_part.get_content_type() == 'audio/mpeg'
+    assert b'"reply"' in json_part.get_payload(decode=True)
+    assert audio_part.get_payload(decode=True).startswith(b'MP3:')
+
+
+def test_json_reply_serves_opus_under_an_ogg_url(turn):
+    resp = client.post('/chat/text', json={'transcript': 'Hello there'}, headers={'Accept': 'application/json, audio/ogg'})
+    audio_url = resp.json()['audio_url']
+    assert audio_url.endswith('.ogg')
+
+    served = client.get(audio_url)
+    assert served.status_code == 200
+    assert served.headers['content-type'] == 'audio/ogg'
+    assert client.get(audio_url[:-len('ogg')] + 'mp3').status_code == 404
+
+
+def test_opus_request_reaches_text_to_speech(monkeypatch):
+    for name in ('speech', 'texttospeech', 'speech_client', 'tts_client', 'google_cloud_enabled', 'google_clients_state'):
+        monkeypatch.setattr(main, name, getattr(main, name, None), raising=False)
+    monkeypatch.setattr(main, 'tts_cache', main.tts_cache_from_env())
+    _, tts_client = install_google_fakes(main)
+    configs = []
+    synthesize = tts_client.synthesize_speech
+
+    def capture(input=None, voice=None, audio_config=None):
+        configs.append(audio_config)
+        return synthesize(input=input, voice=voice, audio_config=audio_config)
+
+    monkeypatch.setattr(tts_client, 'synthesize_speech', capture)
+    main.bot.generate_speech("Hello there", negotiate_speech_format('audio/ogg; rate=24000'))
+    main.bot.generate_speech("Hello there")
+
+    assert (configs[0].audio_encoding, configs[0].sample_rate_hertz) == ('OGG_OPUS', 24000)
+    assert configs[1].audio_encoding == 'MP3' and not hasattr(configs[1], 'sample_rate_hertz')
@@ -0,0 +1,104 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from providers import Provider, ProviderRouter
+from admission import on_cancel
+from reply_streaming import SentenceSplitter, iterate_in_thread
+
+client = TestClient(main.app)
+
+
+def parse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+def test_splitter_emits_sentences_as_they_complete():
+    splitter = SentenceSplitter()
+    assert splitter.feed("Great job! You") == ["Great job!"]
+    assert splitter.feed(" said it well. Talk to Dr. ") == ["You said it well."]
+    assert splitter.feed("Smith next") == []
+    assert splitter.flush() == "Talk to Dr. Smith next"
+
+
+@pytest.fixture
+def slow_streaming_provider(monkeypatch):
+    def stream(message, history):
+        for token in ["Nice ", "work! ", "Let's ", "keep ", "going ", "with ", "more ", "practice."]:
+            time.sleep(0.05)
+            yield token
+
+    router = ProviderRouter([Provider('fake', lambda m, h: None)], hedge_delay=0)
+    monkeypatch.setattr(main, 'provider_router', router)
+    monkeypatch.setattr(main, 'reply_streamers', {'fake': stream})
+    monkeypatch.setattr(main.bot, 'generate_speech', lambda text, speech_format=None: f"audio:{text}".encode())
+
+
+def test_first_sentence_audio_arrives_before_reply_finishes(slow_streaming_provider):
+    resp = client.post('/chat/stream', json={'message': 'I has finished', 'history': []})
+    assert resp.status_code == 200
+    assert resp.headers['content-type'].startswith('text/event-stream')
+    events = parse_events(resp.text)
+    kinds = [kind for kind, _ in events]
+
+    assert kinds[-1] == 'done'
+    done = events[-1][1]
+    assert done['reply'] == "Nice work! Let's keep going with more practice."
+    assert done['provider'] == 'fake'
+    assert 'time_to_first_audio_ms' in done
+
+    first_audio = kinds.index('audio')
+    last_token = len(kinds) - 1 - kinds[::-1].index('token')
+    assert first_audio < last_token
+
+    sentences = [data['text'] for kind, data in events if kind == 'sentence']
+    assert sentences == ["Nice work!", "Let's keep going with more practice."]
+    audio_urls = [data['audio_url'] for kind, data in events if kind == 'audio']
+    assert client.get(audio_urls[0]).content == b"audio:Nice work!"
+
+
+def test_falls_back_to_local_reply_when_no_provider_streams(monkeypatch):
+    monkeypatch.setattr(main, 'provider_router', ProviderRouter([], hedge_delay=0))
+    monkeypatch.setattr(main.bot, 'generate_speech', lambda text, speech_format=None: None)
+    resp = client.post('/chat/stream', json={'message': 'thank you so much'})
+    events = parse_events(resp.text)
+    assert events[-1][0] == 'done'
+    assert events[-1][1]['provider'] == 'local'
+    assert events[-1][1]['reply'] in main.bot.thank_responses
+
+
+def test_stopping_the_consumer_stops_the_generator_thread():
+    closed = threading.Event()
+    hung_up = threading.Event()
+    produced = []
+
+    def endless():
+        on_cancel(hung_up.set)  # what a streamer does with its upstream response
+        try:
+            while True:
+                produced.append(1)
+                time.sleep(0.01)
+                yield "token "
+        finally:
+            closed.set()
+
+    async def read_two():
+        tokens = iterate_in_thread(asyncio.to_thread, endless)
+        received = [await tokens.__anext__(), await tokens.__anext__()]
+        await tokens.aclose()  # the client went away
+        return received
+
+    assert asyncio.run(read_two()) == ["token ", "token "]
+    assert hung_up.wait(1) and closed.wait(1)
+    count = len(produced)
+    time.sleep(0.05)
+    assert len(produced) == count
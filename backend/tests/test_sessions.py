@@ -0,0 +1,96 @@
+import io
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from sessions import SessionStore
+
+client = TestClient(main.app)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def turn(content):
+    return {'type': 'user', 'content': content}
+
+
+def test_session_keeps_only_the_last_turns():
+    store = SessionStore(max_turns=3)
+    session = store.get_or_create()
+    store.append(session.id, [turn(str(i)) for i in range(5)])
+    assert [t['content'] for t in store.history(session.id)] == ['2', '3', '4']
+
+
+def test_idle_sessions_are_evicted():
+    clock = FakeClock()
+    store = SessionStore(idle_timeout=60, clock=clock)
+    session = store.get_or_create()
+    clock.now = 61
+    assert store.get(session.id) is None
+    assert store.stats()['evicted_idle'] == 1
+
+
+def test_memory_cap_evicts_least_recently_used_session():
+    store = SessionStore(max_bytes=500)
+    first = store.get_or_create()
+    store.append(first.id, [turn('x' * 200)])
+    second = store.get_or_create()
+    store.append(second.id, [turn('y' * 200)])
+    third = store.get_or_create()
+    store.append(third.id, [turn('z' * 200)])
+    assert store.get(first.id) is None
+    assert store.get(third.id) is not None
+    assert store.stats()['bytes'] <= 500
+
+
+def send_turn(**form):
+    files = {'file': ('test.wav', io.BytesIO(b'RIFF....WAVEfmt '), 'audio/wav')}
+    resp = client.post('/chat/voice', files=files, data=form)
+    assert resp.status_code == 200
+    return resp.json()
+
+
+def test_history_is_kept_server_side(monkeypatch):
+    seen = []
+    monkeypatch.setattr(main, 'correct_grammar', lambda text: text)
+    original = main.bot.generate_response
+
+    def recording_generate_response(message, history, corrected=None):
+        seen.append(len(history))
+        return original(message, history, corrected)
+
+    monkeypatch.setattr(main.bot, 'generate_response', recording_generate_response)
+
+    first = send_turn(client_transcript='Hello there')
+    session_id = first['session_id']
+    second = send_turn(client_transcript='How are you', session_id=session_id)
+    assert second['session_id'] == session_id
+    assert seen == [0, 2]
+    assert len(main.session_store.history(session_id)) == 4
+
+
+def test_posted_history_still_works(monkeypatch):
+    monkeypatch.setattr(main, 'correct_grammar', lambda text: text)
+    history = [turn('I like tea'), {'type': 'assistant', 'content': 'Great!'}]
+    reply = send_turn(client_transcript='And coffee', history=json.dumps(history))
+    assert len(main.session_store.history(reply['session_id'])) == 4
+
+
+@pytest.mark.parametrize('path, body', [
+    ('/chat/text', {'json': {'transcript': 'Hello there', 'history': ['hi']}}),
+    ('/chat/stream', {'json': {'message': 'Hello there', 'history': [1, 2]}}),
+    ('/chat/voice', {'data': {'client_transcript': 'Hello there', 'history': json.dumps([{'type': 'user', 'content': None}])}}),
+])
+def test_malformed_history_entries_are_dropped(monkeypatch, path, body):
+    monkeypatch.setattr(main, 'correct_grammar', lambda text: text)
+    monkeypatch.setattr(main.bot, 'generate_speech', lambda text, speech_format=None: None)
+    response = client.post(path, **body)
+    assert response.status_code == 200
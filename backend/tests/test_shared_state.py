@@ -0,0 +1,76 @@
+import os
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+import main
+from audio_store import SqliteAudioArtifactStore
+from sessions import SqliteSessionStore
+from shared_state import Lease
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+client = TestClient(main.app)
+
+
+def two_workers(factory):
+    return factory(), factory()
+
+
+def test_artifact_written_by_one_worker_is_served_by_another(monkeypatch, tmp_path):
+    db = str(tmp_path / 'audio.sqlite')
+    writer, server = two_workers(lambda: SqliteAudioArtifactStore(db, str(tmp_path / 'audio'), memory_max_bytes=16))
+    small = writer.put(b'small-clip')
+    large = writer.put(b'x' * 100)
+    assert large.path and small.content
+
+    monkeypatch.setattr(main, 'audio_store', server)
+    assert client.get(small.url).content == b'small-clip'
+    resp = client.get(large.url, headers={'Range': 'bytes=0-9'})
+    assert resp.status_code == 206 and resp.content == b'x' * 10
+    assert server.stats()['artifacts'] == 2
+
+    # Cleanup from any worker removes the index row and the shared file
+    assert server.cleanup(max_age_seconds=0) == 2
+    assert writer.get(large.id) is None
+    assert not (tmp_path / 'audio' / f'{large.id}.mp3').exists()
+
+
+def test_artifact_from_another_process(tmp_path):
+    db = str(tmp_path / 'audio.sqlite')
+    directory = str(tmp_path / 'audio')
+    script = (
+        "from audio_store import SqliteAudioArtifactStore; "
+        f"print(SqliteAudioArtifactStore({db!r}, {directory!r}, memory_max_bytes=4).put(b'from-worker-2').id)"
+    )
+    artifact_id = subprocess.run([sys.executable, '-c', script], cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout.split()[-1]
+    artifact = SqliteAudioArtifactStore(db, directory).get(artifact_id)
+    with open(artifact.path, 'rb') as f:
+        assert f.read() == b'from-worker-2'
+
+
+def test_sessions_are_shared_between_workers(tmp_path):
+    now = [1000.0]
+    db = str(tmp_path / 'sessions.sqlite')
+    first, second = two_workers(lambda: SqliteSessionStore(db, max_turns=3, idle_timeout=60, clock=lambda: now[0]))
+
+    session = first.get_or_create(None, [{'type': 'user', 'content': 'hi'}])
+    second.append(session.id, [{'type': 'assistant', 'content': 'hello'}, {'type': 'user', 'content': 'a'}, {'type': 'user', 'content': 'b'}])
+    assert [t['content'] for t in first.history(session.id)] == ['hello', 'a', 'b']
+
+    now[0] += 61
+    assert second.get(session.id) is None
+    assert first.stats()['sessions'] == 0
+
+
+def test_cleanup_lease_runs_in_one_worker_at_a_time(tmp_path):
+    now = [0.0]
+    db = str(tmp_path / 'leases.sqlite')
+    first = Lease(db, owner='worker-1', clock=lambda: now[0])
+    second = Lease(db, owner='worker-2', clock=lambda: now[0])
+    assert first.acquire('cleanup', 10)
+    assert not second.acquire('cleanup', 10)
+    assert first.acquire('cleanup', 10)
+    now[0] += 11
+    assert second.acquire('cleanup', 10)
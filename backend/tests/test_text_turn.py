@@ -0,0 +1,73 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+client = TestClient(main.app)
+
+
+@pytest.fixture(autouse=True)
+def no_upload_or_transcription(monkeypatch):
+    """A text turn must never read an upload or run speech recognition"""
+    async def no_upload(file):
+        raise AssertionError("upload was read")
+
+    def no_transcription(audio):
+        raise AssertionError("audio was transcribed")
+
+    monkeypatch.setattr(main, 'load_upload', no_upload)
+    monkeypatch.setattr(main.bot, 'transcribe_audio', no_transcription)
+    monkeypatch.setattr(main, 'correct_grammar', lambda text: text)
+
+
+def test_text_turn_takes_json_and_keeps_the_session():
+    first = client.post('/chat/text', json={'transcript': '  Hello there  '})
+    assert first.status_code == 200
+    body = first.json()
+    assert body['transcript'] == 'Hello there'
+    assert body['reply'] and body['session_id']
+
+    second = client.post('/chat/text', json={'transcript': 'How are you', 'session_id': body['session_id']})
+    assert second.json()['session_id'] == body['session_id']
+    assert len(main.session_store.history(body['session_id'])) == 4
+
+
+def test_text_turn_accepts_posted_history():
+    history = [{'type': 'user', 'content': 'I like tea'}, {'type': 'assistant', 'content': 'Great!'}]
+    body = client.post('/chat/text', json={'transcript': 'And coffee', 'history': history}).json()
+    assert len(main.session_store.history(body['session_id'])) == 4
+
+
+def test_empty_transcript_is_rejected():
+    assert client.post('/chat/text', json={'transcript': ' '}).status_code == 400
+    assert client.post('/chat/text', json={}).status_code == 422
+
+
+def test_voice_endpoint_needs_no_file_with_a_client_transcript():
+    response = client.post('/chat/voice', data={'client_transcript': 'Hello there'})
+    assert response.status_code == 200
+    assert response.json()['transcript'] == 'Hello there'
+
+    # An attached recording is ignored rather than read
+    files = {'file': ('clip.webm', b'x' * 1000, 'audio/webm')}
+    assert client.post('/audio', files=files, data={'client_transcript': 'Hello again'}).status_code == 200
+
+    assert client.post('/audio', data={'session_id': 'missing'}).status_code == 400
+
+
+def test_busy_and_failing_turns_get_503_and_500(monkeypatch):
+    async def busy(*args, **kwargs):
+        raise main.Overloaded('queue_full', 3)
+
+    monkeypatch.setattr(main, 'process_transcript', busy)
+    response = client.post('/chat/text', json={'transcript': 'Hello there'})
+    assert response.status_code == 503
+    assert response.headers['retry-after'] == '3'
+
+    async def broken(*args, **kwargs):
+        raise RuntimeError("model crashed")
+
+    monkeypatch.setattr(main, 'process_transcript', broken)
+    response = client.post('/chat/text', json={'transcript': 'Hello there'})
+    assert response.status_code == 500
+    assert 'model crashed' in response.json()['detail']
@@ -0,0 +1,53 @@
+import main
+from tts_cache import AudioCache, speech_cache_key
+
+
+def test_key_depends_on_voice_and_encoding():
+    assert speech_cache_key("Hi", "en-US/NEUTRAL", "MP3") != speech_cache_key("Hi", "en-US/NEUTRAL", "OGG_OPUS")
+    assert speech_cache_key("Hi", "en-US/NEUTRAL", "MP3") == speech_cache_key("Hi", "en-US/NEUTRAL", "MP3")
+
+
+def test_byte_budget_evicts_least_recently_used():
+    cache = AudioCache(max_bytes=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"5678")
+    assert cache.get("a") == b"1234"  # "b" becomes least recently used
+    cache.put("c", b"9012")
+    assert cache.get("b") is None
+    assert cache.stats()['bytes'] == 8
+    assert cache.stats()['evictions'] == 1
+
+
+def test_cache_hit_skips_synthesis(monkeypatch):
+    calls = []
+
+    def fake_synthesize(text, speech_format=None):
+        calls.append(text)
+        return b"ID3fake-mp3"
+
+    monkeypatch.setattr(main, 'google_clients_state', 'ready')
+    monkeypatch.setattr(main, 'google_cloud_enabled', True)
+    monkeypatch.setattr(main, 'tts_client', object())
+    monkeypatch.setattr(main, 'tts_cache', AudioCache())
+    monkeypatch.setattr(main.bot, '_synthesize', fake_synthesize)
+
+    assert main.bot.generate_speech("Great job!") == b"ID3fake-mp3"
+    assert main.bot.generate_speech("Great job!") == b"ID3fake-mp3"
+    assert calls == ["Great job!"]
+
+
+def test_warm_up_synthesizes_each_canned_reply_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(main, 'google_clients_state', 'ready')
+    monkeypatch.setattr(main, 'google_cloud_enabled', True)
+    monkeypatch.setattr(main, 'tts_client', object())
+    monkeypatch.setattr(main, 'tts_cache', AudioCache())
+    monkeypatch.setattr(main.bot, '_synthesize', lambda text, speech_format=None: calls.append((text, speech_format.cache_key)) or b"audio")
+
+    canned = set(main.bot.canned_replies())
+    assert main.bot.warm_speech_cache() == 2 * len(canned)
+    assert main.bot.warm_speech_cache() == 0
+    assert len(calls) == 2 * len(canned)
+    # The web app's Accept header is served from the warmed cache
+    web_app_format = main.negotiate_speech_format('application/json, audio/ogg; codecs=opus')
+    assert (next(iter(canned)), web_app_format.cache_key) in calls
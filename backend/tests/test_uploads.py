@@ -0,0 +1,62 @@
+import io
+
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+import main
+from uploads import MaxUploadSizeMiddleware, audio_bytes, audio_size
+
+limited_app = FastAPI()
+limited_app.add_middleware(MaxUploadSizeMiddleware, max_bytes=1024, paths=('/upload',))
+
+
+@limited_app.post('/upload')
+async def upload(file: UploadFile = File(...)):
+    return {'size': len(await file.read())}
+
+
+limited_client = TestClient(limited_app)
+
+
+def test_upload_under_limit_is_accepted():
+    resp = limited_client.post('/upload', files={'file': ('a.wav', io.BytesIO(b'x' * 100), 'audio/wav')})
+    assert resp.status_code == 200
+    assert resp.json() == {'size': 100}
+
+
+def test_declared_oversize_body_is_rejected_up_front():
+    resp = limited_client.post('/upload', files={'file': ('a.wav', io.BytesIO(b'x' * 4096), 'audio/wav')})
+    assert resp.status_code == 413
+
+
+def test_streamed_oversize_body_is_cut_off():
+    def chunks():
+        for _ in range(64):
+            yield b'x' * 256
+
+    resp = limited_client.post(
+        '/upload',
+        content=chunks(),
+        headers={'Content-Type': 'multipart/form-data; boundary=xyz'},
+    )
+    assert resp.status_code == 413
+
+
+def test_audio_helpers_accept_bytes_and_files():
+    assert audio_size(b'abc') == 3
+    assert audio_size(memoryview(b'abcd')) == 4
+    spooled = io.BytesIO(b'hello')
+    assert audio_size(spooled) == 5
+    assert audio_bytes(spooled) == b'hello'
+
+
+def test_voice_upload_is_transcribed_without_temp_files(monkeypatch):
+    monkeypatch.setattr(main, 'correct_grammar', lambda text: text)
+    def no_temp_dirs(*args, **kwargs):
+        raise AssertionError("voice uploads should not create temp directories")
+
+    monkeypatch.setattr('tempfile.mkdtemp', no_temp_dirs)
+    client = TestClient(main.app)
+    resp = client.post('/chat/voice', files={'file': ('test.wav', io.BytesIO(b'RIFF....WAVEfmt '), 'audio/wav')})
+    assert resp.status_code == 200
+    assert resp.json()['transcript']
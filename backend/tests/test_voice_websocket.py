@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from admission import REQUEST_DEADLINE_SECONDS, check_deadline, time_remaining
+
+client = TestClient(main.app)
+
+
+@pytest.fixture(autouse=True)
+def fake_backends(monkeypatch):
+    monkeypatch.setattr(main, 'STREAMING_STT_BACKEND', 'fake')
+    monkeypatch.setattr(main, 'correct_grammar', lambda text: text.replace('i has', 'I have'))
+
+
+def test_streams_partials_then_final_and_reply():
+    with client.websocket_connect('/ws/voice') as ws:
+        ws.send_json({'type': 'start'})
+        ws.send_bytes(b'i has')
+        assert ws.receive_json() == {'type': 'partial', 'transcript': 'i has'}
+        ws.send_bytes(b' a question')
+        assert ws.receive_json() == {'type': 'partial', 'transcript': 'i has a question'}
+        ws.send_json({'type': 'stop'})
+
+        assert ws.receive_json() == {'type': 'final', 'transcript': 'i has a question'}
+        reply = ws.receive_json()
+        assert reply['type'] == 'reply'
+        assert reply['corrected_transcript'] == 'I have a question'
+        assert 'I have a question' in reply['reply']
+
+
+def test_second_turn_reuses_connection():
+    with client.websocket_connect('/ws/voice') as ws:
+        for words in (b'hello there', b'thank you'):
+            ws.send_bytes(words)
+            ws.receive_json()
+            ws.send_json({'type': 'stop'})
+            assert ws.receive_json()['type'] == 'final'
+            assert ws.receive_json()['type'] == 'reply'
+
+
+def test_client_transcript_wins_over_the_recognizer():
+    with client.websocket_connect('/ws/voice') as ws:
+        ws.send_json({'type': 'start'})
+        ws.send_bytes(b'mock sentence')
+        ws.receive_json()
+        ws.send_json({'type': 'stop', 'client_transcript': 'i has a cat'})
+        assert ws.receive_json() == {'type': 'final', 'transcript': 'i has a cat'}
+        assert ws.receive_json()['corrected_transcript'] == 'I have a cat'
+
+
+def test_google_clients_are_loaded_off_the_event_loop(monkeypatch):
+    on_loop = []
+
+    def load():
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(True)
+        except RuntimeError:
+            on_loop.append(False)
+        return False
+
+    monkeypatch.setattr(main, 'STREAMING_STT_BACKEND', '')
+    monkeypatch.setattr(main, 'load_google_clients', load)
+    monkeypatch.setattr(main.bot, 'transcribe_audio', lambda audio: 'hello there')
+    with client.websocket_connect('/ws/voice') as ws:
+        ws.send_json({'type': 'start'})
+        ws.send_bytes(b'audio')
+        ws.send_json({'type': 'stop'})
+        assert ws.receive_json() == {'type': 'final', 'transcript': 'hello there'}
+    assert on_loop and not any(on_loop)
+
+
+def test_empty_turn_reports_error():
+    with client.websocket_connect('/ws/voice') as ws:
+        ws.send_json({'type': 'start'})
+        ws.send_json({'type': 'stop'})
+        assert ws.receive_json()['type'] == 'final'
+        assert ws.receive_json()['type'] == 'error'
+
+
+def test_turn_is_turned_away_when_the_server_is_full(monkeypatch):
+    monkeypatch.setattr(main.admission_controller, 'in_flight', main.admission_controller.max_in_flight)
+    monkeypatch.setattr(main.admission_controller, 'max_queue', 0)
+    with client.websocket_connect('/ws/voice') as ws:
+        ws.send_bytes(b'hello there')
+        ws.receive_json()
+        ws.send_json({'type': 'stop'})
+        assert ws.receive_json()['type'] == 'final'
+        error = ws.receive_json()
+        assert error['type'] == 'error' and error['retry_after'] >= 1
+
+
+def test_turn_runs_under_a_deadline_and_frees_its_slot(monkeypatch):
+    seen = []
+
+    async def process(transcript, history):
+        seen.append(main.admission_controller.in_flight)
+        check_deadline('test')
+        seen.append(time_remaining())
+        return {'transcript': transcript, 'corrected_transcript': transcript, 'reply': 'ok'}
+
+    monkeypatch.setattr(main, 'process_transcript', process)
+    before = main.admission_controller.in_flight
+    with client.websocket_connect('/ws/voice') as ws:
+        ws.send_bytes(b'hello there')
+        ws.receive_json()
+        ws.send_json({'type': 'stop'})
+        ws.receive_json()
+        assert ws.receive_json()['type'] == 'reply'
+    assert seen[0] == before + 1
+    assert 0 < seen[1] <= REQUEST_DEADLINE_SECONDS
+    assert main.admission_controller.in_flight == before
+
+
+def test_recognizers_must_implement_feed_and_finish():
+    from streaming_stt import StreamingRecognizer
+
+    class Partial(StreamingRecognizer):
+        async def feed(self, chunk):
+            pass
+
+    with pytest.raises(TypeError):
+        Partial()
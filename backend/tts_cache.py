@@ -0,0 +1,85 @@
+"""Content-addressed cache for synthesized speech with a byte-size budget and LRU eviction."""
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def speech_cache_key(text, voice, encoding):
+    """Hash of everything that determines the synthesized audio"""
+    digest = hashlib.sha256()
+    for part in (text, voice, encoding):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class AudioCache:
+    """LRU cache of audio bytes bounded by total size rather than entry count"""
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> audio bytes
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return cached audio for key, or None"""
+        with self._lock:
+            audio = self._entries.get(key)
+            if audio is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return audio
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def put(self, key, audio):
+        """Store audio, evicting least recently used entries to stay within budget"""
+        size = len(audio)
+        if size > self.max_bytes:
+            logger.debug(f"Audio of {size} bytes exceeds TTS cache budget, not caching")
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = audio
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every cached clip"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        """Hit/miss/eviction counters and current size"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+def tts_cache_from_env():
+    """Build the TTS cache from TTS_CACHE_MAX_BYTES"""
+    return AudioCache(max_bytes=int(os.getenv('TTS_CACHE_MAX_BYTES', str(32 * 1024 * 1024))))
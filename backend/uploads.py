@@ -0,0 +1,122 @@
+"""Upload handling: streaming size limit and in-memory pass-through of recorded audio."""
+import os
+import logging
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+# Uploads larger than this are rejected while the body is still streaming in
+MAX_UPLOAD_BYTES = int(os.getenv('MAX_UPLOAD_BYTES', str(10 * 1024 * 1024)))
+# Uploads up to this size are handed on as bytes; larger ones stay in the
+# multipart parser's spooled temp file (rolled over to disk) and are read lazily
+UPLOAD_MEMORY_MAX_BYTES = int(os.getenv('UPLOAD_MEMORY_MAX_BYTES', str(1024 * 1024)))
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class MaxUploadSizeMiddleware:
+    """Reject request bodies over max_bytes before they are fully buffered.
+
+    A declared Content-Length over the limit is refused up front; otherwise the
+    body is counted as it streams and the request is cut off at the limit.
+    """
+
+    def __init__(self, app, max_bytes=MAX_UPLOAD_BYTES, paths=None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = tuple(paths) if paths else None
+
+    def _applies(self, scope):
+        if scope['type'] != 'http' or scope['method'] not in ('POST', 'PUT', 'PATCH'):
+            return False
+        return self.paths is None or scope['path'] in self.paths
+
+    async def _reject(self, scope, receive, send):
+        response = JSONResponse(
+            status_code=413,
+            content={'detail': f"Upload exceeds the {self.max_bytes} byte limit"},
+        )
+        await response(scope, receive, send)
+
+    async def __call__(self, scope, receive, send):
+        if not self._applies(scope):
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope.get('headers', []):
+            if name == b'content-length':
+                try:
+                    declared = int(value)
+                except ValueError:
+                    break
+                if declared > self.max_bytes:
+                    logger.warning(f"Rejected upload of {declared} bytes (limit {self.max_bytes})")
+                    await self._reject(scope, receive, send)
+                    return
+                break
+
+        received = 0
+        overflowed = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, overflowed
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > self.max_bytes:
+                    overflowed = True
+                    raise UploadTooLarge()
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            # Once the limit is hit, whatever error the app produces is replaced by a 413
+            if overflowed:
+                return
+            response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except UploadTooLarge:
+            pass
+        if overflowed and not response_started:
+            logger.warning(f"Rejected streamed upload over {self.max_bytes} bytes")
+            await self._reject(scope, receive, send)
+
+
+async def load_upload(file):
+    """Return the upload as bytes, or as its spooled file object when it is large"""
+    size = getattr(file, 'size', None)
+    if size is not None and size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds the {MAX_UPLOAD_BYTES} byte limit")
+    if size is not None and size > UPLOAD_MEMORY_MAX_BYTES:
+        await file.seek(0)
+        return file.file
+    return await file.read()
+
+
+def audio_size(audio):
+    """Size in bytes of audio given as bytes-like or a seekable binary file"""
+    if hasattr(audio, 'read'):
+        position = audio.tell()
+        audio.seek(0, os.SEEK_END)
+        size = audio.tell()
+        audio.seek(position)
+        return size
+    return len(audio)
+
+
+def audio_bytes(audio):
+    """Materialize audio as bytes (needed by clients that only accept bytes)"""
+    if hasattr(audio, 'read'):
+        audio.seek(0)
+        return audio.read()
+    if isinstance(audio, bytes):
+        return audio
+    return bytes(audio)
@@ -1,4 +1,4 @@
-import { render, screen, fireEvent } from '@testing-library/react';
+import { render, screen, fireEvent, waitFor } from '@testing-library/react';
 import '@testing-library/jest-dom';
 import App from './App';
 
@@ -78,4 +78,104 @@ test('conversation history not rendered initially', () => {
   // Conversation history section should not be visible initially
   const historySections = screen.queryAllByText(/Conversation History/i);
   expect(historySections).toHaveLength(0);
-});
\ No newline at end of file
+});
+test('a voice turn streams audio over the WebSocket and shows the reply', async () => {
+  const sent = [];
+  class FakeSocket {
+    constructor(url) {
+      this.url = url;
+      this.readyState = 0;
+      setTimeout(() => { this.readyState = FakeSocket.OPEN; this.onopen(); }, 0);
+    }
+    send(data) {
+      sent.push(data);
+      if (data === JSON.stringify({ type: 'stop' })) {
+        const reply = { type: 'reply', transcript: 'i has a cat', corrected_transcript: 'I have a cat', reply: 'Nice work!', session_id: 's1' };
+        setTimeout(() => this.onmessage({ data: JSON.stringify(reply) }), 0);
+      }
+    }
+    close() { this.readyState = 3; }
+  }
+  FakeSocket.OPEN = 1;
+  class FakeRecorder {
+    start() { this.ondataavailable({ data: 'first chunk' }); }
+    stop() { setTimeout(() => { this.ondataavailable({ data: 'last chunk' }); this.onstop(); }, 0); }
+  }
+  const saved = { WebSocket: global.WebSocket, MediaRecorder: global.MediaRecorder, fetch: global.fetch };
+  global.WebSocket = FakeSocket;
+  global.MediaRecorder = FakeRecorder;
+  global.fetch = jest.fn();
+  Object.defineProperty(global.navigator, 'mediaDevices', {
+    value: { getUserMedia: jest.fn().mockResolvedValue({}) },
+    configurable: true,
+  });
+
+  try {
+    render(<App />);
+    const button = screen.getByTestId('record-button');
+    fireEvent.click(button);
+    await waitFor(() => expect(sent).toContain('first chunk'));
+    fireEvent.click(button);
+
+    expect(await screen.findByText('Nice work!')).toBeInTheDocument();
+    expect(JSON.parse(sent[0])).toMatchObject({ type: 'start', encoding: 'WEBM_OPUS', history: [] });
+    expect(sent.slice(1)).toEqual(['first chunk', 'last chunk', JSON.stringify({ type: 'stop' })]);
+    expect(global.fetch).not.toHaveBeenCalled();
+  } finally {
+    Object.assign(global, saved);
+    delete global.navigator.mediaDevices;
+  }
+});
+
+test('a transcript from the browser is sent as text, not replaced by the server', async () => {
+  class FakeSocket {
+    constructor() {
+      this.readyState = 0;
+      setTimeout(() => {
+        this.readyState = FakeSocket.OPEN;
+        this.onopen();
+        this.onmessage({ data: JSON.stringify({ type: 'partial', transcript: 'a mock sentence' }) });
+      }, 0);
+    }
+    send() {}
+    close() { this.readyState = 3; }
+  }
+  FakeSocket.OPEN = 1;
+  class FakeRecorder {
+    start() { this.ondataavailable({ data: 'first chunk' }); }
+    stop() { setTimeout(() => this.onstop(), 0); }
+  }
+  class FakeRecognition {
+    start() { setTimeout(() => this.onresult({ results: [[{ transcript: 'i has a cat' }]] }), 0); }
+    stop() {}
+  }
+  const reply = { transcript: 'i has a cat', corrected_transcript: 'I have a cat', reply: 'Nice work!', session_id: 's1' };
+  const saved = { WebSocket: global.WebSocket, MediaRecorder: global.MediaRecorder, fetch: global.fetch };
+  global.WebSocket = FakeSocket;
+  global.MediaRecorder = FakeRecorder;
+  global.fetch = jest.fn().mockResolvedValue({ ok: true, headers: { get: () => 'application/json' }, json: async () => reply });
+  window.SpeechRecognition = FakeRecognition;
+  Object.defineProperty(global.navigator, 'mediaDevices', {
+    value: { getUserMedia: jest.fn().mockResolvedValue({}) },
+    configurable: true,
+  });
+
+  try {
+    render(<App />);
+    const button = screen.getByTestId('record-button');
+    fireEvent.click(button);
+    expect(await screen.findByText('i has a cat')).toBeInTheDocument();
+    fireEvent.click(button);
+
+    expect(await screen.findByText('Nice work!')).toBeInTheDocument();
+    expect(global.fetch).toHaveBeenCalledTimes(1);
+    const [url, options] = global.fetch.mock.calls[0];
+    expect(url).toBe('http://localhost:8000/chat/text');
+    expect(JSON.parse(options.body)).toMatchObject({ transcript: 'i has a cat' });
+    expect(screen.queryByText('a mock sentence')).not.toBeInTheDocument();
+  } finally {
+    Object.assign(global, saved);
+    delete window.SpeechRecognition;
+    delete global.navigator.mediaDevices;
+  }
+});
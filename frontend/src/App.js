@@ -1,4 +1,60 @@
-import React, { useState, useRef } from "react";
+import React, { useState, useRef, useEffect } from "react";
+
+const REPLY_FRAME_TYPE = "application/vnd.fluentflow.reply";
+const VOICE_SOCKET_URL = "ws://localhost:8000/ws/voice";
+// MediaRecorder timeslice: audio goes to the server while the learner is still talking
+const AUDIO_CHUNK_MS = 250;
+
+// Ask for the reply audio inline (one round trip), as Opus where the browser can play it
+function replyAccept() {
+  const audio = typeof Audio !== "undefined" ? new Audio() : null;
+  const opus = audio && audio.canPlayType && audio.canPlayType('audio/ogg; codecs="opus"');
+  return [REPLY_FRAME_TYPE, ...(opus ? ["audio/ogg; codecs=opus"] : []), "audio/mpeg;q=0.5"].join(", ");
+}
+
+// Reply frame: 4-byte big-endian JSON length, JSON, 4-byte big-endian audio length, audio
+function decodeReplyFrame(buffer) {
+  const view = new DataView(buffer);
+  const jsonLength = view.getUint32(0);
+  const payload = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 4, jsonLength)));
+  const audioLength = view.getUint32(4 + jsonLength);
+  return { payload, audio: new Uint8Array(buffer, 8 + jsonLength, audioLength) };
+}
+
+// Stream one turn over /ws/voice: the server transcribes while the learner speaks,
+// so the reply starts as soon as they stop. reply settles with the "reply" message.
+function openVoiceTurn(startMessage, onTranscript, chunks) {
+  if (typeof WebSocket === "undefined") return null;
+  let socket;
+  try {
+    socket = new WebSocket(VOICE_SOCKET_URL);
+  } catch (err) {
+    console.debug('Voice socket not available', err);
+    return null;
+  }
+  const reply = new Promise((resolve, reject) => {
+    socket.onopen = () => {
+      socket.send(JSON.stringify(startMessage));
+      // Audio recorded while the socket was connecting (the first chunk carries the WebM header)
+      chunks.forEach((chunk) => socket.send(chunk));
+    };
+    socket.onmessage = (event) => {
+      const message = JSON.parse(event.data);
+      if (message.type === 'partial' || message.type === 'final') {
+        onTranscript(message.transcript);
+      } else if (message.type === 'reply') {
+        resolve(message);
+      } else if (message.type === 'error') {
+        reject(new Error(message.detail));
+      }
+    };
+    socket.onerror = () => reject(new Error('Voice socket error'));
+    socket.onclose = () => reject(new Error('Voice socket closed'));
+  });
+  // A failed socket only means falling back to HTTP; never an unhandled rejection
+  reply.catch(() => {});
+  return { socket, reply };
+}
 
 function App() {
   const [transcript, setTranscript] = useState("");
@@ -8,20 +64,48 @@ function App() {
   const [isRecording, setIsRecording] = useState(false);
   const [audioUrl, setAudioUrl] = useState(null);
   const [conversationHistory, setConversationHistory] = useState([]);
+  const [sessionId, setSessionId] = useState(null);
   const mediaRecorderRef = useRef(null);
   const audioChunksRef = useRef([]);
   const recognitionRef = useRef(null);
+  const voiceTurnRef = useRef(null);
+  // What the browser's own speech recognition heard this turn (wins over the server's)
+  const browserTranscriptRef = useRef("");
+
+  useEffect(() => () => {
+    if (voiceTurnRef.current) voiceTurnRef.current.socket.close();
+  }, []);
+
+  // Inline reply audio lives in a blob URL; free it when it is replaced or on unmount
+  useEffect(() => () => {
+    if (audioUrl && audioUrl.startsWith("blob:")) URL.revokeObjectURL(audioUrl);
+  }, [audioUrl]);
+
+  // The server keeps the conversation; send only the session ID once we have one
+  const conversationFields = () => (sessionId ? { session_id: sessionId } : { history: conversationHistory });
 
   const startRecording = async () => {
     setAudioUrl(null);
     setIsRecording(true);
     audioChunksRef.current = [];
+    browserTranscriptRef.current = "";
     try {
       const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
       const mediaRecorder = new MediaRecorder(stream);
       mediaRecorderRef.current = mediaRecorder;
-      mediaRecorder.ondataavailable = (e) => audioChunksRef.current.push(e.data);
-      mediaRecorder.start();
+      const voiceTurn = openVoiceTurn(
+        { type: 'start', encoding: 'WEBM_OPUS', sample_rate_hertz: 48000, ...conversationFields() },
+        (text) => { if (!browserTranscriptRef.current) setTranscript(text); },
+        audioChunksRef.current,
+      );
+      voiceTurnRef.current = voiceTurn;
+      mediaRecorder.ondataavailable = (e) => {
+        audioChunksRef.current.push(e.data);
+        if (voiceTurn && voiceTurn.socket.readyState === WebSocket.OPEN) {
+          voiceTurn.socket.send(e.data);
+        }
+      };
+      mediaRecorder.start(AUDIO_CHUNK_MS);
       // Start client-side speech recognition if available (fallback to browser Web Speech API)
       try {
         const SpeechRecognition = window.SpeechRecognition || window.webkitSpeechRecognition;
@@ -34,6 +118,7 @@ function App() {
             // Get the latest result
             const last = event.results.length - 1;
             const text = event.results[last][0].transcript;
+            browserTranscriptRef.current = text;
             setTranscript(text);
           };
           recognition.onerror = (err) => {
@@ -52,6 +137,42 @@ function App() {
     }
   };
 
+  // One POST with the browser's transcript, or with the recording when the voice socket is unavailable
+  const sendTurnOverHttp = async (audioBlob, browserTranscript) => {
+    let res;
+    if (browserTranscript) {
+      // Browser speech recognition already produced the transcript: send just the text
+      res = await fetch("http://localhost:8000/chat/text", {
+        method: "POST",
+        headers: { "Content-Type": "application/json", Accept: replyAccept() },
+        body: JSON.stringify({ transcript: browserTranscript, ...conversationFields() }),
+      });
+    } else {
+      const form = new FormData();
+      form.append("file", audioBlob, "recording.webm");
+      if (sessionId) {
+        form.append("session_id", sessionId);
+      } else {
+        form.append("history", JSON.stringify(conversationHistory));
+      }
+      res = await fetch("http://localhost:8000/chat/voice", {
+        method: "POST",
+        headers: { Accept: replyAccept() },
+        body: form,
+      });
+    }
+    if (!res.ok) {
+      const text = await res.text();
+      throw new Error(`Server error: ${res.status} ${text}`);
+    }
+    if ((res.headers.get("Content-Type") || "").startsWith(REPLY_FRAME_TYPE)) {
+      const frame = decodeReplyFrame(await res.arrayBuffer());
+      const replyAudio = frame.audio.length > 0 ? new Blob([frame.audio], { type: frame.payload.audio_media_type }) : null;
+      return { j: frame.payload, replyAudio };
+    }
+    return { j: await res.json(), replyAudio: null };
+  };
+
   const stopRecording = async () => {
     setIsRecording(false);
     const mediaRecorder = mediaRecorderRef.current;
@@ -71,23 +192,36 @@ function App() {
     });
 
     try {
-      const form = new FormData();
-      form.append("file", audioBlob, "recording.webm");
-      form.append("history", JSON.stringify(conversationHistory));
-      // Attach client-side transcript (if available) so backend can prefer it over mock transcription
-      if (transcript && transcript.trim().length > 0) {
-        form.append('client_transcript', transcript.trim());
+      let j = null;
+      let replyAudio = null;
+      const voiceTurn = voiceTurnRef.current;
+      voiceTurnRef.current = null;
+      const browserTranscript = browserTranscriptRef.current.trim();
+      if (browserTranscript) {
+        // Nothing left to recognize: send the text the learner saw
+        if (voiceTurn) voiceTurn.socket.close();
+      } else if (voiceTurn && voiceTurn.socket.readyState === WebSocket.OPEN) {
+        try {
+          voiceTurn.socket.send(JSON.stringify({ type: 'stop' }));
+          j = await voiceTurn.reply;
+        } catch (err) {
+          console.debug('Voice socket turn failed, sending over HTTP', err);
+        } finally {
+          voiceTurn.socket.close();
+        }
+      } else if (voiceTurn) {
+        voiceTurn.socket.close();
       }
-      const res = await fetch("http://localhost:8000/chat/voice", { method: "POST", body: form });
-      if (!res.ok) {
-        const text = await res.text();
-        throw new Error(`Server error: ${res.status} ${text}`);
+      if (!j) {
+        ({ j, replyAudio } = await sendTurnOverHttp(audioBlob, browserTranscript));
       }
-      const j = await res.json();
       setTranscript(j.transcript || "");
       setCorrectedTranscript(j.corrected_transcript || "");
       setRepeatPrompt(j.repeat_prompt || "");
       setReply(j.reply || "");
+      if (j.session_id) {
+        setSessionId(j.session_id);
+      }
 
       // Update conversation history
       const newHistory = [...conversationHistory];
@@ -102,7 +236,9 @@ function App() {
       }
       setConversationHistory(newHistory.slice(-10)); // Keep last 10 messages
 
-      if (j.audio_url) {
+      if (replyAudio) {
+        setAudioUrl(URL.createObjectURL(replyAudio));
+      } else if (j.audio_url) {
         setAudioUrl(`http://localhost:8000${j.audio_url}`);
       } else {
         setAudioUrl(null);
@@ -115,6 +251,7 @@ function App() {
 
   const clearConversation = () => {
   setConversationHistory([]);
+  setSessionId(null);
   setTranscript("");
   setCorrectedTranscript("");
   setRepeatPrompt("");